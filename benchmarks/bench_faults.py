@@ -0,0 +1,102 @@
+# File Name: bench_faults.py
+# Description: Shows what the fetch policy does against a stub API that misbehaves.
+#              Tail: some responses stall and some come back as 502 pages. Briefs run with no protection
+#              (long timeout, no retries), with timeouts and retries, and with hedged requests, and the
+#              p50/p95/p99 brief times are compared.
+#              Outage: the stub goes down after the cache is warm. Without protection every brief waits on retries
+#              and fails. The circuit breaker makes them fail fast, and stale copies keep them answered (marked stale).
+# Usage: python benchmarks/bench_faults.py --sites 200 --stall-rate 0.05 --stall-seconds 3
+
+
+import os # Path to the project folder
+import sys # Lets the benchmark import the project modules
+import time # Timing
+import argparse # Command line options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import droneweather as dw # Fetch policy, cache and briefs
+from droneweatherprofile import PilotProfile # Pilot limits used for the run
+from stub_server import StubServer # Local stand-in for the API
+from bench_suite import RunBatch, Summary # Fleet style batch runs and percentiles
+
+
+# Void: Prints one line for a run.
+def PrintSummary(name,summary,extra=''):
+    print(f'{name:<20} p50 {summary["p50_ms"]:>9.1f} ms  p95 {summary["p95_ms"]:>9.1f} ms  '
+          f'p99 {summary["p99_ms"]:>9.1f} ms  errors {summary["errors"]:>4}  {extra}', flush=True)
+    return
+
+# Void: The same batch of briefs under each fetch policy while responses stall and fail at random.
+def RunTail(server,args,profile):
+    policies = (('no protection', {'read_timeout': 30.0, 'retries': 0, 'hedge': False, 'breaker': False}),
+                ('timeout + retries', {'read_timeout': args.timeout, 'retries': 2, 'hedge': False, 'breaker': False}),
+                ('hedged', {'read_timeout': args.timeout, 'retries': 2, 'hedge': True, 'breaker': False}))
+    print(f'Tail: {args.stall_rate:.0%} of responses stall {args.stall_seconds} s, {args.bad_gateway_rate:.0%} are 502 pages')
+    for turn, (name, settings) in enumerate(policies):
+        dw.ConfigureFetch(**settings)
+        # New sites every run so nothing is shared between policies.
+        sites = [f'tail{turn}x{number:04d}, st, us' for number in range(args.sites)]
+        requests_before = server.requests
+        summary = RunBatch(sites,profile,args.workers)
+        stats = dw.FETCH_POLICY.Stats()
+        PrintSummary(name, summary, f'API calls {server.requests - requests_before}, retries {stats["retries"]}, hedged {stats["hedged"]}')
+    return
+
+# Void: Warms the cache, takes the stub down, and runs the same briefs with and without the breaker and stale copies.
+def RunOutage(server,args,profile):
+    sites = [f'outage{number:04d}, st, us' for number in range(args.outage_sites)]
+    print(f'Outage: the API goes down after {len(sites)} sites are cached. Cache entries expire after 1 s.')
+    server.stall_rate = 0.0
+    server.bad_gateway_rate = 0.0
+
+    for name, stale_ttl, breaker in (('retries only', 0, False), ('breaker only', 0, True), ('breaker + stale', 600, True)):
+        server.down = False
+        dw.ConfigureCache(ttl=1, stale_ttl=stale_ttl)
+        dw.ConfigureFetch(read_timeout=args.timeout, retries=2, breaker=breaker)
+        for site in sites:
+            dw.Evaluate(site,profile)
+        time.sleep(1.1)
+
+        server.down = True
+        start = time.perf_counter()
+        results = []
+        stale = 0
+        for site in sites:
+            brief_start = time.perf_counter()
+            decision = dw.Evaluate(site,profile)
+            results.append((time.perf_counter() - brief_start, decision.reason_code != dw.REASON_ERROR))
+            stale += decision.stale_seconds is not None
+        summary = Summary(results, time.perf_counter() - start)
+        stats = dw.FETCH_POLICY.Stats()
+        PrintSummary(name, summary, f'stale {stale}, breaker {stats.get("breaker", "off")}, '
+                                    f'rejected {stats.get("breaker_rejected", 0)}')
+    server.down = False
+    return
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch policy against a fault injecting stub API.')
+    parser.add_argument('--sites', type=int, default=200, help='briefs in each tail run')
+    parser.add_argument('--outage-sites', type=int, default=50, help='briefs in each outage run')
+    parser.add_argument('--workers', type=int, default=dw.FLEET_WORKERS, help='briefs run at the same time')
+    parser.add_argument('--latency', type=float, default=0.02, help='stub delay per response (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='stub extra random delay (seconds)')
+    parser.add_argument('--stall-rate', type=float, default=0.05, help='share of responses that stall')
+    parser.add_argument('--stall-seconds', type=float, default=3.0, help='seconds a stalled response is held back')
+    parser.add_argument('--bad-gateway-rate', type=float, default=0.02, help='share of responses that are 502 pages')
+    parser.add_argument('--timeout', type=float, default=1.0, help='read timeout (seconds) for the protected runs')
+    args = parser.parse_args()
+
+    profile = PilotProfile('benchmark', night=False, rain=False, wind=20.0, cloud=False)
+    server = StubServer(latency=args.latency, jitter=args.jitter, stall_rate=args.stall_rate,
+                        stall_seconds=args.stall_seconds, bad_gateway_rate=args.bad_gateway_rate).Start()
+    dw.API_URL = server.url
+    try:
+        RunTail(server,args,profile)
+        print('')
+        RunOutage(server,args,profile)
+    finally:
+        server.Stop()
+
+if __name__ == '__main__':
+    main()
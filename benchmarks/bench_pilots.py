@@ -0,0 +1,97 @@
+# File Name: bench_pilots.py
+# Description: Times finding every pilot allowed to fly in one observation with the profile index
+#              against checking each pilot with PrefCheckCode. Both must find the same pilots.
+# Usage: python benchmarks/bench_pilots.py --pilots 5000
+
+
+import os # Path to the project folder
+import sys # Lets the benchmark import the project modules
+import time # Timing
+import random # Random pilots and observations
+import argparse # Command line options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import droneweather as dw # Decision rules
+from droneweatherprofile import PilotProfile, ProfileIndex # Pilots and the index
+
+# Weather titles the observations are drawn from.
+TITLES = ('Clear', 'Clouds', 'Rain', 'Drizzle', 'Mist', 'Snow', 'Thunderstorm')
+
+
+# List: Random pilots. Max winds are whole or half mph from 5 to 40.
+def RandomPilots(count,seed=0):
+    generator = random.Random(seed)
+    return [PilotProfile(f'pilot{number}', generator.random() < 0.3, generator.random() < 0.4,
+                         generator.randint(10, 80) / 2, generator.random() < 0.5)
+            for number in range(count)]
+
+# List: Random observations covering day, night, every title and winds from 0 to 40 mph.
+def RandomObservations(count,seed=1):
+    generator = random.Random(seed)
+    observations = []
+    for number in range(count):
+        weather = dw.Observation()
+        weather['time_sunrise'] = 1722250000
+        weather['time_sunset'] = weather['time_sunrise'] + 14 * 3600
+        weather['time_current'] = weather['time_sunrise'] + generator.randint(-6, 20) * 3600
+        weather['weather_title'] = generator.choice(TITLES)
+        weather['wind_speed'] = round(generator.uniform(0, 40), 1)
+        weather['is_cloud'] = weather['weather_title'] in dw.CLOUD_TITLES
+        observations.append(weather)
+    return observations
+
+# List: Allowed pilots for one observation, checking each pilot in turn.
+def LinearScan(weather,pilots):
+    allowed = []
+    for profile in pilots:
+        reason_code = dw.CheckWeatherCode(weather,profile)
+        if reason_code in dw.SAFE_REASONS:
+            allowed.append((profile, reason_code))
+    return allowed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pilot profile index.')
+    parser.add_argument('--pilots', type=int, default=5000, help='number of pilots')
+    parser.add_argument('--observations', type=int, default=200, help='number of observations')
+    args = parser.parse_args()
+
+    pilots = RandomPilots(args.pilots)
+    observations = RandomObservations(args.observations)
+
+    start = time.perf_counter()
+    index = ProfileIndex(pilots)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [LinearScan(weather,pilots) for weather in observations]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [dw.EligiblePilots(weather,index) for weather in observations]
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for weather in observations:
+        is_night = (weather['time_current'] >= weather['time_sunset'] - dw.NIGHT_BUFFER
+                    or weather['time_current'] <= weather['time_sunrise'] + dw.NIGHT_BUFFER)
+        index.Count(is_night, weather['weather_title'] in dw.RAIN_TITLES, weather['wind_speed'])
+    count_time = time.perf_counter() - start
+
+    # Both must allow the same pilots with the same reasons.
+    mismatches = sum(1 for linear, fast in zip(scanned, indexed)
+                     if sorted((profile.name, code) for profile, code in linear) != sorted((profile.name, code) for profile, code in fast))
+    allowed = sum(len(result) for result in indexed)
+
+    print(f'Pilots: {args.pilots}, observations: {args.observations}, allowed on average: {allowed / args.observations:,.0f}')
+    print(f'Index built in {build_time * 1000:0.1f} ms')
+    print(f'One pilot at a time: {scan_time / args.observations * 1000:0.3f} ms per observation')
+    print(f'Index: {index_time / args.observations * 1000:0.3f} ms per observation ({scan_time / index_time:0.1f}x)')
+    print(f'Index count only: {count_time / args.observations * 1000:0.3f} ms per observation ({scan_time / count_time:0.0f}x)')
+    print(f'Mismatched observations: {mismatches}')
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# File Name: bench_service.py
+# Description: Load test for the decision service. Starts the stub API and the service, then many clients
+#              hold keep-alive connections and ask for decisions at the same time, each with its own pilot limits.
+#              Reports throughput, p50/p95/p99 latency and how many calls reached the API.
+# Usage: python benchmarks/bench_service.py --clients 200 --requests 20 --sites 300 --latency 0.05
+
+
+import os # Path to the project folder
+import sys # Lets the benchmark import the project modules
+import json # Response bodies
+import time # Timing
+import random # Sites and pilot limits for each request
+import asyncio # Clients
+import argparse # Command line options
+from urllib.parse import urlencode # Request query strings
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT)
+
+import droneweather as dw # Cache settings
+from droneweatherservice import DecisionService # Service being measured
+from stub_server import StubServer # Local stand-in for the API
+from bench_suite import Percentile # Latency percentiles
+
+
+# List: Latencies (seconds) and the number of failed requests for one client on one keep-alive connection.
+async def Client(host,port,targets):
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    failures = 0
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+            await writer.drain()
+            head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+            length = int(head.lower().split('content-length:')[1].split('\r\n')[0])
+            body = json.loads(await reader.readexactly(length))
+            latencies.append(time.perf_counter() - start)
+            # Unknown sites and stub errors come back as error decisions.
+            if not head.startswith('HTTP/1.1 200') or body.get('reason') == 'error':
+                failures += 1
+    finally:
+        writer.close()
+    return latencies, failures
+
+# Tuple: All latencies, failures and wall seconds for every client running at once.
+async def LoadTest(host,port,clients,requests,sites,seed=0):
+    generator = random.Random(seed)
+    plans = []
+    for client in range(clients):
+        targets = []
+        for request in range(requests):
+            # Every request brings its own pilot limits.
+            query = {'location': generator.choice(sites), 'wind': generator.randint(5, 35),
+                     'night': generator.random() < 0.3, 'rain': generator.random() < 0.4, 'cloud': generator.random() < 0.5}
+            targets.append('/decision?' + urlencode(query))
+        plans.append(targets)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(Client(host, port, targets) for targets in plans))
+    wall_seconds = time.perf_counter() - start
+    latencies = sorted(latency for client_latencies, failures in results for latency in client_latencies)
+    return latencies, sum(failures for client_latencies, failures in results), wall_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the decision service against a local stub API.')
+    parser.add_argument('--clients', type=int, default=200, help='clients connected at the same time')
+    parser.add_argument('--requests', type=int, default=20, help='requests each client makes, one after another')
+    parser.add_argument('--sites', type=int, default=300, help='number of different sites asked about')
+    parser.add_argument('--workers', type=int, default=32, help='service thread pool size')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub delay per response (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='stub extra random delay (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='stub share of server errors (0 to 1)')
+    parser.add_argument('--no-cache', action='store_true', help='turn off the response cache')
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).Start()
+    dw.API_URL = server.url
+    if args.no_cache:
+        dw.WEATHER_CACHE = None
+    else:
+        dw.ConfigureCache()
+    service = DecisionService(args.workers).Start()
+    host, port = service.server_address[:2]
+
+    try:
+        sites = [f'site{number:04d}, st, us' for number in range(args.sites)]
+        latencies, failures, wall_seconds = asyncio.run(LoadTest(host, port, args.clients, args.requests, sites))
+    finally:
+        service.Stop()
+        server.Stop()
+
+    total = len(latencies)
+    print(f'{args.clients} clients x {args.requests} requests, {args.sites} sites, {args.workers} workers')
+    print(f'Requests: {total} in {wall_seconds:0.2f} s ({total / wall_seconds:,.0f}/s)')
+    print(f'Latency: p50 {Percentile(latencies, 50) * 1000:0.2f} ms  p95 {Percentile(latencies, 95) * 1000:0.2f} ms  '
+          f'p99 {Percentile(latencies, 99) * 1000:0.2f} ms  max {latencies[-1] * 1000:0.2f} ms')
+    print(f'Failed: {failures}')
+    stats = service.Stats()
+    print(f'API calls: {server.requests} (scheduler joined {stats["scheduler"]["coalesced"]} duplicate calls)')
+    if 'cache' in stats:
+        print(f'Cache: {stats["cache"]["hits"]} hits, {stats["cache"]["misses"]} misses')
+
+if __name__ == '__main__':
+    main()
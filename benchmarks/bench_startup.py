@@ -0,0 +1,60 @@
+# File Name: bench_startup.py
+# Description: Times the cold start of the program. Each run is a new Python process.
+#              Measures a bare import of droneweather and one headless check of a saved weather file.
+# Usage: python benchmarks/bench_startup.py --runs 20
+
+
+import os # Paths
+import sys # Python executable
+import time # Timing
+import argparse # Command line options
+import tempfile # Preferences file for the headless run
+import statistics # Median
+import subprocess # New process for every run
+
+# Project folder. Every run starts from here.
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Saved weather JSON file checked by the headless run.
+SAMPLE_WEATHER = os.path.join(PROJECT, 'benchmarks', 'sample_weather.json')
+
+
+# List: Wall clock seconds of each run of a command.
+def TimeCommand(command,runs):
+    times = []
+    for run in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT, stdout=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+# Void: Prints the median and fastest time of a list of runs.
+def PrintTimes(title,times):
+    print(f'{title}: median {statistics.median(times) * 1000:0.1f} ms, best {min(times) * 1000:0.1f} ms')
+    return
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark program start up.')
+    parser.add_argument('--runs', type=int, default=20, help='number of processes started for each case')
+    args = parser.parse_args()
+
+    # Preferences for the headless run so it never asks questions.
+    with tempfile.NamedTemporaryFile('w', suffix='.dat', delete=False) as file_object:
+        file_object.write('False\nFalse\n20.0\nFalse\n')
+        profile_file = file_object.name
+
+    try:
+        python = sys.executable
+        PrintTimes('Python alone', TimeCommand([python, '-c', 'pass'], args.runs))
+        PrintTimes('import droneweather', TimeCommand([python, '-c', 'import droneweather'], args.runs))
+        PrintTimes('Headless check', TimeCommand([python, 'droneweather.py', '--headless', 'dunwoody, ga, us',
+                                                  '--weather-json', SAMPLE_WEATHER, '--profile', profile_file], args.runs))
+
+        # The HTTP library must not be loaded just by importing the module.
+        check = subprocess.run([python, '-c', 'import sys, droneweather; print("requests" in sys.modules)'],
+                               cwd=PROJECT, capture_output=True, text=True)
+        print(f'requests loaded on import: {check.stdout.strip()}')
+    finally:
+        os.remove(profile_file)
+
+if __name__ == '__main__':
+    main()
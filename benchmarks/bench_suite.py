@@ -0,0 +1,174 @@
+# File Name: bench_suite.py
+# Description: Benchmarks the fetch -> parse -> decide -> render path against the local stub API.
+#              Reports throughput and p50/p95/p99 latency for single site, batch (fleet), bulk (group) and cached runs,
+#              and saves the results as JSON so two versions can be compared.
+# Usage: python benchmarks/bench_suite.py --sites 300 --latency 0.05 --output results.json
+#        python benchmarks/bench_suite.py --compare old.json new.json
+
+
+import os # Paths
+import sys # Lets the benchmark import the project modules
+import json # Results file
+import time # Timing
+import platform # Python version in the results
+import argparse # Command line options
+import subprocess # Git version of the code
+from concurrent.futures import ThreadPoolExecutor # Batch run, same as fleet mode
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT)
+
+import droneweather as dw # Code being measured
+from droneweatherprofile import PilotProfile # Pilot limits used for the run
+from stub_server import StubServer # Local stand-in for the API
+
+# Cases in the order they run.
+CASES = ('single', 'batch', 'bulk', 'cached')
+
+
+# Float: Value at a percentile of a sorted list (nearest rank).
+def Percentile(sorted_values,percent):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+# Tuple: One full brief for a site. Fetch and parse, decide, then render the decision as headless JSON.
+# Returns (seconds taken, True if the weather was found).
+def TimedBrief(site,profile):
+    start = time.perf_counter()
+    decision = dw.Evaluate(site,profile)
+    json.dumps(decision.ToDict())
+    return time.perf_counter() - start, decision.reason_code != dw.REASON_ERROR
+
+# Dictionary: Throughput, latency percentiles and errors for a list of (seconds, ok) results.
+def Summary(results,wall_seconds):
+    latencies = sorted(seconds for seconds, ok in results)
+    return {'requests': len(results),
+            'errors': sum(1 for seconds, ok in results if not ok),
+            'seconds': round(wall_seconds, 4),
+            'throughput': round(len(results) / wall_seconds, 2) if wall_seconds else 0.0,
+            'p50_ms': round(Percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(Percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(Percentile(latencies, 99) * 1000, 3)}
+
+# Dictionary: Sites one after another with no cache. Each brief pays the full round trip.
+def RunSingle(sites,profile):
+    dw.WEATHER_CACHE = None
+    start = time.perf_counter()
+    results = [TimedBrief(site,profile) for site in sites]
+    return Summary(results, time.perf_counter() - start)
+
+# Dictionary: All sites through a bounded pool sharing the HTTP session, the same way fleet mode runs. No cache.
+def RunBatch(sites,profile,workers):
+    dw.WEATHER_CACHE = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda site: TimedBrief(site,profile), sites))
+    return Summary(results, time.perf_counter() - start)
+
+# Dictionary: All sites by city id through group requests (GROUP_SIZE cities per call). No cache.
+# Latency of a brief is the time from the start until its decision is ready. Also counts the HTTP requests made.
+def RunBulk(city_ids,profile,workers,server):
+    dw.WEATHER_CACHE = None
+    requests_before = server.requests
+    start = time.perf_counter()
+    results = []
+    for decision in dw.FleetCheckWeather(city_ids,workers,profile,bulk=True):
+        json.dumps(decision.ToDict())
+        results.append((time.perf_counter() - start, decision.reason_code != dw.REASON_ERROR))
+    summary = Summary(results, time.perf_counter() - start)
+    summary['http_requests'] = server.requests - requests_before
+    return summary
+
+# Dictionary: Repeated briefs for a few sites with a warm cache. Most briefs never reach the network.
+def RunCached(sites,profile,repeat):
+    dw.ConfigureCache()
+    hot_sites = sites[:10]
+    for site in hot_sites:
+        dw.Evaluate(site,profile)
+    start = time.perf_counter()
+    results = [TimedBrief(site,profile) for turn in range(repeat) for site in hot_sites]
+    summary = Summary(results, time.perf_counter() - start)
+    summary['cache'] = dw.WEATHER_CACHE.Stats()
+    return summary
+
+# String: Git commit of the code being measured, or 'unknown'.
+def CodeVersion():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PROJECT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Void: Prints one line per case and metric showing the change from an old results file to a new one.
+def Compare(old_file,new_file):
+    with open(old_file, 'r') as file_object:
+        old = json.load(file_object)
+    with open(new_file, 'r') as file_object:
+        new = json.load(file_object)
+    print(f'{old["version"]} -> {new["version"]}')
+    for case in CASES:
+        if case not in old['results'] or case not in new['results']:
+            continue
+        for metric in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms'):
+            before, after = old['results'][case][metric], new['results'][case][metric]
+            change = ((after - before) / before * 100) if before else 0.0
+            print(f'{case:<7} {metric:<11} {before:>12.3f} {after:>12.3f} {change:>+8.1f}%')
+    return
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark droneweather against a local stub API.')
+    parser.add_argument('--sites', type=int, default=300, help='number of different sites')
+    parser.add_argument('--workers', type=int, default=dw.FLEET_WORKERS, help='batch pool size')
+    parser.add_argument('--latency', type=float, default=0.02, help='stub delay per response (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='stub extra random delay (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='stub share of server errors (0 to 1)')
+    parser.add_argument('--repeat', type=int, default=20, help='turns over the hot sites in the cached case')
+    parser.add_argument('--cases', default=','.join(CASES), help='cases to run, separated by commas')
+    parser.add_argument('--output', metavar='FILE', help='save results as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        Compare(*args.compare)
+        return
+
+    cases = [case for case in args.cases.split(',') if case]
+    sites = [f'site{number:04d}, st, us' for number in range(args.sites)]
+    profile = PilotProfile('benchmark', night=False, rain=False, wind=20.0, cloud=False)
+
+    server = StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).Start()
+    dw.API_URL = server.url
+    results = {}
+    try:
+        for case in cases:
+            if case == 'single':
+                results[case] = RunSingle(sites,profile)
+            elif case == 'batch':
+                results[case] = RunBatch(sites,profile,args.workers)
+            elif case == 'bulk':
+                results[case] = RunBulk([(number + 1,) for number in range(args.sites)],profile,args.workers,server)
+            elif case == 'cached':
+                results[case] = RunCached(sites,profile,args.repeat)
+            else:
+                raise SystemExit(f'Unknown case: {case}')
+            summary = results[case]
+            print(f'{case:<7} {summary["requests"]:>6} briefs {summary["throughput"]:>10.1f}/s  '
+                  f'p50 {summary["p50_ms"]:>8.2f} ms  p95 {summary["p95_ms"]:>8.2f} ms  p99 {summary["p99_ms"]:>8.2f} ms  '
+                  f'errors {summary["errors"]}', flush=True)
+    finally:
+        server.Stop()
+
+    report = {'version': CodeVersion(),
+              'time': int(time.time()),
+              'python': platform.python_version(),
+              'config': {'sites': args.sites, 'workers': args.workers, 'latency': args.latency,
+                         'jitter': args.jitter, 'error_rate': args.error_rate, 'repeat': args.repeat},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as file_object:
+            json.dump(report, file_object, indent=2)
+        print(f'Results saved to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# File Name: bench_vector.py
+# Description: Times the column (NumPy) flight decision against the one record at a time decision.
+#              Both must give the same reason code for every row.
+# Usage: python benchmarks/bench_vector.py --rows 1000000
+
+
+import os # Path to the project folder
+import sys # Lets the benchmark import the project modules
+import time # Timing
+import argparse # Command line options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np # Random observations
+
+import droneweather as dw # Reason codes
+import droneweathervector as dwv # Column decision
+from droneweatherprofile import PilotProfile # Pilot limits used for the run
+
+# Every openweathermap.org weather condition id.
+WEATHER_IDS = (200, 201, 202, 210, 211, 212, 221, 230, 231, 232,
+               300, 301, 302, 310, 311, 312, 313, 314, 321,
+               500, 501, 502, 503, 504, 511, 520, 521, 522, 531,
+               600, 601, 602, 611, 612, 613, 615, 616, 620, 621, 622,
+               701, 711, 721, 731, 741, 751, 761, 762, 771, 781,
+               800, 801, 802, 803, 804)
+
+
+# Dictionary of arrays: Random hourly observations covering day, night and the 30 minute buffers.
+def RandomColumns(rows,seed=0):
+    generator = np.random.default_rng(seed)
+    # One year of hours.
+    time_current = 1704067200 + generator.integers(0, 365 * 24, rows) * 3600
+    # Sunrise 5 to 8 hours into the UTC day, sunset 11 to 15 hours after sunrise.
+    day_start = time_current - time_current % 86400
+    time_sunrise = day_start + generator.integers(5 * 3600, 8 * 3600, rows)
+    time_sunset = time_sunrise + generator.integers(11 * 3600, 15 * 3600, rows)
+    return {'time_current': time_current,
+            'time_sunrise': time_sunrise,
+            'time_sunset': time_sunset,
+            'wind_speed': generator.uniform(0, 40, rows),
+            'weather_id': generator.choice(WEATHER_IDS, rows)}
+
+# Float: Best wall clock seconds of several runs.
+def BestTime(function,columns,profile,repeat):
+    best = float('inf')
+    for run in range(repeat):
+        start = time.perf_counter()
+        result = function(**columns, profile=profile)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the column flight decision.')
+    parser.add_argument('--rows', type=int, default=1000000, help='number of observations')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of the column decision (best is kept)')
+    args = parser.parse_args()
+
+    columns = RandomColumns(args.rows)
+    # Every certification off so every check is exercised.
+    profile = PilotProfile('benchmark', night=False, rain=False, wind=20.0, cloud=False)
+
+    vector_time, (vector_safe, vector_codes) = BestTime(dwv.EvaluateColumns, columns, profile, args.repeat)
+    # One record at a time is slow so it only runs once.
+    scalar_time, (scalar_safe, scalar_codes) = BestTime(dwv.EvaluateScalar, columns, profile, 1)
+
+    # Both decisions must agree on every row.
+    mismatches = int(np.count_nonzero(vector_codes != scalar_codes))
+
+    print(f'Rows: {args.rows}')
+    print(f'One at a time: {scalar_time:0.3f} s ({args.rows / scalar_time:,.0f} rows/s)')
+    print(f'Columns: {vector_time:0.3f} s ({args.rows / vector_time:,.0f} rows/s)')
+    print(f'Speedup: {scalar_time / vector_time:0.1f}x')
+    print(f'Mismatched rows: {mismatches}')
+    for reason_code, name in enumerate(dw.REASON_NAMES):
+        print(f'  {name}: {int(np.count_nonzero(vector_codes == reason_code))}')
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
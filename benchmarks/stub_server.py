@@ -0,0 +1,244 @@
+# File Name: stub_server.py
+# Description: Local stand-in for the openweathermap.org API. Serves canned weather, group and forecast JSON
+#              with a chosen delay and error rate so benchmarks and tests run without the network or an API key.
+#              Faults can be turned on: stalled responses, answers without JSON, and a full outage.
+# Usage: python benchmarks/stub_server.py --port 8080 --latency 0.05 --jitter 0.02 --error-rate 0.01
+#        python benchmarks/stub_server.py --stall-rate 0.05 --stall-seconds 5 --bad-gateway-rate 0.02
+#        Then point droneweather.API_URL at http://127.0.0.1:8080/data/2.5
+
+
+import os # Paths to the sample payloads
+import sys # Exit status
+import json # Payloads
+import time # Delays and weather times
+import random # Error rate, jitter and varied weather
+import zlib # Stable number for every location
+import threading # Server runs beside the benchmark
+from urllib.parse import urlparse, parse_qs # Reading the request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler # Standard library HTTP server
+
+# Saved payloads the canned responses are built from.
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_WEATHER = os.path.join(BENCHMARKS, 'sample_weather.json')
+SAMPLE_FORECAST = os.path.join(BENCHMARKS, 'sample_forecast.json')
+
+# City names starting with this are answered with "city not found".
+UNKNOWN_PREFIX = 'nowhere'
+# City ids at or above this are not found. Group requests leave them out of the list.
+UNKNOWN_ID = 90000000
+# Most ids in one group request, the same as the real API.
+GROUP_SIZE = 20
+# Weather condition ids handed out to stub locations.
+STUB_WEATHER = ((800, 'Clear', 'clear sky'), (801, 'Clouds', 'few clouds'), (804, 'Clouds', 'overcast clouds'),
+                (500, 'Rain', 'light rain'), (701, 'Mist', 'mist'), (211, 'Thunderstorm', 'thunderstorm'))
+
+
+# Integer: Same number every time for the same location, so a location always gets the same weather.
+def LocationSeed(query):
+    return zlib.crc32(json.dumps(query, sort_keys=True).encode('utf-8'))
+
+# Dictionary: Current weather for one query. Name, coordinates, id and weather follow the query.
+def StubWeather(query,sample):
+    seed = LocationSeed(query)
+    generator = random.Random(seed)
+    weather_data = json.loads(json.dumps(sample))
+    weather_id, title, description = STUB_WEATHER[seed % len(STUB_WEATHER)]
+    weather_data['weather'][0].update({'id': weather_id, 'main': title, 'description': description})
+    weather_data['wind'] = {'speed': round(generator.uniform(0, 30), 2), 'deg': generator.randrange(360), 'gust': round(generator.uniform(5, 40), 2)}
+
+    # Daytime at the location: sunrise 6 hours ago, sunset 8 hours from now.
+    now = int(time.time())
+    weather_data['dt'] = now
+    weather_data['sys']['sunrise'] = now - 6 * 3600
+    weather_data['sys']['sunset'] = now + 8 * 3600
+
+    if 'q' in query:
+        weather_data['name'] = query['q'].split(',')[0].strip().title()
+        weather_data['id'] = seed % 10000000
+    if 'lat' in query:
+        weather_data['coord'] = {'lat': float(query['lat']), 'lon': float(query['lon'])}
+        weather_data['id'] = seed % 10000000
+    if 'id' in query:
+        weather_data['id'] = int(query['id'])
+    return weather_data
+
+# Dictionary: Current weather for a comma separated list of city ids, as the group endpoint gives it.
+# Unknown ids are left out. Entries have no status code of their own.
+def StubGroup(query,sample):
+    city_ids = [int(city_id) for city_id in query.get('id', '').split(',') if city_id]
+    weather = []
+    for city_id in city_ids:
+        if city_id < UNKNOWN_ID:
+            weather_data = StubWeather({'id': str(city_id)}, sample)
+            del weather_data['cod']
+            weather.append(weather_data)
+    return {'cnt': len(weather), 'list': weather}
+
+# Dictionary: 5 day forecast for one query. Slot times start at the current 3 hour mark.
+def StubForecast(query,sample):
+    forecast_data = json.loads(json.dumps(sample))
+    start = int(time.time()) // 10800 * 10800
+    shift = start - forecast_data['list'][0]['dt']
+    for slot in forecast_data['list']:
+        slot['dt'] += shift
+    forecast_data['city']['sunrise'] += shift // 86400 * 86400
+    forecast_data['city']['sunset'] += shift // 86400 * 86400
+    if 'q' in query:
+        forecast_data['city']['name'] = query['q'].split(',')[0].strip().title()
+    return forecast_data
+
+# Class: Request handler. Settings are read from the server so they can be changed while it runs.
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, like the real API.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately. Without this small responses wait on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items() if key not in ('appid', 'units')}
+        with server.lock:
+            server.requests += 1
+
+        # Network delay. A stalled response waits much longer, like a hung connection upstream.
+        delay = server.latency + random.uniform(0, server.jitter)
+        if random.random() < server.stall_rate:
+            delay += server.stall_seconds
+            with server.lock:
+                server.stalls += 1
+        if delay > 0:
+            time.sleep(delay)
+
+        # Outage or a proxy in front of the API failing. The body is not JSON.
+        if server.down or random.random() < server.bad_gateway_rate:
+            with server.lock:
+                server.errors += 1
+            self.SendText(503 if server.down else 502, 'Service Unavailable' if server.down else 'Bad Gateway')
+            return
+
+        if random.random() < server.error_rate:
+            status, body = 500, {'cod': 500, 'message': 'stub server error'}
+        elif url.path.endswith('/group'):
+            if len(query.get('id', '').split(',')) > GROUP_SIZE:
+                status, body = 400, {'cod': '400', 'message': f'no more than {GROUP_SIZE} ids'}
+            else:
+                status, body = 200, StubGroup(query, server.sample_weather)
+        elif query.get('q', '').lower().startswith(UNKNOWN_PREFIX) or int(query.get('id', 0)) >= UNKNOWN_ID:
+            status, body = 404, {'cod': '404', 'message': 'city not found'}
+        elif url.path.endswith('/weather'):
+            status, body = 200, StubWeather(query, server.sample_weather)
+        elif url.path.endswith('/forecast'):
+            status, body = 200, StubForecast(query, server.sample_forecast)
+        else:
+            status, body = 404, {'cod': '404', 'message': 'unknown endpoint'}
+
+        if status != 200:
+            with server.lock:
+                server.errors += 1
+        self.SendJson(status, body)
+
+    # Void: Writes a JSON response with a length so the connection can be reused.
+    def SendJson(self,status,body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Void: Writes a plain text error page, the way a proxy or load balancer answers.
+    def SendText(self,status,text):
+        data = f'<html><body><h1>{status} {text}</h1></body></html>'.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Void: Request logging is turned off so it does not slow the benchmark.
+    def log_message(self,format,*args):
+        return
+
+# Class: Stub server running in a background thread.
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for a whole fleet connecting at once. The default of 5 drops connections and they retry a second later.
+    request_queue_size = 128
+
+    # Void: port 0 picks a free port. latency and jitter are seconds, error_rate is 0 to 1.
+    # stall_rate is the share of responses held stall_seconds longer. bad_gateway_rate is the share answered
+    # with a 502 page. down answers everything with a 503 page and can be changed while the server runs.
+    def __init__(self,host='127.0.0.1',port=0,latency=0.0,jitter=0.0,error_rate=0.0,stall_rate=0.0,stall_seconds=5.0,bad_gateway_rate=0.0):
+        super().__init__((host, port), StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.bad_gateway_rate = bad_gateway_rate
+        self.down = False
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.stalls = 0
+        with open(SAMPLE_WEATHER, 'r') as file_object:
+            self.sample_weather = json.load(file_object)
+        with open(SAMPLE_FORECAST, 'r') as file_object:
+            self.sample_forecast = json.load(file_object)
+        self._thread = None
+
+    # String: Base address to put in droneweather.API_URL.
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/data/2.5'
+
+    # StubServer: Starts serving in a background thread.
+    def Start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    # Void: Clients that gave up (timed out) close the connection first. That is expected, not an error.
+    def handle_error(self,request,client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request,client_address)
+        return
+
+    # Void: Stops serving and closes the port.
+    def Stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        return
+
+def main(argv=None):
+    import argparse # Command line options
+
+    parser = argparse.ArgumentParser(description='Local stand-in for the openweathermap.org API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a server error (0 to 1)')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='share of responses held back --stall-seconds longer (0 to 1)')
+    parser.add_argument('--stall-seconds', type=float, default=5.0, help='seconds a stalled response is held back')
+    parser.add_argument('--bad-gateway-rate', type=float, default=0.0, help='share of requests answered with a 502 page that is not JSON (0 to 1)')
+    parser.add_argument('--down', action='store_true', help='answer every request with a 503 page (an outage)')
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.stall_rate, args.stall_seconds, args.bad_gateway_rate)
+    server.down = args.down
+    print(f'Stub API at {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
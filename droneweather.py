@@ -6,15 +6,93 @@
 # API Used: openweathermap.org
 
 
-import requests # API actions
-import os # Clearing terminal window
+import os # Checking for the local city index
+import sys # Terminal output and command line arguments
 import math # Floor and ceiling commands
+import threading # Lock around the shared HTTP session
+from droneweathercache import WeatherCache, CacheKey, CACHE_TTL, CACHE_SIZE, STALE_TTL # Response cache
+from droneweatherprofile import ProfileStore, ProfileIndex, PREF_FILE # Pilot preferences in memory
+from droneweathergazetteer import Gazetteer, GAZETTEER_FILE # Local city index
+import droneweathermetrics as metrics # Stage timings (off unless turned on)
+from droneweatherscheduler import RequestScheduler, UsePriority, PRIORITY_URGENT, PRIORITY_BACKGROUND # Rate limit and duplicate calls
+from droneweatherresilience import FetchPolicy, IsRetryable, IsRateLimited, CONNECT_TIMEOUT, READ_TIMEOUT, RETRIES # Timeouts, retries and the breaker
+from droneweatherreport import RenderTextReport, ReportWriter, FormatForFile, WEATHER_FIELDS # Buffered reports
 
 # Never change. This API is through openweathermap.org.
 API_KEY= ''
+# Base address of the weather API. Every request is built from this.
+API_URL = 'https://api.openweathermap.org/data/2.5'
+# Units requested from the API. Report and wind limits are in imperial units.
+UNITS = 'imperial'
 # Error Code when the API cannot find the weather.
 ERROR_CODE = '400'
 
+# ANSI escape code that clears the terminal and moves to the top.
+CLEAR_SCREEN = '\033[2J\033[H'
+
+# Fleet mode. Number of sites fetched at the same time.
+FLEET_WORKERS = 16
+# Connections to the API kept open for reuse. Grown by ReservePool to the number of threads asking at once.
+POOL_SIZE = FLEET_WORKERS
+# Most city ids the API takes in one group request.
+GROUP_SIZE = 20
+
+# Weather titles that are hazardous in aviation. Never allow flight during these.
+HAZARD_TITLES = ('Smoke', 'Dust', 'Sand', 'Ash', 'Squall', 'Tornado', 'Thunderstorm')
+# Weather titles that mean clouds are in the sky.
+CLOUD_TITLES = ('Clouds', 'Thunderstorm', 'Drizzle', 'Rain', 'Snow', 'Fog', 'Mist')
+# Weather titles a drone must be rain certified to fly in.
+RAIN_TITLES = ('Rain', 'Thunderstorm', 'Mist')
+
+# Weather titles by openweathermap.org condition id. Ids not listed here are named by WEATHER_GROUP_TITLES.
+WEATHER_ID_TITLES = {701: 'Mist', 711: 'Smoke', 721: 'Haze', 731: 'Dust', 741: 'Fog', 751: 'Sand',
+                     761: 'Dust', 762: 'Ash', 771: 'Squall', 781: 'Tornado', 800: 'Clear'}
+# Weather titles by the first digit of the condition id.
+WEATHER_GROUP_TITLES = {2: 'Thunderstorm', 3: 'Drizzle', 5: 'Rain', 6: 'Snow', 8: 'Clouds'}
+
+# Seconds before sunset and after sunrise that count as night. 30 minutes.
+NIGHT_BUFFER = 1800
+
+# Reason codes for a flight decision. Checked in this order, the first one that applies is the reason.
+REASON_AUTHORIZED = 0 # Safe to fly.
+REASON_CLOUDS = 1 # Safe to fly, clouds indicated in the airspace.
+REASON_HAZARD = 2 # Hazardous weather.
+REASON_NIGHT = 3 # Not night certified.
+REASON_RAIN = 4 # Not rain certified.
+REASON_WIND = 5 # Winds over the pilot's limit.
+REASON_ERROR = 6 # Weather could not be found.
+# Reason codes that are still safe to fly.
+SAFE_REASONS = (REASON_AUTHORIZED, REASON_CLOUDS)
+# Short name for each reason code. Used in machine readable output.
+REASON_NAMES = ('authorized', 'clouds', 'hazard', 'night', 'rain', 'wind', 'error')
+
+# Shared HTTP session. Keeps connections alive between requests. Created on first use by GetSession.
+_session = None
+_session_lock = threading.Lock()
+
+# Pilot preferences. The preferences file is read once and again only when it changes.
+PROFILE_STORE = ProfileStore()
+
+# Local city index. When loaded, city names become exact city ids before asking the API. Set by UseGazetteer.
+GAZETTEER = None
+
+# Response cache in front of the API. Set to None to always ask the API.
+WEATHER_CACHE = WeatherCache()
+
+# Orders API calls: rate limit, priorities and one call per location at a time. Set by ConfigureScheduler.
+# Without a rate limit it only joins duplicate calls.
+SCHEDULER = RequestScheduler()
+
+# Store of past observations. When set, every checked observation is added to it. Set by RecordHistory.
+HISTORY = None
+
+# How API requests are made: timeouts, retries, hedged copies and the circuit breaker. Set by ConfigureFetch.
+FETCH_POLICY = FetchPolicy(callers=POOL_SIZE)
+
+# Threads that refresh stale cache entries in the background. Created on first use.
+_refresh_executor = None
+_refresh_lock = threading.Lock()
+
 # EXAMPLE: Accessing Weather from API inside of JSON file
 '''
 Accessing in the weather JSON file is just multidimensional arrays.
@@ -62,86 +140,39 @@ def main():
             # Gets weather data through API. Saves JSON file in variable: weather_data
             weather_data = GetWeather(user_city,user_state,user_country)
 
-            # Checks if error in getting weather.
-            if weather_data['cod'] == ERROR_CODE:
+            # Checks if error in getting weather. The API gives the code as a string or number.
+            if str(weather_data.get('cod')) != '200':
                 
                 ClearScreen() # Removes previous text from screen.
                 # Throws error code
-                print('Error getting weather...')
+                print(f'Error getting weather... {weather_data.get("message", weather_data.get("cod"))}')
             
             # Code is valid therefore weather is valid.
             else:
 
-                # Code block getting data from the weather service.
-
-                # Location and Time Data
-                loc_city = weather_data['name'] # City name
-                loc_state = user_state.capitalize() # From user input
-                loc_country = weather_data['sys']['country'] # Country (US = United States)
-                loc_ground = weather_data['main']['grnd_level'] # Altitude above sea level (ft)
-                loc_longitude = weather_data['coord']['lon'] # Longitude Coordinates
-                loc_lattitude = weather_data['coord']['lat'] # Lattitude Coordinates
-                time_current = weather_data['dt'] # Current time (UNIX time)
-                time_sunrise = weather_data['sys']['sunrise'] # Sunrise at location (UNIX time)
-                time_sunset = weather_data['sys']['sunset'] # Sunset at location (UNIX time)
-
-                # General Weather Data
-                weather_title = weather_data['weather'][0]['main'] # Weather type
-                weather_desc = weather_data['weather'][0]['description'] # Short description of current weather
-                temp_current = weather_data['main']['temp'] # Current temperature
-                temp_feelslike = weather_data['main']['feels_like'] # "Feels like" temperature
-                pressure_sea = weather_data['main']['sea_level'] # Sea Level Pressure (hPa)
-                humidity = weather_data['main']['humidity'] # Humidity (%)
-                visibility = (weather_data['visibility']/1000) # Visibility (miles x 10^3 so dividing by 1000)
-
-                # Cloud Data
-                is_cloud = False
-                # Checks if clouds exists. If so it will show the cloud precentage more than zero.
-                if weather_title == ('Clouds' or 'Thunderstorm' or 'Drizzle' or 'Rain' or 'Snow' or 'Fog' or 'Mist'):
-                    is_cloud = True
-                    # Gets % of clouds in the sky
-                    cloud_percentage = weather_data['clouds']['all']
-                else:
-                    # Defines cloud percentage if there is none.
-                    cloud_percentage = 0
-                
-                # Wind Data
-                # Winds ceiling for larger safety margin.
-                wind_speed = math.ceil(weather_data['wind']['speed'])
-                wind_direction = weather_data['wind']['deg']
-                # Checks if Wind Gust exists. If so it will extend Wind Array to a length of 3.
-                is_wind_gust = False
-                if len(weather_data['wind']) == 3:
-                    # Gusts ceiling for larger safety margin.
-                    wind_gust = math.ceil(weather_data['wind']['gust'])
-                    is_wind_gust = True
-                else:
-                    # Defines wind gust if there is none.
-                    wind_gust = 0
-                
-                # End of code block.
+                # Observation: Pulls all report data out of the JSON file. State is from user input.
+                weather = ExtractCurrentWeather(weather_data,user_state)
 
-                # Rest of main function checks user preferences with current weather and prints report to terminal.
-                
-                # Bool. Used to determine if the weather is safe to fly in.
-                is_safe_to_fly = True
-                
-                # Hazardous Weather. Do not allow flight during these weather events.
-                is_hazard = False
-                if weather_title == ('Smoke' or 'Dust' or 'Sand' or 'Ash' or 'Squall' or 'Tornado' or 'Thunderstorm'):
-                    # Any of the previous line's title's are hazardous weather in aviation. Therefore not safe to fly.
-                    is_hazard = True
-                    is_safe_to_fly = False
-                else:
-                    # Bool & String: Checks all weather conditions and compares with user preferences to determine if flight is safe.
-                    is_safe_to_fly, decision_reason = PrefCheckWeather(time_current,time_sunrise,time_sunset,weather_title,wind_speed,is_cloud)
+                # Bool & String: Checks hazards and user preferences to determine if flight is safe.
+                is_safe_to_fly, decision_reason = CheckWeather(weather)
+                # Stale weather came from the cache while the API was slow or down.
+                decision_reason += StaleNote(weather_data)
 
-                # Void: Printing weather data and recommendation. Takes all data from JSON file as named variables.
-                PrintWeatherReport(loc_city, loc_state, loc_country,loc_ground,loc_longitude,loc_lattitude,weather_title,weather_desc,humidity,visibility,temp_current,temp_feelslike,pressure_sea,is_wind_gust,wind_speed,wind_direction,wind_gust,is_cloud,cloud_percentage,is_safe_to_fly,decision_reason)
+                # Void: Printing weather data and recommendation. Takes the dictionary of data from the JSON file.
+                ShowWeatherReport(weather,is_safe_to_fly,decision_reason)
 
                 # Bool: Asks if the user wants to run program again. Controls main loop.
                 loop_again = RunMainAgain()
 
+        except OSError as error:
+
+            # Timed out, could not connect, or the API is failing and the circuit is open.
+            print(f'Error getting weather... {error}')
+            HoldOnScreen() # Keeps previous message on screen for user to read.
+
+            # Bool: Asks if the user wants to run program again. Controls main loop.
+            loop_again = RunMainAgain()
+
         except KeyError or TypeError:
             
             # Throws error for GetLocation function if leaked into main function.
@@ -156,8 +187,10 @@ def main():
 
 # Void: Clears terminal display
 def ClearScreen():
-    # Clears terminal screen by standard windows command.
-    os.system('cls')
+    # Clears terminal screen with an ANSI escape code. No shell is started. Skipped when output is not a terminal.
+    if sys.stdout.isatty():
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
     return
 
 # Void: Temporarily stops program to allow users to read on terminal.
@@ -166,12 +199,646 @@ def HoldOnScreen():
     holder = str(input('Enter anything to continue: '))
     return
 
+# Session: Returns the shared HTTP session. Connections to the API are kept alive and reused.
+def GetSession():
+    global _session
+    # Lock so two fleet threads do not both create a session.
+    with _session_lock:
+        if _session is None:
+            # Imported here so importing this module or checking saved weather stays fast.
+            import requests
+            _session = requests.Session()
+            _MountPool(_session)
+    return _session
+
+# Void: Gives a session a connection pool POOL_SIZE large, so every worker can hold a connection open.
+def _MountPool(session):
+    from requests.adapters import HTTPAdapter # Imported here to keep start up fast.
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return
+
+# Void: Makes room for workers threads asking the API at once: connections kept open and hedging threads.
+# Without it connections over POOL_SIZE are thrown away after each request and keep-alive is lost.
+# Only ever grows. A session already made gets a new, larger pool.
+def ReservePool(workers):
+    global POOL_SIZE
+    with _session_lock:
+        if workers <= POOL_SIZE:
+            return
+        POOL_SIZE = workers
+        if _session is not None:
+            _MountPool(_session)
+    FETCH_POLICY.Reserve(POOL_SIZE)
+    return
+
+# Dictionary: API query for a location. Names use q=city,state,country, coordinates use lat/lon and a city id uses id=.
+def LocationParams(location):
+    if len(location) == 1:
+        return {'id': location[0]}
+    if len(location) == 2:
+        return {'lat': location[0], 'lon': location[1]}
+    return {'q': ','.join(location)}
+
+# JSON: Gets weather from the cache, or through the API when the cache has no fresh copy.
+# endpoint is the API path: 'weather' for current weather, 'forecast' for the 5 day / 3 hour forecast.
+# priority is a scheduler PRIORITY value. Without one the thread's priority is used (see UsePriority).
+# When the cache keeps stale copies (ConfigureCache stale_ttl), an expired copy is given back at once, marked
+# with stale_seconds, while a new one is fetched in the background. It is also given back when the API fails.
+def FetchWeather(location,params,endpoint='weather',priority=None):
+    key = CacheKey(location,UNITS,endpoint)
+    label = LocationLabel(location)
+    stale = None
+    if WEATHER_CACHE is not None:
+        with metrics.Stage('cache',label):
+            weather_data = WEATHER_CACHE.Get(key)
+        if weather_data is not None:
+            metrics.Increment('cache_hits',label)
+            return weather_data
+        metrics.Increment('cache_misses',label)
+        if WEATHER_CACHE.stale_ttl:
+            stale = WEATHER_CACHE.GetStale(key)
+            if stale is not None:
+                RefreshWeather(key,params,endpoint,label)
+                return StaleWeather(stale,label)
+
+    try:
+        # The scheduler keeps calls under the rate limit and joins calls for the same location.
+        if SCHEDULER is not None:
+            weather_data = SCHEDULER.Fetch(key,lambda: RequestWeather(key,params,endpoint,label),priority,label)
+        else:
+            weather_data = RequestWeather(key,params,endpoint,label)
+    except OSError:
+        # Timed out, could not connect or the circuit is open. The last good copy is better than nothing.
+        stale = WEATHER_CACHE.GetStale(key) if WEATHER_CACHE is not None and WEATHER_CACHE.stale_ttl else None
+        if stale is None:
+            raise
+        return StaleWeather(stale,label)
+
+    if (IsRetryable(weather_data) or IsRateLimited(weather_data)) and WEATHER_CACHE is not None and WEATHER_CACHE.stale_ttl:
+        stale = WEATHER_CACHE.GetStale(key)
+        if stale is not None:
+            return StaleWeather(stale,label)
+    return weather_data
+
+# JSON: Copy of a stale cached response marked with how old it is (stale_seconds).
+def StaleWeather(stale,label=''):
+    weather_data, age = stale
+    metrics.Increment('stale_served',label)
+    return {**weather_data, 'stale_seconds': int(age)}
+
+# Void: Fetches a location again in the background so the next request gets fresh weather.
+# Goes through the scheduler behind pilots waiting on checks, and joins a refresh already running.
+def RefreshWeather(key,params,endpoint,label=''):
+    global _refresh_executor
+    with _refresh_lock:
+        if _refresh_executor is None:
+            from concurrent.futures import ThreadPoolExecutor # Imported here to keep start up fast.
+            _refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='refresh')
+
+    def Refresh():
+        try:
+            if SCHEDULER is not None:
+                SCHEDULER.Fetch(key,lambda: RequestWeather(key,params,endpoint,label),PRIORITY_BACKGROUND,label)
+            else:
+                RequestWeather(key,params,endpoint,label)
+        except OSError:
+            # The stale copy stays until the API answers again.
+            metrics.Increment('refresh_errors',label)
+    _refresh_executor.submit(Refresh)
+    return
+
+# JSON: Asks the API through the fetch policy (timeouts, retries, hedging, breaker). Good responses are added to the cache.
+def RequestWeather(key,params,endpoint,label=''):
+    # Request API. Every request has the API key and units.
+    weather_data = FETCH_POLICY.Call(lambda timeout: SendRequest(endpoint,params,timeout,label),label,SCHEDULER)
+
+    # Only good responses are kept. Errors are asked for again next time.
+    if WEATHER_CACHE is not None and str(weather_data.get('cod')) == '200':
+        WEATHER_CACHE.Put(key,weather_data)
+    return weather_data
+
+# JSON: One API request. timeout is (connect seconds, read seconds) so a stalled connection cannot hang a brief.
+# Server errors without a JSON body (from a proxy) get one made from the HTTP status.
+def SendRequest(endpoint,params,timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),label=''):
+    # Connecting, sending and waiting for the response are timed apart from decoding the JSON.
+    with metrics.Stage('http',label):
+        response = GetSession().get(f'{API_URL}/{endpoint}', params={**params, 'appid': API_KEY, 'units': UNITS}, timeout=timeout)
+    with metrics.Stage('json',label):
+        try:
+            return response.json()
+        except ValueError:
+            if response.status_code == 200:
+                raise
+            return {'cod': response.status_code, 'message': response.reason}
+
+# String: Short label for a location in metrics. "Atlanta, GA, US" -> "atlanta,ga,us".
+def LocationLabel(location):
+    if not location:
+        return ''
+    return ','.join(str(part).strip().lower() for part in location)
+
+# Tuple: Swaps a (city, state, country) location for its (city id,) from the local city index.
+# Coordinates, unknown cities and runs without an index are returned unchanged.
+def ResolveSite(location):
+    if GAZETTEER is not None and len(location) == 3:
+        place = GAZETTEER.Resolve(location[0],location[1],location[2])
+        if place is not None:
+            return (place.id,)
+    return location
+
 # JSON: Gets weather through API. Returns JSON file to main
 def GetWeather(user_city,user_state,user_country):
     # Request API. Uses the user's location provided by the GetLocation function.
-    weather_data = requests.get(f'https://api.openweathermap.org/data/2.5/weather?q={user_city},{user_state},{user_country}&appid={API_KEY}&units=imperial')
+    # City id from the local index when there is one, so the API does not have to search the name.
     # Gives the json file holding the weather data back to main function.
-    return weather_data.json()
+    location = ResolveSite((user_city,user_state,user_country))
+    return FetchWeather(location,LocationParams(location))
+
+# JSON: Gets weather through API by openweathermap.org city id.
+def GetWeatherById(city_id):
+    location = (city_id,)
+    return FetchWeather(location,LocationParams(location))
+
+# JSON: Gets weather through API by coordinates instead of a city name.
+def GetWeatherByCoords(lattitude,longitude):
+    location = (lattitude,longitude)
+    return FetchWeather(location,LocationParams(location))
+
+# Dictionary: Current weather for up to GROUP_SIZE city ids in one request. City id -> weather JSON.
+# Each city's weather has the same form GetWeatherById gives. Ids the API left out are missing.
+def GetWeatherGroup(city_ids):
+    city_ids = [int(city_id) for city_id in city_ids]
+    key = 'group:' + ','.join(str(city_id) for city_id in city_ids)
+
+    # Request API. One call for the whole group, so it takes one token from the scheduler's rate limit.
+    def RequestGroup():
+        params = {'id': ','.join(str(city_id) for city_id in city_ids)}
+        return FETCH_POLICY.Call(lambda timeout: SendRequest('group',params,timeout,'group'),'group',SCHEDULER)
+    group_data = SCHEDULER.Fetch(key,RequestGroup,label='group') if SCHEDULER is not None else RequestGroup()
+
+    if 'list' not in group_data:
+        raise ValueError(f'group request failed: {group_data.get("message", group_data.get("cod"))}')
+    weather = {}
+    for weather_data in group_data['list']:
+        # Group entries have no status code of their own.
+        weather_data.setdefault('cod', 200)
+        weather[weather_data['id']] = weather_data
+    return weather
+
+# Dictionary: Current weather for many parsed sites with as few requests as possible. Site -> weather JSON.
+# Sites with a city id (given, or found in the local city index) are asked for GROUP_SIZE at a time.
+# Coordinates, unknown names, and cities a group request left out are asked for one at a time.
+# Cities in a group request that failed (rate limited, server error, network error) are not asked for again
+# one at a time, which would turn one refused call into GROUP_SIZE more. They get a stale copy when the cache
+# keeps one, otherwise the group's error.
+def BulkWeather(locations,max_workers=FLEET_WORKERS):
+    from concurrent.futures import ThreadPoolExecutor # Imported here to keep start up fast.
+
+    ReservePool(max_workers)
+    results = {}
+    singles = []
+    # City id -> sites that resolved to it. Two names for the same city share one entry.
+    by_id = {}
+    for location in locations:
+        resolved = ResolveSite(location)
+        if len(resolved) != 1:
+            singles.append(location)
+            continue
+        if WEATHER_CACHE is not None:
+            weather_data = WEATHER_CACHE.Get(CacheKey(resolved,UNITS))
+            if weather_data is not None:
+                results[location] = weather_data
+                continue
+        by_id.setdefault(int(resolved[0]), []).append(location)
+
+    city_ids = list(by_id)
+    groups = [city_ids[start:start + GROUP_SIZE] for start in range(0, len(city_ids), GROUP_SIZE)]
+
+    # Tuple: (group, city id -> weather JSON, error response). The error response is None when the group answered.
+    def FetchGroup(group):
+        try:
+            return group, GetWeatherGroup(group), None
+        except (OSError, ValueError) as error:
+            return group, {}, {'cod': 'error', 'message': str(error)}
+
+    # JSON: Weather for one site. Errors become an error response so one site does not stop the rest.
+    # Same errors Evaluate turns into an error decision.
+    def FetchSingle(location):
+        try:
+            return GetSiteWeather(location)
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            return {'cod': 'error', 'message': str(error)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for group, weather, group_error in executor.map(FetchGroup, groups):
+            for city_id in group:
+                if group_error is not None:
+                    stale = None
+                    if WEATHER_CACHE is not None and WEATHER_CACHE.stale_ttl:
+                        stale = WEATHER_CACHE.GetStale(CacheKey((city_id,),UNITS))
+                    for location in by_id[city_id]:
+                        results[location] = StaleWeather(stale,'group') if stale is not None else group_error
+                    continue
+                if city_id not in weather:
+                    singles.extend(by_id[city_id])
+                    continue
+                # Kept under the same key GetWeatherById uses.
+                if WEATHER_CACHE is not None:
+                    WEATHER_CACHE.Put(CacheKey((city_id,),UNITS),weather[city_id])
+                for location in by_id[city_id]:
+                    results[location] = weather[city_id]
+        for location, weather_data in zip(singles, executor.map(FetchSingle, singles)):
+            results[location] = weather_data
+    return results
+
+# JSON: Gets the 5 day / 3 hour forecast through API. location is the same as for Evaluate.
+def GetForecast(location):
+    location = ResolveSite(ParseSite(location))
+    return FetchWeather(location,LocationParams(location),'forecast')
+
+# Void: Loads the local city index. file_name None closes it so names go to the API again.
+def UseGazetteer(file_name=GAZETTEER_FILE):
+    global GAZETTEER
+    if GAZETTEER is not None:
+        GAZETTEER.Close()
+        GAZETTEER = None
+    if file_name is not None:
+        GAZETTEER = Gazetteer(file_name)
+    return
+
+# Void: Replaces the shared response cache. file_name keeps the cache on disk between runs.
+# stale_ttl serves expired weather up to that many seconds past ttl while a new copy is fetched.
+def ConfigureCache(ttl=CACHE_TTL,max_size=CACHE_SIZE,file_name=None,stale_ttl=STALE_TTL):
+    global WEATHER_CACHE
+    if WEATHER_CACHE is not None:
+        WEATHER_CACHE.Close()
+    WEATHER_CACHE = WeatherCache(ttl,max_size,file_name,stale_ttl)
+    return
+
+# Void: Replaces how API requests are made. Timeouts are seconds. hedge sends a second copy of a request
+# still running after the usual (p95) time. breaker=False never stops asking the API.
+def ConfigureFetch(connect_timeout=CONNECT_TIMEOUT,read_timeout=READ_TIMEOUT,retries=RETRIES,hedge=False,breaker=True):
+    global FETCH_POLICY
+    FETCH_POLICY = FetchPolicy(connect_timeout,read_timeout,retries,hedge,breaker=breaker,callers=POOL_SIZE)
+    return
+
+# Void: Replaces the scheduler. rate is the most API calls every per seconds (None for no limit).
+# burst is how many calls can go out at once after a quiet spell.
+def ConfigureScheduler(rate=None,per=60.0,burst=1):
+    global SCHEDULER
+    SCHEDULER = RequestScheduler(rate,per,burst)
+    return
+
+# Void: Adds every observation checked from now on to the history store in directory.
+def RecordHistory(directory):
+    global HISTORY
+    from droneweatherhistory import HistoryStore # Imported here to keep start up fast.
+    if HISTORY is not None:
+        HISTORY.Close()
+    HISTORY = HistoryStore(directory)
+    return
+
+# Class: One weather observation. The fields ExtractWeather pulls out of a weather JSON file.
+# Uses slots so a long list of observations stays small. Fields can also be read like a dictionary
+# (weather['wind_speed']) so the checks and reports take an Observation or a plain dictionary.
+class Observation:
+    # site_id is the openweathermap.org city id, weather_id the weather condition id. The rest match WEATHER_FIELDS.
+    __slots__ = ('site_id', 'weather_id') + WEATHER_FIELDS
+
+    # Void: Fields not given are None.
+    def __init__(self,**fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field))
+
+    def __getitem__(self,field):
+        try:
+            return getattr(self, field)
+        except (AttributeError, TypeError):
+            raise KeyError(field) from None
+
+    def __setitem__(self,field,value):
+        setattr(self, field, value)
+
+    def __contains__(self,field):
+        return field in self.__slots__
+
+    # Value: Field value, or default when the field does not exist.
+    def get(self,field,default=None):
+        return getattr(self, field, default) if field in self.__slots__ else default
+
+    # Dictionary: Observation as plain values for JSON output.
+    def ToDict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self,other):
+        if not isinstance(other, Observation):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f'Observation({self.site_id!r}, {self.loc_city!r}, time={self.time_current!r}, weather={self.weather_title!r}, wind={self.wind_speed!r})'
+
+# Observation: Pulls the report data out of the weather JSON file. Field names match PrintWeatherReport.
+def ExtractWeather(weather_data,user_state=''):
+
+    # Location and Time Data
+    weather = Observation()
+    weather.site_id = weather_data.get('id') # openweathermap.org city id
+    weather.loc_city = weather_data['name'] # City name
+    weather.loc_state = user_state.capitalize() # From user input
+    weather.loc_country = weather_data['sys']['country'] # Country (US = United States)
+    weather.loc_ground = weather_data['main']['grnd_level'] # Altitude above sea level (ft)
+    weather.loc_longitude = weather_data['coord']['lon'] # Longitude Coordinates
+    weather.loc_lattitude = weather_data['coord']['lat'] # Lattitude Coordinates
+    weather.time_current = weather_data['dt'] # Current time (UNIX time)
+    weather.time_sunrise = weather_data['sys']['sunrise'] # Sunrise at location (UNIX time)
+    weather.time_sunset = weather_data['sys']['sunset'] # Sunset at location (UNIX time)
+
+    # General Weather Data
+    weather.weather_id = weather_data['weather'][0]['id'] # Weather condition id (Ex: 701 = Mist)
+    weather.weather_title = weather_data['weather'][0]['main'] # Weather type
+    weather.weather_desc = weather_data['weather'][0]['description'] # Short description of current weather
+    weather.temp_current = weather_data['main']['temp'] # Current temperature
+    weather.temp_feelslike = weather_data['main']['feels_like'] # "Feels like" temperature
+    weather.pressure_sea = weather_data['main']['sea_level'] # Sea Level Pressure (hPa)
+    weather.humidity = weather_data['main']['humidity'] # Humidity (%)
+    weather.visibility = (weather_data['visibility']/1000) # Visibility (miles x 10^3 so dividing by 1000)
+
+    # Cloud Data
+    # Checks if clouds exists. If so it will show the cloud precentage more than zero.
+    weather.is_cloud = weather.weather_title in CLOUD_TITLES
+    if weather.is_cloud:
+        # Gets % of clouds in the sky
+        weather.cloud_percentage = weather_data['clouds']['all']
+    else:
+        # Defines cloud percentage if there is none.
+        weather.cloud_percentage = 0
+
+    # Wind Data
+    # Winds ceiling for larger safety margin.
+    weather.wind_speed = math.ceil(weather_data['wind']['speed'])
+    weather.wind_direction = weather_data['wind']['deg']
+    # Checks if Wind Gust exists. If so it will extend Wind Array to a length of 3.
+    weather.is_wind_gust = len(weather_data['wind']) == 3
+    if weather.is_wind_gust:
+        # Gusts ceiling for larger safety margin.
+        weather.wind_gust = math.ceil(weather_data['wind']['gust'])
+    else:
+        # Defines wind gust if there is none.
+        weather.wind_gust = 0
+
+    return weather
+
+# Integer: Checks hazardous weather, then user preferences. Takes the Observation from ExtractWeather. Returns a REASON code.
+def CheckWeatherCode(weather,profile=None):
+    # Hazardous Weather. Do not allow flight during these weather events.
+    if weather['weather_title'] in HAZARD_TITLES:
+        # Any of these titles are hazardous weather in aviation. Therefore not safe to fly.
+        return REASON_HAZARD
+
+    # Checks all weather conditions and compares with user preferences to determine if flight is safe.
+    return PrefCheckCode(weather['time_current'],weather['time_sunrise'],weather['time_sunset'],weather['weather_title'],weather['wind_speed'],weather['is_cloud'],profile)
+
+# List: Tuples of (PilotProfile, REASON code) for every pilot in a ProfileIndex allowed to fly in an Observation.
+# Gives the same answer as CheckWeatherCode for each pilot, without checking them one at a time.
+def EligiblePilots(weather,index):
+    if weather['weather_title'] in HAZARD_TITLES:
+        return []
+    # Same 30 minute buffer as PrefCheckCode.
+    is_night = weather['time_current'] >= weather['time_sunset'] - NIGHT_BUFFER or weather['time_current'] <= weather['time_sunrise'] + NIGHT_BUFFER
+    return [(profile, REASON_CLOUDS if clouds else REASON_AUTHORIZED)
+            for profile, clouds in index.Match(is_night, weather['weather_title'] in RAIN_TITLES, weather['wind_speed'], weather['is_cloud'])]
+
+# Bool & String: Checks hazardous weather, then user preferences. Takes the Observation from ExtractWeather.
+def CheckWeather(weather,profile=None):
+    reason_code = CheckWeatherCode(weather,profile)
+    return reason_code in SAFE_REASONS, ReasonMessage(reason_code,weather['weather_title'],weather['wind_speed'])
+
+# String: Weather title for an openweathermap.org weather condition id (Ex: 701 = Mist).
+def WeatherTitle(weather_id):
+    if weather_id in WEATHER_ID_TITLES:
+        return WEATHER_ID_TITLES[weather_id]
+    # Other ids are named by their group. 2xx = Thunderstorm, 3xx = Drizzle, 5xx = Rain, 6xx = Snow, 80x = Clouds.
+    return WEATHER_GROUP_TITLES.get(weather_id // 100, 'Clear')
+
+# Tuple: Parses one fleet site. Either "city, state, country", "lattitude, longitude" or an openweathermap.org city id.
+def ParseSite(site):
+    # Sites can already be a tuple or list from a calling script.
+    if isinstance(site, str):
+        site = [part.strip() for part in site.split(',')]
+    site = tuple(site)
+
+    # One number is a city id.
+    if len(site) == 1:
+        return (int(site[0]),)
+    # Two numbers are coordinates.
+    if len(site) == 2:
+        return float(site[0]), float(site[1])
+    # Three names are a city, state and country.
+    if len(site) == 3:
+        return site
+    raise ValueError(f'Site must be "city, state, country", "lattitude, longitude" or a city id: {site}')
+
+# Class: Flight decision for one location. Returned by Evaluate.
+class Decision:
+    __slots__ = ('location', 'safe', 'reason_code', 'reason', 'weather', 'stale_seconds')
+
+    # Void: location is the parsed site. weather is the Observation from ExtractWeather (None on errors).
+    # stale_seconds is how old the weather is when a stale cached copy was used, otherwise None.
+    def __init__(self,location,safe,reason_code,reason,weather=None,stale_seconds=None):
+        self.location = location
+        self.safe = safe
+        self.reason_code = reason_code
+        self.reason = reason
+        self.weather = weather
+        self.stale_seconds = stale_seconds
+
+    # Dictionary: Decision as plain values for JSON output.
+    def ToDict(self):
+        return {'location': ', '.join(str(part) for part in self.location) if self.location else None,
+                'safe': self.safe,
+                'reason': REASON_NAMES[self.reason_code],
+                'message': self.reason.replace('\n', ' '),
+                'stale_seconds': self.stale_seconds,
+                'weather': self.weather.ToDict() if self.weather is not None else None}
+
+    def __repr__(self):
+        return f'Decision({self.location!r}, safe={self.safe}, reason={REASON_NAMES[self.reason_code]!r})'
+
+# Decision: Checks a weather JSON file (the format GetWeather returns) against a pilot's preferences.
+# Does not use the network. location labels the decision. The API does not return a state so it comes from location.
+def EvaluateWeatherData(weather_data,profile=None,location=None):
+    user_state = location[1] if location and len(location) == 3 else ''
+
+    # Weather API returns the error code as a string or number.
+    if str(weather_data.get('cod')) != '200':
+        return Decision(location, False, REASON_ERROR, f'Error getting weather: {weather_data.get("message", weather_data.get("cod"))}')
+
+    label = LocationLabel(location)
+    stale_seconds = weather_data.get('stale_seconds')
+    with metrics.Stage('parse',label):
+        weather = ExtractCurrentWeather(weather_data,user_state)
+    with metrics.Stage('decide',label):
+        reason_code = CheckWeatherCode(weather,profile)
+    # Stale weather came from the cache while the API was slow or down. The message says so.
+    reason = ReasonMessage(reason_code,weather['weather_title'],weather['wind_speed']) + StaleNote(weather_data)
+
+    # Stale copies were already added when they were new.
+    if stale_seconds is None and HISTORY is not None:
+        HISTORY.Append(weather)
+    return Decision(location, reason_code in SAFE_REASONS, reason_code, reason, weather, stale_seconds)
+
+# Observation: ExtractWeather for weather that may be a stale cached copy (see StaleWeather).
+# Every check of weather from FetchWeather goes through here, so a stale copy is never checked at its old time.
+def ExtractCurrentWeather(weather_data,user_state=''):
+    weather = ExtractWeather(weather_data,user_state)
+    if weather_data.get('stale_seconds') is not None:
+        UseCurrentTime(weather)
+    return weather
+
+# String: Line added to a decision's message when the weather was a stale cached copy. Empty otherwise.
+def StaleNote(weather_data):
+    stale_seconds = weather_data.get('stale_seconds')
+    if stale_seconds is None:
+        return ''
+    return f'\nWeather is {math.ceil(stale_seconds / 60)} minutes old.'
+
+# Void: Moves a stale Observation to the current time. Sunrise and sunset are worked out for now and this place,
+# so the night check uses the real time and not the time the weather was recorded. Conditions stay as recorded.
+def UseCurrentTime(weather):
+    import time # Imported here to keep start up fast.
+    import droneweathersun as sun # Imported here because it imports this module.
+
+    weather.time_current = int(time.time())
+    weather.time_sunrise, weather.time_sunset = sun.SunTimes(weather.loc_lattitude,weather.loc_longitude,weather.time_current)
+    return
+
+# JSON: Gets the weather for a parsed site. Coordinates use the lat/lon request, names use the city request.
+def GetSiteWeather(location):
+    if len(location) == 1:
+        return GetWeatherById(location[0])
+    if len(location) == 2:
+        return GetWeatherByCoords(location[0],location[1])
+    return GetWeather(location[0],location[1],location[2])
+
+# Decision: Gets the weather for a location and checks it against a pilot's preferences.
+# location is "city, state, country", "lattitude, longitude", a city id or a tuple of any of them.
+# profile is a PilotProfile. Without one the pilot's preferences file is used.
+def Evaluate(location,profile=None):
+    location = ParseSite(location)
+    try:
+        return EvaluateWeatherData(GetSiteWeather(location),profile,location)
+
+    # Network errors are OSErrors. Bad JSON files are KeyErrors, TypeErrors or ValueErrors.
+    except (OSError, KeyError, TypeError, ValueError) as error:
+        return Decision(location, False, REASON_ERROR, f'Error getting weather: {error}')
+
+# Dictionary: Every pilot in a ProfileIndex allowed to fly at a location right now. Used for dispatch.
+# The weather is asked for once however many pilots there are.
+def EvaluatePilots(location,index):
+    location = ParseSite(location)
+    try:
+        weather_data = GetSiteWeather(location)
+    except OSError as error:
+        weather_data = {'cod': 'error', 'message': str(error)}
+    return EvaluatePilotsData(weather_data,index,location)
+
+# Dictionary: EvaluatePilots for a weather JSON file (the format GetWeather returns). Does not use the network.
+# A stale cached copy is checked at the current time, and stale_seconds says how old it is (None when fresh).
+def EvaluatePilotsData(weather_data,index,location):
+    result = {'location': ', '.join(str(part) for part in location), 'pilots': len(index)}
+    try:
+        if str(weather_data.get('cod')) != '200':
+            raise ValueError(weather_data.get('message', weather_data.get('cod')))
+        weather = ExtractCurrentWeather(weather_data, location[1] if len(location) == 3 else '')
+    except (KeyError, TypeError, ValueError) as error:
+        result.update({'eligible': 0, 'error': f'Error getting weather: {error}', 'allowed': []})
+        return result
+
+    allowed = EligiblePilots(weather,index)
+    result.update({'eligible': len(allowed), 'weather_title': weather['weather_title'], 'wind_speed': weather['wind_speed'],
+                   'stale_seconds': weather_data.get('stale_seconds'),
+                   'allowed': [{'name': profile.name, 'reason': REASON_NAMES[reason_code]} for profile, reason_code in allowed]})
+    return result
+
+# Generator: Checks many sites at once. Yields a Decision as each site finishes.
+# profile is a PilotProfile. Without one the pilot's preferences file is read once before the run.
+# bulk asks for cities GROUP_SIZE at a time (see BulkWeather) and yields the decisions in site order.
+def FleetCheckWeather(sites,max_workers=FLEET_WORKERS,profile=None,bulk=False):
+    from concurrent.futures import ThreadPoolExecutor, as_completed # Imported here to keep start up fast.
+
+    sites = [ParseSite(site) for site in sites]
+    if profile is None:
+        profile = PROFILE_STORE.Default()
+    ReservePool(max_workers)
+
+    if bulk:
+        weather = BulkWeather(sites,max_workers)
+        for site in sites:
+            try:
+                yield EvaluateWeatherData(weather[site],profile,site)
+            except (KeyError, TypeError, ValueError) as error:
+                yield Decision(site, False, REASON_ERROR, f'Error getting weather: {error}')
+        return
+
+    # Bounded pool. At most max_workers requests are in flight, all sharing the session's connection pool.
+    # One bad site does not stop the rest of the fleet, Evaluate returns an error decision for it.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(Evaluate, site, profile) for site in sites]
+        # Results come back in the order they finish, not the order given.
+        for future in as_completed(futures):
+            yield future.result()
+
+# Void: Runs fleet mode from a file with one site per line. Prints one line per site as it finishes.
+# as_json prints one JSON object per line instead of text.
+# report_file also writes every full report to one file as each site finishes (text, json, jsonl or csv).
+# bulk asks for cities GROUP_SIZE at a time.
+def RunFleet(file_name,max_workers=FLEET_WORKERS,profile=None,as_json=False,report_file=None,report_format=None,bulk=False):
+    import json # Imported here to keep start up fast.
+
+    # Reads sites from file. Skips blank lines and comments.
+    with open(file_name,'r') as file_object:
+        sites = [line.strip() for line in file_object if line.strip() and not line.startswith('#')]
+
+    # Reports are added to the file one at a time, so memory does not grow with the fleet.
+    report_object = None
+    writer = None
+    if report_file:
+        report_object = open(report_file,'w',newline='' if (report_format or FormatForFile(report_file)) == 'csv' else None,encoding='utf-8')
+        writer = ReportWriter(report_format or FormatForFile(report_file),report_object)
+
+    # Number of sites safe to fly at.
+    safe_count = 0
+    try:
+        for decision in FleetCheckWeather(sites,max_workers,profile,bulk):
+            if decision.safe:
+                safe_count += 1
+            with metrics.Stage('render',LocationLabel(decision.location)):
+                if writer is not None:
+                    writer.Write(decision)
+                if as_json:
+                    line = json.dumps(decision.ToDict())
+                else:
+                    # Reasons are written for the report screen so new lines are removed.
+                    status = 'SAFE' if decision.safe else 'NOT SAFE'
+                    line = f'{status:<8} | {", ".join(str(part) for part in decision.location)} | {decision.reason.replace(chr(10), " ")}'
+            print(line, flush=True)
+    finally:
+        if writer is not None:
+            writer.Close()
+            report_object.close()
+
+    # Summary goes to the error stream in JSON mode so the output stays one object per line.
+    summary = sys.stderr if as_json else sys.stdout
+    print(f'{safe_count} of {len(sites)} sites are safe to fly.', file=summary)
+    if report_file:
+        print(f'Reports written to {report_file}', file=summary)
+    if WEATHER_CACHE is not None:
+        stats = WEATHER_CACHE.Stats()
+        print(f'Cache: {stats["hits"]} hits, {stats["misses"]} misses, {stats["evictions"]} evictions.', file=summary)
+    return
 
 # Void: Disclaimer of use of application. Use must agree before using program.
 def Disclaimer():
@@ -205,79 +872,36 @@ def Disclaimer():
             ClearScreen() # Removes previous text from screen.
             print('Error! Please acknowledge disclaimer or close program.')
 
-# Void: Prints all weather data and recommendations.
-def PrintWeatherReport(loc_city,loc_state,loc_country,loc_ground,loc_longitude,loc_lattitude,weather_title,weather_desc,humidity,visibility,temp_current,temp_feelslike,pressure_sea,is_wind_gust,wind_speed,wind_direction,wind_gust,is_cloud,cloud_percentage,is_safe_to_fly,decision_reason):
-    ClearScreen() # Removes previous text from screen.
-    
-    # General Weather Report
-    
-    print(f'========== Weather Report ==========') # Title
-    print(f'Weather found for {loc_city}, {loc_state}, {loc_country}') # Location
-    print(f'Coordinates: {loc_longitude}°W,{loc_lattitude}°N') # Coordinates
-    print(f'Altitude: {loc_ground} feet above sea level') # Ground altitude at coordinates
-    print(f'Weather: {weather_title} ({weather_desc})') # Weather and small description
-    print(f'Temperature: {temp_current:0.1f}°F') # Temperature (actual)
-    print(f'Feels like {temp_feelslike:0.1f}°F') # Temperature (feels like)
-    print(f'Visibility: {visibility:0.1f} miles') # Visibility (miles)
-    
-    # Prints cloud coverage only if clouds exist.
-    if is_cloud:
-        print(f'Clouds are covering {cloud_percentage:0.0f}% of the sky')
-    
-    print(f'Humidity: {humidity:0.0f}%') #Prints Humidity 
-    print(f'Sea Level Pressure: {pressure_sea} hPa') # Prints Sea Level Pressure
-    
-    # Prints wind speeds and gusts if there are any.
-    if wind_speed <= 3:
-        # Calm winds are generally considered less than 3 knots in aviation.
-        print('Winds are calm. (less than 3 mph)')
-    else:
-        # If the winds are not calm then print the wind and its direction
-        if is_wind_gust:
-            print(f'Winds: {wind_speed} mph from {wind_direction}°, Gusting {wind_gust} mph')
-        else:
-            print(f'Winds: {wind_speed} mph from {wind_direction}°')
-    
-    # Styling seperation
-    print('\n' + '------------------------------------' + '\n')
-    
-    # Recommendation
-
-    print('========== Recommendation ==========') # Title
-
-    # Prints if you are safe to fly determined by PrefCheckWeather function
-    print("By the information provided you are")
-    if is_safe_to_fly:
-        # Prints safe to fly
-        print('SAFE to fly!')
-        
-        # 'Clouds Indicated' is a special case since the API cannot determine cloud altitude.
-        # So it is safe to fly but gives notice that clouds are in the vacinity of the airspace. 
-        if decision_reason == 'Clouds Indicated':
-            print('\n' + 'NOTICE: Clouds indicated in vacinity' + '\n' + 'of airspace.')
-    else:
-        # Prints not safe to fly with reason determined by PrefCheckWeather function
-        print('NOT SAFE to fly.')
-        print('\n'+ f'Reason: {decision_reason}')
-    
-    # If there are clouds print a notice about having visual line of sight.
-    if is_cloud:
-        print('\n' + 'NOTICE: The current API used does not' + '\n' + 
-            'allow any cloud layers to be seen by' + '\n' + 
-            'the program. Please ensure you will' + '\n' + 
-            'have a visual line of sight with the' + '\n' + 
-            'drone before starting flight operation.')
-    print('\n' + '======= End of Weather Report =======' + '\n')
+# Void: Shows the weather report and recommendation. The screen clear and the whole report are written at once.
+def ShowWeatherReport(weather,is_safe_to_fly,decision_reason):
+    with metrics.Stage('render',LocationLabel((weather['loc_city'],weather['loc_state'],weather['loc_country']))):
+        report = RenderTextReport(weather,is_safe_to_fly,decision_reason)
+        # Removes previous text from screen in the same write.
+        if sys.stdout.isatty():
+            report = CLEAR_SCREEN + report
+        sys.stdout.write(report)
+        sys.stdout.flush()
 
     HoldOnScreen() # Keeps previous message on screen for user to read.
 
     # Returns back to main function
     return
 
+# Void: Prints all weather data and recommendations. Kept for scripts written against the old argument list.
+def PrintWeatherReport(loc_city,loc_state,loc_country,loc_ground,loc_longitude,loc_lattitude,weather_title,weather_desc,humidity,visibility,temp_current,temp_feelslike,pressure_sea,is_wind_gust,wind_speed,wind_direction,wind_gust,is_cloud,cloud_percentage,is_safe_to_fly,decision_reason):
+    weather = {'loc_city': loc_city, 'loc_state': loc_state, 'loc_country': loc_country, 'loc_ground': loc_ground,
+               'loc_longitude': loc_longitude, 'loc_lattitude': loc_lattitude, 'weather_title': weather_title,
+               'weather_desc': weather_desc, 'humidity': humidity, 'visibility': visibility, 'temp_current': temp_current,
+               'temp_feelslike': temp_feelslike, 'pressure_sea': pressure_sea, 'is_wind_gust': is_wind_gust,
+               'wind_speed': wind_speed, 'wind_direction': wind_direction, 'wind_gust': wind_gust,
+               'is_cloud': is_cloud, 'cloud_percentage': cloud_percentage}
+    ShowWeatherReport(weather,is_safe_to_fly,decision_reason)
+    return
+
 # Void: Creates and writes a preferences.dat file to hold user drone data.
 def PrefWrite():
     # Creates prefrences data file to write.
-    file_object = open('droneweatherprefrences.dat','w')
+    file_object = open(PREF_FILE,'w')
     
     # Bool value to control movement through writing
     flag = True
@@ -340,55 +964,68 @@ def PrefWrite():
 
     return
 
-# Bool & String: Checks preferences.dat file and compares it to current weather data.
-def PrefCheckWeather(time_current,time_sunrise,time_sunset,weather_title,wind_speed,is_cloud):
+# Integer: Checks user preferences against current weather data. Returns a REASON code.
+# profile is a PilotProfile. Without one the preferences.dat file is used (read again only if it changed).
+def PrefCheckCode(time_current,time_sunrise,time_sunset,weather_title,wind_speed,is_cloud,profile=None):
 
-    # Opens prefrences file to read
-    file_object = open('droneweatherprefrences.dat','r')
+    # Loads the pilot's own preferences file if no profile is given.
+    if profile is None:
+        with metrics.Stage('prefs'):
+            profile = PROFILE_STORE.Default()
 
-    # Reads each preference setting and saves it as a variable. Strips new line character.
-    user_night = (file_object.readline()).rstrip('\n')
-    user_rain = (file_object.readline()).rstrip('\n')
-    user_wind = (file_object.readline()).rstrip('\n')
-    user_wind = float(user_wind)
-    user_cloud = (file_object.readline()).rstrip('\n')
-
-    # Closes preferences file.
-    file_object.close()
-
-    # Checks all parameters. Return false if any parameter is false.
+    # Checks all parameters. Return the first one that fails.
 
     # Checks night time. 
     # Provides 30 minute buffer on each end. Weather API gives in UNIX time so it will be (+- 1800) seconds for 30 minutes.
-    time_sunrise = time_sunrise + 1800
-    time_sunset = time_sunset - 1800
-    if user_night == 'False':
+    time_sunrise = time_sunrise + NIGHT_BUFFER
+    time_sunset = time_sunset - NIGHT_BUFFER
+    if not profile.night:
         if (time_current >= time_sunset) or (time_current <= time_sunrise):
-            return False, 'User is not authorized to fly\nat night.'
+            return REASON_NIGHT
     
     # Checks raining
-    if user_rain == 'False':
-        if weather_title == 'Rain' or weather_title == 'Thunderstorm' or weather_title == 'Mist':
-            return False, f'User is not authorized to fly\nin {weather_title} conditions.'
+    if not profile.rain:
+        if weather_title in RAIN_TITLES:
+            return REASON_RAIN
 
     # Checks winds 
-    if user_wind < wind_speed:
-        return False, f'User is not authorized to fly\nin winds over {wind_speed} mph.'
+    if profile.wind < wind_speed:
+        return REASON_WIND
 
     # Checks clouds
-    if is_cloud and (user_cloud == 'False'):
-        # Returns true on purpose. API Does not see cloud height. This will warn user of clouds in print function.
-        return True, 'Clouds Indicated'
+    if is_cloud and not profile.cloud:
+        # Safe on purpose. API Does not see cloud height. This will warn user of clouds in print function.
+        return REASON_CLOUDS
 
-    # if all is good then return true. 'Authorized' so decision is not void.
-    return True, 'Authorized.'
+    # if all is good then it is authorized.
+    return REASON_AUTHORIZED
+
+# String: Message shown on the report for a REASON code.
+def ReasonMessage(reason_code,weather_title,wind_speed):
+    if reason_code == REASON_HAZARD:
+        return f'{weather_title} is hazardous\nweather for flight.'
+    if reason_code == REASON_NIGHT:
+        return 'User is not authorized to fly\nat night.'
+    if reason_code == REASON_RAIN:
+        return f'User is not authorized to fly\nin {weather_title} conditions.'
+    if reason_code == REASON_WIND:
+        return f'User is not authorized to fly\nin winds over {wind_speed} mph.'
+    if reason_code == REASON_CLOUDS:
+        return 'Clouds Indicated'
+    # 'Authorized' so decision is not void.
+    return 'Authorized.'
+
+# Bool & String: Checks user preferences and compares it to current weather data.
+def PrefCheckWeather(time_current,time_sunrise,time_sunset,weather_title,wind_speed,is_cloud,profile=None):
+    reason_code = PrefCheckCode(time_current,time_sunrise,time_sunset,weather_title,wind_speed,is_cloud,profile)
+    return reason_code in SAFE_REASONS, ReasonMessage(reason_code,weather_title,wind_speed)
 
 # Void: Updates user preferenes file. File used to compare with current weather data.
 def UpdatePreferences():
     # Try and Except incase file is not found within the directory.
     try:
         # Checks if preferences are in the directory.
-        file_object = open('droneweatherprefrences.dat','r')
+        file_object = open(PREF_FILE,'r')
 
         # Boolean to control infinite loop for inputs
         flag = True
@@ -502,5 +1139,115 @@ def RunMainAgain():
     # Returns false as default case.
     return False
 
-# Calls main function
-main()
+# Void: Runs the program from the command line. Interactive unless fleet or headless mode is chosen.
+def CommandLine(argv=None):
+    global WEATHER_CACHE
+    import json, argparse # Imported here so importing this module stays fast.
+
+    parser = argparse.ArgumentParser(description='Weather recommendations for drone flight.')
+    parser.add_argument('--fleet', metavar='FILE', help='file with one site per line: "city, state, country", "lattitude, longitude" or a city id')
+    parser.add_argument('--headless', metavar='LOCATION', help='check one location without questions and print the decision as JSON')
+    parser.add_argument('--weather-json', metavar='FILE', help='with --headless, check a saved weather JSON file instead of asking the API')
+    parser.add_argument('--json', action='store_true', help='print fleet results as one JSON object per line')
+    parser.add_argument('--report', metavar='FILE', help='write every fleet report to one file (format from the file ending)')
+    parser.add_argument('--format', choices=('text', 'json', 'jsonl', 'csv'), help='report file format (default: from the file ending)')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    parser.add_argument('--pilots', metavar='FILE', help='with --headless, list every pilot in this CSV file (name,night,rain,wind,cloud) allowed to fly')
+    parser.add_argument('--bulk', action='store_true', help=f'fleet mode: ask for cities {GROUP_SIZE} at a time by city id (names need a local city index)')
+    parser.add_argument('--workers', type=int, default=FLEET_WORKERS, help='number of sites fetched at the same time')
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL, help='seconds a weather response stays fresh')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='most weather responses kept in the cache')
+    parser.add_argument('--cache-file', metavar='FILE', help='keep the cache on disk so the next run starts warm')
+    parser.add_argument('--rate-limit', type=float, metavar='CALLS', help='most API calls per minute (the free plan allows 60)')
+    parser.add_argument('--no-cache', action='store_true', help='always ask the weather API')
+    parser.add_argument('--stale', type=int, default=STALE_TTL, metavar='SECONDS', help='serve expired weather up to this long (marked stale) while it is fetched again or the API is down')
+    parser.add_argument('--timeout', type=float, default=READ_TIMEOUT, help='seconds to wait for the API to answer')
+    parser.add_argument('--retries', type=int, default=RETRIES, help='times a failed API request is tried again')
+    parser.add_argument('--hedge', action='store_true', help='send a second copy of an API request that runs past the usual (p95) time')
+    parser.add_argument('--gazetteer', metavar='FILE', help=f'local city index (default: {GAZETTEER_FILE} when it exists)')
+    parser.add_argument('--history', metavar='DIR', help='add every checked observation to a history store')
+    parser.add_argument('--metrics', metavar='FILE', help='time every stage and write the metrics on exit (.json for JSON, otherwise Prometheus text)')
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.Enable()
+
+    # City names are looked up locally when an index is available.
+    if args.gazetteer:
+        UseGazetteer(args.gazetteer)
+    elif os.path.exists(GAZETTEER_FILE):
+        UseGazetteer(GAZETTEER_FILE)
+
+    if args.no_cache:
+        WEATHER_CACHE = None
+    else:
+        ConfigureCache(args.cache_ttl,args.cache_size,args.cache_file,args.stale)
+
+    if args.rate_limit:
+        ConfigureScheduler(args.rate_limit)
+
+    ConfigureFetch(read_timeout=args.timeout,retries=args.retries,hedge=args.hedge)
+    # Every fleet worker can keep its own connection to the API open.
+    ReservePool(args.workers)
+
+    if args.history:
+        RecordHistory(args.history)
+
+    try:
+        # Headless and fleet runs read the preferences before any weather is asked for.
+        # Interactive mode writes the file itself, and --pilots brings its own limits.
+        try:
+            if args.profile:
+                profile = PROFILE_STORE.Load('command line',args.profile)
+            elif args.fleet or (args.headless is not None and not args.pilots):
+                profile = PROFILE_STORE.Default()
+            else:
+                profile = None
+        except FileNotFoundError as error:
+            print(f'Error! No preferences file {error.filename}. Pass --profile FILE, or run without --headless to write one.', file=sys.stderr)
+            # Exit status 3 so a script can tell a missing preferences file from a decision.
+            return 3
+
+        if args.headless is not None:
+            # Saved weather is checked offline. The location only labels the result.
+            if args.pilots:
+                index = ProfileIndex.FromFile(args.pilots)
+                if args.weather_json:
+                    with open(args.weather_json,'r') as file_object:
+                        result = EvaluatePilotsData(json.load(file_object),index,ParseSite(args.headless))
+                else:
+                    with UsePriority(PRIORITY_URGENT):
+                        result = EvaluatePilots(args.headless,index)
+                print(json.dumps(result))
+                # Exit status 0 when any pilot may fly, 1 when none may, 2 when the weather could not be found.
+                return 2 if 'error' in result else int(not result['eligible'])
+            if args.weather_json:
+                with open(args.weather_json,'r') as file_object:
+                    decision = EvaluateWeatherData(json.load(file_object),profile,ParseSite(args.headless))
+            else:
+                # A pilot is waiting on this check, so it goes ahead of any queued calls.
+                with UsePriority(PRIORITY_URGENT):
+                    decision = Evaluate(args.headless,profile)
+            with metrics.Stage('render',LocationLabel(decision.location)):
+                output = json.dumps(decision.ToDict())
+            print(output)
+            # Exit status 0 when safe to fly, 1 when not, 2 when the weather could not be found.
+            return 2 if decision.reason_code == REASON_ERROR else int(not decision.safe)
+        elif args.fleet:
+            RunFleet(args.fleet,args.workers,profile,args.json,args.report,args.format,args.bulk)
+        else:
+            main()
+    finally:
+        # Saves the disk cache.
+        if WEATHER_CACHE is not None:
+            WEATHER_CACHE.Close()
+        # Writes the last observations to the history store.
+        if HISTORY is not None:
+            HISTORY.Close()
+        if args.metrics:
+            metrics.WriteMetrics(args.metrics)
+    return 0
+
+# Calls main function only when run as a script. Importing this module runs nothing.
+if __name__ == '__main__':
+    sys.exit(CommandLine())
@@ -0,0 +1,159 @@
+# File Name: droneweathercache.py
+# Description: Response cache in front of the weather API. Entries expire after a freshness time (TTL)
+#              and the least recently used entry is removed when the cache is full (LRU).
+#              Can be saved to disk so a restarted program starts with a warm cache.
+# API Used: openweathermap.org (data only updates about every 10 minutes)
+
+
+import time # Entry ages (UNIX time so ages still work after a restart)
+import threading # Cache is shared by fleet worker threads
+from collections import OrderedDict # Keeps entries in least to most recently used order
+
+# Seconds a weather response stays fresh. OpenWeatherMap updates about every 10 minutes.
+CACHE_TTL = 600
+# Most responses held in memory before the least recently used one is removed.
+CACHE_SIZE = 512
+# Seconds an expired response is kept to be served as stale while a new one is fetched. 0 keeps none.
+STALE_TTL = 0
+
+
+# String: Builds the cache key from the API endpoint, a normalized location and the units.
+# Location is (city, state, country) names, (lattitude, longitude) numbers or a (city id,).
+def CacheKey(location,units,endpoint='weather'):
+    # Coordinates are rounded to about 10 meters so tiny differences share an entry.
+    if len(location) == 2:
+        return f'{endpoint}:{float(location[0]):.4f},{float(location[1]):.4f}|{units}'
+    # Names ignore case and spaces on the edges. "Atlanta , GA" and "atlanta,ga" are the same.
+    return f'{endpoint}:' + ','.join(str(part).strip().lower() for part in location) + f'|{units}'
+
+# Class: TTL + LRU cache of weather JSON responses with optional disk persistence.
+class WeatherCache:
+
+    # Void: Sets up the cache. file_name is optional. Without it the cache is memory only.
+    # stale_ttl keeps expired responses that long for GetStale.
+    def __init__(self,ttl=CACHE_TTL,max_size=CACHE_SIZE,file_name=None,stale_ttl=STALE_TTL):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.file_name = file_name
+        self.stale_ttl = stale_ttl
+
+        # key -> (time stored, weather JSON). Oldest used first.
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shelf = None
+
+        # Counters used to tune the cache against the API quota.
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.stale = 0
+
+        # Warm start. Loads entries saved by an earlier run that are still fresh.
+        if file_name:
+            import shelve # On-disk store. Imported here because most runs keep the cache in memory.
+            self._shelf = shelve.open(file_name)
+            self._Load()
+
+    # Void: Reads the disk store into memory. Expired entries are deleted from disk.
+    def _Load(self):
+        now = time.time()
+        fresh = []
+        for key in list(self._shelf.keys()):
+            stored_at, weather_data = self._shelf[key]
+            if now - stored_at < self.ttl + self.stale_ttl:
+                fresh.append((stored_at, key, weather_data))
+            else:
+                del self._shelf[key]
+
+        # Oldest first so the newest end up as most recently used. Only the newest max_size are kept.
+        fresh.sort()
+        for stored_at, key, weather_data in fresh[-self.max_size:]:
+            self._entries[key] = (stored_at, weather_data)
+        for stored_at, key, weather_data in fresh[:-self.max_size]:
+            del self._shelf[key]
+
+    # JSON or None: Gets a fresh response from the cache. None means the API must be asked.
+    def Get(self,key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Too old. Data on the server has likely changed. Kept a while longer if stale copies are wanted.
+            stored_at, weather_data = entry
+            age = time.time() - stored_at
+            if age >= self.ttl:
+                if age >= self.ttl + self.stale_ttl:
+                    self._Remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            # Marks entry as most recently used.
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return weather_data
+
+    # Tuple or None: (weather JSON, seconds old) for an expired response still inside the stale time.
+    # None when there is none. Does not change the hit and miss counts.
+    def GetStale(self,key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, weather_data = entry
+            age = time.time() - stored_at
+            if not self.ttl <= age < self.ttl + self.stale_ttl:
+                return None
+            self.stale += 1
+            return weather_data, age
+
+    # Void: Stores a response. Removes the least recently used entry if the cache is full.
+    def Put(self,key,weather_data):
+        with self._lock:
+            stored_at = time.time()
+            self._entries[key] = (stored_at, weather_data)
+            self._entries.move_to_end(key)
+            if self._shelf is not None:
+                self._shelf[key] = (stored_at, weather_data)
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._Remove(oldest_key)
+                self.evictions += 1
+
+    # Void: Removes one entry from memory and disk. Lock must already be held.
+    def _Remove(self,key):
+        del self._entries[key]
+        if self._shelf is not None and key in self._shelf:
+            del self._shelf[key]
+
+    # Void: Empties the cache. Counters are kept.
+    def Clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._Remove(key)
+
+    # Dictionary: Counters and size for tuning the TTL and size against the API quota.
+    def Stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'expired': self.expired,
+                    'evictions': self.evictions,
+                    'stale': self.stale,
+                    'size': len(self._entries),
+                    'hit_rate': (self.hits / lookups) if lookups else 0.0}
+
+    # Void: Writes the disk store and closes it.
+    def Close(self):
+        with self._lock:
+            if self._shelf is not None:
+                self._shelf.close()
+                self._shelf = None
+
+    def __len__(self):
+        return len(self._entries)
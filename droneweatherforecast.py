@@ -0,0 +1,223 @@
+# File Name: droneweatherforecast.py
+# Description: Finds flight windows in the 5 day / 3 hour forecast. Every forecast slot is checked against the
+#              pilot's preferences (including the 30 minute night buffer) and safe time is merged into windows.
+# API Used: openweathermap.org /data/2.5/forecast
+# Usage: python droneweatherforecast.py "atlanta, ga, us" --profile droneweatherprefrences.dat
+
+# EXAMPLE: Forecast JSON file (shortened to one slot)
+'''
+{'cod': '200', 'cnt': 40,
+'list': [{'dt': 1722265200,
+          'main': {'temp': 75.2, 'feels_like': 76.1, 'pressure': 1019, 'sea_level': 1019, 'grnd_level': 983, 'humidity': 88},
+          'weather': [{'id': 803, 'main': 'Clouds', 'description': 'broken clouds', 'icon': '04d'}],
+          'clouds': {'all': 75}, 'wind': {'speed': 5.1, 'deg': 240, 'gust': 8.3}, 'visibility': 10000,
+          'pop': 0.1, 'sys': {'pod': 'd'}, 'dt_txt': '2024-07-29 15:00:00'}],
+'city': {'id': 4192375, 'name': 'Dunwoody', 'coord': {'lat': 33.9462, 'lon': -84.3346}, 'country': 'US',
+         'timezone': -14400, 'sunrise': 1722250020, 'sunset': 1722300023}}
+'''
+
+
+import sys # Standard output
+import math # Ceiling of wind speeds
+from datetime import datetime, timezone, timedelta # Printing window times in local time
+
+import droneweather as dw # Flight decision
+from droneweatherprofile import PilotProfile # Profile copy that skips the night check
+import droneweathersun as sun # Sunrise and sunset for days after today
+
+# Seconds covered by one forecast slot. 3 hours.
+SLOT_LENGTH = 10800
+# Seconds in a day. Sunrise and sunset move by about this much each day.
+DAY_LENGTH = 86400
+
+
+# Tuple: Sunrise and sunset (UNIX time) for the local day a time falls on.
+# The forecast only gives today's sunrise and sunset, so each slot's own day is worked out from the city's
+# coordinates. Without coordinates today's times are moved to the slot's day.
+def SunTimes(time_current,city):
+    if 'coord' in city:
+        return sun.SunTimes(city['coord']['lat'], city['coord']['lon'], time_current)
+    offset = city.get('timezone', 0)
+    days = (time_current + offset) // DAY_LENGTH - (city['sunrise'] + offset) // DAY_LENGTH
+    return city['sunrise'] + days * DAY_LENGTH, city['sunset'] + days * DAY_LENGTH
+
+# Dictionary: One forecast slot in the same form ExtractWeather gives for current weather.
+def ExtractForecastSlot(slot,city):
+    time_sunrise, time_sunset = SunTimes(slot['dt'],city)
+    weather_title = slot['weather'][0]['main']
+    is_cloud = weather_title in dw.CLOUD_TITLES
+    wind = slot['wind']
+    return {'loc_city': city.get('name'),
+            'loc_country': city.get('country'),
+            'loc_longitude': city.get('coord', {}).get('lon'),
+            'loc_lattitude': city.get('coord', {}).get('lat'),
+            'time_current': slot['dt'],
+            'time_sunrise': time_sunrise,
+            'time_sunset': time_sunset,
+            'weather_title': weather_title,
+            'weather_desc': slot['weather'][0]['description'],
+            'temp_current': slot['main']['temp'],
+            'humidity': slot['main']['humidity'],
+            'visibility': slot.get('visibility', 0) / 1000,
+            'is_cloud': is_cloud,
+            'cloud_percentage': slot['clouds']['all'] if is_cloud else 0,
+            # Winds ceiling for larger safety margin.
+            'wind_speed': math.ceil(wind['speed']),
+            'wind_direction': wind.get('deg'),
+            'is_wind_gust': 'gust' in wind,
+            'wind_gust': math.ceil(wind['gust']) if 'gust' in wind else 0}
+
+# List: Checks every forecast slot. Returns one (start, end, reason code) per slot. start and end are UNIX times.
+# A safe slot is cut down to the daylight part when the pilot is not night certified.
+def CheckForecastSlots(forecast_data,profile=None):
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+    # Weather is checked with the night check turned off. Night is then cut out of the slot by time,
+    # so a slot that starts before sunrise still counts once the 30 minute buffer has passed.
+    weather_profile = PilotProfile(profile.name, True, profile.rain, profile.wind, profile.cloud)
+
+    city = forecast_data['city']
+    slots = []
+    for slot in forecast_data['list']:
+        weather = ExtractForecastSlot(slot,city)
+        start = slot['dt']
+        end = start + SLOT_LENGTH
+        reason_code = dw.CheckWeatherCode(weather,weather_profile)
+
+        if reason_code in dw.SAFE_REASONS and not profile.night:
+            # Same 30 minute buffer on each end as PrefCheckWeather.
+            start = max(start, weather['time_sunrise'] + dw.NIGHT_BUFFER)
+            end = min(end, weather['time_sunset'] - dw.NIGHT_BUFFER)
+            if end <= start:
+                # No daylight left in this slot.
+                start, end, reason_code = slot['dt'], slot['dt'] + SLOT_LENGTH, dw.REASON_NIGHT
+        slots.append((start, end, reason_code))
+    return slots
+
+# List: Merges checked slots into flight windows with one pass over the slots (they are in time order).
+# Each window is a dictionary with start, end, minutes and whether clouds were indicated during it.
+def MergeWindows(slots,min_minutes=0):
+    windows = []
+    current = None
+    for start, end, reason_code in slots:
+        if reason_code not in dw.SAFE_REASONS:
+            continue
+        # Touches the window being built. Extend it.
+        if current is not None and start <= current['end']:
+            current['end'] = max(current['end'], end)
+            current['clouds'] = current['clouds'] or reason_code == dw.REASON_CLOUDS
+        else:
+            current = {'start': start, 'end': end, 'clouds': reason_code == dw.REASON_CLOUDS}
+            windows.append(current)
+
+    for window in windows:
+        window['minutes'] = (window['end'] - window['start']) // 60
+    return [window for window in windows if window['minutes'] >= min_minutes]
+
+# Dictionary: Flight windows for one forecast. Has every window, the earliest and the longest (earliest on ties).
+def FindFlightWindows(forecast_data,profile=None,min_minutes=0):
+    if str(forecast_data.get('cod')) != '200':
+        return {'error': f'Error getting forecast: {forecast_data.get("message", forecast_data.get("cod"))}',
+                'windows': [], 'earliest': None, 'longest': None}
+
+    windows = MergeWindows(CheckForecastSlots(forecast_data,profile),min_minutes)
+    longest = None
+    for window in windows:
+        if longest is None or window['minutes'] > longest['minutes']:
+            longest = window
+    return {'city': forecast_data['city'].get('name'),
+            'timezone': forecast_data['city'].get('timezone', 0),
+            'windows': windows,
+            'earliest': windows[0] if windows else None,
+            'longest': longest}
+
+# Generator: Flight windows for a whole fleet in one pass. forecasts is (location, forecast JSON) pairs,
+# for example saved payloads. Yields (location, windows dictionary). Preferences are read once.
+def FleetFlightWindows(forecasts,profile=None,min_minutes=0):
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+    for location, forecast_data in forecasts:
+        try:
+            yield location, FindFlightWindows(forecast_data,profile,min_minutes)
+        except (KeyError, TypeError, ValueError, IndexError) as error:
+            # A damaged forecast must not stop the rest of the fleet.
+            yield location, {'error': f'Missing forecast data: {error}', 'windows': [], 'earliest': None, 'longest': None}
+
+# Generator: Fetches forecasts for many sites at once and yields (location, windows dictionary) as each finishes.
+def FetchFleetWindows(sites,max_workers=dw.FLEET_WORKERS,profile=None,min_minutes=0):
+    from concurrent.futures import ThreadPoolExecutor, as_completed # Imported here to keep start up fast.
+
+    sites = [dw.ParseSite(site) for site in sites]
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+    dw.ReservePool(max_workers)
+
+    # Network errors are OSErrors. They become an error for that site only.
+    def FetchOne(site):
+        try:
+            return site, dw.GetForecast(site)
+        except (OSError, ValueError) as error:
+            return site, {'cod': 'error', 'message': str(error)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(FetchOne, site) for site in sites]
+        fetched = (future.result() for future in as_completed(futures))
+        yield from FleetFlightWindows(fetched,profile,min_minutes)
+
+# String: UNIX time as local time at the forecast city.
+def LocalTime(unix_time,offset):
+    return datetime.fromtimestamp(unix_time, timezone(timedelta(seconds=offset))).strftime('%a %b %d %H:%M')
+
+# Void: Prints the windows for one location.
+def PrintWindows(location,result):
+    print(f'========== Flight Windows: {", ".join(str(part) for part in location)} ==========')
+    if result.get('error'):
+        print(result['error'])
+    elif not result['windows']:
+        print('No safe flight windows in the next 5 days.')
+    else:
+        offset = result['timezone']
+        for window in result['windows']:
+            notice = ' (clouds indicated)' if window['clouds'] else ''
+            print(f'{LocalTime(window["start"], offset)} to {LocalTime(window["end"], offset)}  {window["minutes"] // 60}h {window["minutes"] % 60:02d}m{notice}')
+        print(f'Earliest: {LocalTime(result["earliest"]["start"], offset)}')
+        print(f'Longest: {LocalTime(result["longest"]["start"], offset)} ({result["longest"]["minutes"] // 60}h {result["longest"]["minutes"] % 60:02d}m)')
+    print('')
+    return
+
+def main(argv=None):
+    import json, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Find safe flight windows in the 5 day forecast.')
+    parser.add_argument('locations', nargs='*', help='"city, state, country" or "lattitude, longitude"')
+    parser.add_argument('--fleet', metavar='FILE', help='file with one site per line')
+    parser.add_argument('--forecast-json', metavar='FILE', help='check a saved forecast JSON file instead of asking the API')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    parser.add_argument('--min-minutes', type=int, default=0, help='shortest window worth reporting')
+    parser.add_argument('--workers', type=int, default=dw.FLEET_WORKERS, help='number of forecasts fetched at the same time')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per location')
+    args = parser.parse_args(argv)
+
+    profile = dw.PROFILE_STORE.Load('forecast',args.profile) if args.profile else None
+
+    if args.forecast_json:
+        with open(args.forecast_json,'r') as file_object:
+            forecast_data = json.load(file_object)
+        location = tuple(args.locations) or (forecast_data.get('city', {}).get('name', args.forecast_json),)
+        results = FleetFlightWindows([(location, forecast_data)],profile,args.min_minutes)
+    else:
+        sites = list(args.locations)
+        if args.fleet:
+            with open(args.fleet,'r') as file_object:
+                sites += [line.strip() for line in file_object if line.strip() and not line.startswith('#')]
+        results = FetchFleetWindows(sites,args.workers,profile,args.min_minutes)
+
+    for location, result in results:
+        if args.json:
+            print(json.dumps({'location': ', '.join(str(part) for part in location), **result}), flush=True)
+        else:
+            PrintWindows(location,result)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,324 @@
+# File Name: droneweathergazetteer.py
+# Description: Local index of city names and coordinates (gazetteer). Finds a city's id and coordinates
+#              without asking the weather API, so requests can use the exact id= or lat/lon forms.
+#              The index is one file that is memory mapped, so opening it is instant and only the parts
+#              that are looked at are read from disk.
+# Data Used: openweathermap.org city list (http://bulk.openweathermap.org/sample/city.list.json.gz)
+# Usage: python droneweathergazetteer.py build city.list.json.gz droneweathergazetteer.idx
+#        python droneweathergazetteer.py lookup droneweathergazetteer.idx "dunwoody, ga, us"
+#        python droneweathergazetteer.py nearest droneweathergazetteer.idx 33.94 -84.33
+
+# EXAMPLE: One record of the city list
+'''
+{"id": 4192375, "name": "Dunwoody", "state": "GA", "country": "US", "coord": {"lon": -84.334633, "lat": 33.946209}}
+'''
+
+
+import sys # Byte order of this computer
+import math # Distances between coordinates
+import mmap # Memory mapped index file
+import struct # Index file header
+import bisect # Binary search of sorted names
+import unicodedata # Removing accents from names
+from array import array # Building the index columns
+
+# Default index file. Loaded by droneweather.py when it is in the working directory.
+GAZETTEER_FILE = 'droneweathergazetteer.idx'
+
+# Index file marker and format version.
+MAGIC = b'DWGZ'
+VERSION = 1
+# Header: marker, version, byte order (0 little, 1 big), record count, then (offset, length) of every section.
+SECTIONS = ('name_offsets', 'names', 'display_offsets', 'displays', 'ids', 'lats', 'lons', 'regions', 'cell_starts', 'cell_records')
+HEADER = struct.Struct('<4sHHI' + 'QQ' * len(SECTIONS))
+
+# Spatial grid. One cell for every whole degree of lattitude and longitude.
+GRID_ROWS = 180
+GRID_COLUMNS = 360
+# Kilometers in one degree of lattitude. Also the radius of the Earth used for distances.
+KM_PER_DEGREE = 111.195
+EARTH_RADIUS_KM = 6371.0
+# Bytes per record for country and state codes (2 each, padded with spaces).
+REGION_SIZE = 4
+
+
+# String: Name made easy to compare. Lower case, no accents, single spaces. "Zürich " -> "zurich".
+def NameKey(name):
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(letter for letter in name if not unicodedata.combining(letter))
+    return ' '.join(name.casefold().split())
+
+# Integer: Grid cell number for coordinates.
+def CellNumber(lattitude,longitude):
+    row = min(GRID_ROWS - 1, max(0, int(math.floor(lattitude + 90))))
+    column = int(math.floor(longitude + 180)) % GRID_COLUMNS
+    return row * GRID_COLUMNS + column
+
+# Float: Kilometers between two coordinates (great circle).
+def DistanceKm(lattitude1,longitude1,lattitude2,longitude2):
+    phi1 = math.radians(lattitude1)
+    phi2 = math.radians(lattitude2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(longitude2 - longitude1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Class: One city found in the gazetteer.
+class Place:
+    __slots__ = ('id', 'name', 'state', 'country', 'lattitude', 'longitude')
+
+    def __init__(self,city_id,name,state,country,lattitude,longitude):
+        self.id = city_id
+        self.name = name
+        self.state = state
+        self.country = country
+        self.lattitude = lattitude
+        self.longitude = longitude
+
+    # Dictionary: Place as plain values for JSON output.
+    def ToDict(self):
+        return {'id': self.id, 'name': self.name, 'state': self.state, 'country': self.country,
+                'lat': self.lattitude, 'lon': self.longitude}
+
+    def __repr__(self):
+        return f'Place({self.id}, {self.name!r}, {self.state!r}, {self.country!r}, {self.lattitude:.4f}, {self.longitude:.4f})'
+
+# Class: Sorted name keys of the index, read straight from the memory map. Lets bisect search them.
+class _NameKeys:
+    __slots__ = ('_offsets', '_names')
+
+    def __init__(self,offsets,names):
+        self._offsets = offsets
+        self._names = names
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self,index):
+        return bytes(self._names[self._offsets[index]:self._offsets[index + 1]])
+
+
+# Void: Builds an index file from the openweathermap.org city list (.json or .json.gz).
+def BuildGazetteer(city_list_file,index_file=GAZETTEER_FILE):
+    import gzip, json # Only needed to build the index.
+
+    opener = gzip.open if city_list_file.endswith('.gz') else open
+    with opener(city_list_file, 'rt', encoding='utf-8') as file_object:
+        cities = json.load(file_object)
+
+    # Records are stored in name order so names can be searched with bisect. Ties keep the list order.
+    cities.sort(key=lambda city: NameKey(city['name']))
+    count = len(cities)
+
+    name_offsets, names = array('I', [0]), bytearray()
+    display_offsets, displays = array('I', [0]), bytearray()
+    ids, lats, lons = array('i'), array('f'), array('f')
+    regions = bytearray()
+    cells = [[] for cell in range(GRID_ROWS * GRID_COLUMNS)]
+
+    for record, city in enumerate(cities):
+        names += NameKey(city['name']).encode('utf-8')
+        name_offsets.append(len(names))
+        displays += city['name'].encode('utf-8')
+        display_offsets.append(len(displays))
+        ids.append(city['id'])
+        lats.append(city['coord']['lat'])
+        lons.append(city['coord']['lon'])
+        regions += (city.get('country') or '').upper().ljust(2)[:2].encode('ascii', 'replace')
+        regions += (city.get('state') or '').upper().ljust(2)[:2].encode('ascii', 'replace')
+        cells[CellNumber(city['coord']['lat'], city['coord']['lon'])].append(record)
+
+    # Grid cells. Records of cell c are cell_records[cell_starts[c]:cell_starts[c + 1]].
+    cell_starts, cell_records = array('I', [0]), array('I')
+    for cell in cells:
+        cell_records.extend(cell)
+        cell_starts.append(len(cell_records))
+
+    sections = [name_offsets.tobytes(), bytes(names), display_offsets.tobytes(), bytes(displays),
+                ids.tobytes(), lats.tobytes(), lons.tobytes(), bytes(regions), cell_starts.tobytes(), cell_records.tobytes()]
+
+    # Every section starts on an 8 byte boundary after the header.
+    places = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % 8
+        places.append((position, len(section)))
+        position += len(section)
+
+    with open(index_file, 'wb') as file_object:
+        header_places = [value for place in places for value in place]
+        file_object.write(HEADER.pack(MAGIC, VERSION, 0 if sys.byteorder == 'little' else 1, count, *header_places))
+        for (position, length), section in zip(places, sections):
+            file_object.write(b'\0' * (position - file_object.tell()))
+            file_object.write(section)
+    return count
+
+# Class: Memory mapped gazetteer index. Name lookups are binary searches and nearest lookups use the grid.
+class Gazetteer:
+
+    # Void: Opens an index file written by BuildGazetteer.
+    def __init__(self,index_file=GAZETTEER_FILE):
+        self._file = open(index_file, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._map, 0)
+        magic, version, byte_order, self.count = header[:4]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{index_file} is not a gazetteer index (version {VERSION}).')
+        if byte_order != (0 if sys.byteorder == 'little' else 1):
+            raise ValueError(f'{index_file} was built on a computer with a different byte order. Build it again.')
+
+        # Each section is a view into the memory map. Nothing is copied.
+        view = memoryview(self._map)
+        section = {}
+        for number, name in enumerate(SECTIONS):
+            position, length = header[4 + number * 2], header[5 + number * 2]
+            section[name] = view[position:position + length]
+        self._name_offsets = section['name_offsets'].cast('I')
+        self._names = section['names']
+        self._display_offsets = section['display_offsets'].cast('I')
+        self._displays = section['displays']
+        self._ids = section['ids'].cast('i')
+        self._lats = section['lats'].cast('f')
+        self._lons = section['lons'].cast('f')
+        self._regions = section['regions']
+        self._cell_starts = section['cell_starts'].cast('I')
+        self._cell_records = section['cell_records'].cast('I')
+        self._keys = _NameKeys(self._name_offsets, self._names)
+
+    # Place: Record number to a Place.
+    def _Place(self,record):
+        region = bytes(self._regions[record * REGION_SIZE:(record + 1) * REGION_SIZE]).decode('ascii')
+        name = bytes(self._displays[self._display_offsets[record]:self._display_offsets[record + 1]]).decode('utf-8')
+        return Place(self._ids[record], name, region[2:].strip(), region[:2].strip(), self._lats[record], self._lons[record])
+
+    # Range: Record numbers whose name key starts with prefix.
+    def _PrefixRange(self,prefix):
+        prefix = NameKey(prefix).encode('utf-8')
+        start = bisect.bisect_left(self._keys, prefix)
+        # Every key starting with the prefix sorts before prefix + the largest character.
+        end = bisect.bisect_left(self._keys, prefix + b'\xff', start)
+        return range(start, end)
+
+    # List: Places whose name starts with prefix. Used for suggestions while typing and for typos.
+    def Prefix(self,prefix,limit=10):
+        return [self._Place(record) for record in self._PrefixRange(prefix)[:limit]]
+
+    # List: Suggestions for a name that was not found. Shortens the name until something starts the same way.
+    def Suggest(self,name,limit=5):
+        key = NameKey(name)
+        for length in range(len(key), 1, -1):
+            places = self.Prefix(key[:length],limit)
+            if places:
+                return places
+        return []
+
+    # Place or None: The city for a "city, state, country" location. State is ignored for places without one
+    # (outside the United States the state is entered the same as the country).
+    def Resolve(self,city,state='',country=''):
+        key = NameKey(city).encode('utf-8')
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key, start)
+        state = state.strip().upper()
+        country = country.strip().upper()
+
+        fallback = None
+        for record in range(start, end):
+            region = bytes(self._regions[record * REGION_SIZE:(record + 1) * REGION_SIZE]).decode('ascii')
+            place_country, place_state = region[:2].strip(), region[2:].strip()
+            if country and place_country != country:
+                continue
+            # Exact state match wins. A place with no state matches any state.
+            if not state or place_state == state:
+                return self._Place(record)
+            if not place_state and fallback is None:
+                fallback = record
+        return self._Place(fallback) if fallback is not None else None
+
+    # List: The k closest places to coordinates, closest first. Each item is (kilometers, Place).
+    def Nearest(self,lattitude,longitude,k=1):
+        best = [] # (kilometers, record), sorted
+        center_row = min(GRID_ROWS - 1, max(0, int(math.floor(lattitude + 90))))
+        center_column = int(math.floor(longitude + 180)) % GRID_COLUMNS
+
+        # Searches rings of cells around the center until no closer place can exist further out.
+        for ring in range(max(GRID_ROWS, GRID_COLUMNS // 2) + 1):
+            for row in range(center_row - ring, center_row + ring + 1):
+                if row < 0 or row >= GRID_ROWS:
+                    continue
+                # Only the edge of the ring. Inner cells were searched already.
+                if abs(row - center_row) == ring:
+                    columns = range(center_column - ring, center_column + ring + 1)
+                else:
+                    columns = (center_column - ring, center_column + ring)
+                for column in set(column % GRID_COLUMNS for column in columns):
+                    cell = row * GRID_COLUMNS + column
+                    for index in range(self._cell_starts[cell], self._cell_starts[cell + 1]):
+                        record = self._cell_records[index]
+                        distance = DistanceKm(lattitude, longitude, self._lats[record], self._lons[record])
+                        if len(best) < k or distance < best[-1][0]:
+                            bisect.insort(best, (distance, record))
+                            del best[k:]
+
+            # Anything in the next ring is at least ring whole cells away. Cells narrow toward the poles.
+            if len(best) == k:
+                widest_lattitude = min(90.0, abs(lattitude) + ring + 1)
+                bound = ring * KM_PER_DEGREE * math.cos(math.radians(widest_lattitude))
+                if best[-1][0] <= bound:
+                    break
+        return [(distance, self._Place(record)) for distance, record in best]
+
+    # Void: Closes the index file.
+    def Close(self):
+        # Views must be released before the memory map can close.
+        for name in ('_name_offsets', '_names', '_display_offsets', '_displays', '_ids', '_lats', '_lons', '_regions', '_cell_starts', '_cell_records'):
+            getattr(self, name).release()
+        self._keys = None
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+def main(argv=None):
+    import json, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Build or search the local city index.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build an index from the openweathermap.org city list')
+    build.add_argument('city_list', help='city.list.json or city.list.json.gz')
+    build.add_argument('index', nargs='?', default=GAZETTEER_FILE)
+    lookup = commands.add_parser('lookup', help='find a "city, state, country" or list names starting with a prefix')
+    lookup.add_argument('index')
+    lookup.add_argument('location')
+    nearest = commands.add_parser('nearest', help='closest cities to coordinates')
+    nearest.add_argument('index')
+    nearest.add_argument('lattitude', type=float)
+    nearest.add_argument('longitude', type=float)
+    nearest.add_argument('-k', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        print(f'{BuildGazetteer(args.city_list,args.index)} cities written to {args.index}')
+        return 0
+
+    gazetteer = Gazetteer(args.index)
+    try:
+        if args.command == 'lookup':
+            parts = [part.strip() for part in args.location.split(',')] + ['', '']
+            place = gazetteer.Resolve(parts[0], parts[1], parts[2])
+            if place is not None:
+                print(json.dumps(place.ToDict()))
+            else:
+                # No exact match. Suggest names that start the same way.
+                print(json.dumps({'error': 'not found', 'suggestions': [place.ToDict() for place in gazetteer.Suggest(parts[0])]}))
+                return 1
+        else:
+            for distance, place in gazetteer.Nearest(args.lattitude, args.longitude, args.k):
+                print(json.dumps({'km': round(distance, 2), **place.ToDict()}))
+    finally:
+        gazetteer.Close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+# File Name: droneweatherhistory.py
+# Description: Append-only store of past weather observations. Every field is kept in its own column file
+#              of fixed size numbers and the columns are memory mapped for reading, so questions like
+#              "percentage of flyable hours at a site last quarter" read only the columns they need
+#              and never parse JSON again.
+# Usage: python droneweatherhistory.py import history recorded.jsonl.gz
+#        python droneweatherhistory.py flyable history --site 4192375 --start 2024-07-01 --end 2024-10-01
+#        python droneweatherhistory.py sites history
+
+
+import os # Store directory and column files
+import sys # Byte order of this computer
+import json # Store information file
+import mmap # Memory mapped columns
+import threading # Fleet threads add observations at the same time
+from array import array # Column buffers
+from collections import deque # Latest times of each site
+
+import droneweather as dw # Observation, weather titles and the flight decision
+
+# Store format version. Written to the information file.
+VERSION = 1
+# Information file in the store directory. Row count, sites and whether rows are in time order.
+INFO_FILE = 'history.json'
+# Column files: (field name, array type code). Each column is one file named after its field.
+# Text is not kept per row. City names are in the sites table and the weather title comes back from the weather id.
+COLUMNS = (('site_id', 'q'), ('time_current', 'q'), ('time_sunrise', 'q'), ('time_sunset', 'q'),
+           ('loc_lattitude', 'd'), ('loc_longitude', 'd'), ('loc_ground', 'f'), ('weather_id', 'H'),
+           ('temp_current', 'f'), ('temp_feelslike', 'f'), ('pressure_sea', 'f'), ('humidity', 'f'),
+           ('visibility', 'f'), ('cloud_percentage', 'B'), ('wind_speed', 'H'), ('wind_direction', 'H'),
+           ('wind_gust', 'H'))
+# Bytes in one row across every column.
+ROW_SIZE = sum(array(code).itemsize for name, code in COLUMNS)
+# Rows kept in memory before they are written to the column files.
+FLUSH_ROWS = 4096
+# Longest time (seconds) one observation counts for in flyable hours. Longer gaps are not counted.
+MAX_GAP = 3600
+# Latest times kept for each site. An observation at one of them is already in the store (the same payload
+# checked again from the cache). Rows arrive close to time order, so only the newest need checking.
+RECENT_TIMES = 8
+# Rows at the end of the store read back for those times when the store is opened.
+RECENT_ROWS = 65536
+
+
+# Integer: First position in rows (row numbers in time order) whose time is at or after moment.
+def _FirstRow(rows,times,moment):
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high) // 2
+        if times[rows[middle]] < moment:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# Class: Append-only column store of Observations in one directory.
+# Append adds rows, Flush writes them. Queries see every row flushed so far.
+class HistoryStore:
+
+    # Void: Opens the store in directory, creating it when needed.
+    def __init__(self,directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+        info = {}
+        info_file = os.path.join(directory, INFO_FILE)
+        if os.path.exists(info_file):
+            with open(info_file, 'r', encoding='utf-8') as file_object:
+                info = json.load(file_object)
+            if info.get('version') != VERSION or info.get('byteorder') != sys.byteorder:
+                raise ValueError(f'{directory} is not a version {VERSION} {sys.byteorder} endian history store.')
+        # Site id -> [city, state, country]
+        self.sites = {int(site_id): place for site_id, place in info.get('sites', {}).items()}
+
+        # Rows in every column. Stopping part way through a write can leave some columns longer, so they are cut back.
+        self.count = min(self._FileSize(name) // array(code).itemsize for name, code in COLUMNS)
+        for name, code in COLUMNS:
+            if self._FileSize(name) != self.count * array(code).itemsize:
+                os.truncate(self._ColumnFile(name), self.count * array(code).itemsize)
+
+        self._files = {name: open(self._ColumnFile(name), 'ab') for name, code in COLUMNS}
+        self._pending = {name: array(code) for name, code in COLUMNS}
+        self._maps = {}
+        self._views = {}
+        self._mapped_count = 0
+        # Site id -> row numbers. Built by the first query for one site.
+        self._site_rows = None
+        # Site id -> latest RECENT_TIMES times, so the same observation is kept once. Built by the first Append.
+        self._recent = None
+
+        # Time order lets time ranges be found by binary search instead of looking at every row.
+        if not self.count:
+            self.time_sorted = True
+            self._last_time = 0
+        elif info.get('count') == self.count:
+            self.time_sorted = info.get('time_sorted', False)
+            self._last_time = info.get('last_time', 0)
+        else:
+            times = self._Views()['time_current']
+            self.time_sorted = all(times[row - 1] <= times[row] for row in range(1, self.count))
+            self._last_time = times[self.count - 1]
+
+    # String: Path of a column file.
+    def _ColumnFile(self,name):
+        return os.path.join(self.directory, name + '.col')
+
+    # Integer: Size of a column file in bytes. 0 when it does not exist yet.
+    def _FileSize(self,name):
+        try:
+            return os.path.getsize(self._ColumnFile(name))
+        except FileNotFoundError:
+            return 0
+
+    # Boolean: Adds one Observation. It is written with the next Flush.
+    # False when the store already has the site at that time (the same payload seen again, from the cache).
+    def Append(self,observation):
+        with self._lock:
+            site_id = observation['site_id'] or 0
+            if self._recent is None:
+                self._recent = {}
+                if self.count:
+                    views = self._Views()
+                    for row in range(max(0, self.count - RECENT_ROWS), self.count):
+                        self._recent.setdefault(views['site_id'][row], deque(maxlen=RECENT_TIMES)).append(views['time_current'][row])
+            recent = self._recent.setdefault(site_id, deque(maxlen=RECENT_TIMES))
+            time_current = int(observation['time_current'] or 0)
+            if time_current in recent:
+                return False
+            recent.append(time_current)
+            if site_id not in self.sites:
+                self.sites[site_id] = [observation['loc_city'], observation['loc_state'], observation['loc_country']]
+            for name, code in COLUMNS:
+                value = observation[name] or 0
+                self._pending[name].append(value if code in 'fd' else int(value))
+            if observation['time_current'] < self._last_time:
+                self.time_sorted = False
+            self._last_time = observation['time_current']
+            if len(self._pending['site_id']) >= FLUSH_ROWS:
+                self._Flush()
+        return True
+
+    # Void: Writes waiting rows to the column files.
+    def Flush(self):
+        with self._lock:
+            self._Flush()
+        return
+
+    # Void: Flush with the lock already held.
+    def _Flush(self):
+        added = len(self._pending['site_id'])
+        if not added:
+            return
+        for name, code in COLUMNS:
+            self._pending[name].tofile(self._files[name])
+            self._files[name].flush()
+            self._pending[name] = array(code)
+
+        first_row = self.count
+        self.count += added
+        # New rows join the site index if it has been built.
+        if self._site_rows is not None:
+            sites = self._Views()['site_id']
+            for row in range(first_row, self.count):
+                self._site_rows.setdefault(sites[row], array('L')).append(row)
+        self._WriteInfo()
+        return
+
+    # Void: Writes the information file. Written to a new file first so a crash never leaves half of one.
+    def _WriteInfo(self):
+        info = {'version': VERSION, 'byteorder': sys.byteorder, 'count': self.count,
+                'time_sorted': self.time_sorted, 'last_time': self._last_time,
+                'columns': dict(COLUMNS), 'sites': {str(site_id): place for site_id, place in self.sites.items()}}
+        info_file = os.path.join(self.directory, INFO_FILE)
+        with open(info_file + '.tmp', 'w', encoding='utf-8') as file_object:
+            json.dump(info, file_object)
+        os.replace(info_file + '.tmp', info_file)
+        return
+
+    # Dictionary: Column name -> memoryview of every flushed row. Mapped again only after rows were added.
+    def _Views(self):
+        if self._mapped_count != self.count:
+            self._Unmap()
+            for name, code in COLUMNS:
+                with open(self._ColumnFile(name), 'rb') as file_object:
+                    self._maps[name] = mmap.mmap(file_object.fileno(), self.count * array(code).itemsize, access=mmap.ACCESS_READ)
+                self._views[name] = memoryview(self._maps[name]).cast(code)
+            self._mapped_count = self.count
+        return self._views
+
+    # Void: Releases the column maps.
+    def _Unmap(self):
+        # Views must be released before the memory map can close.
+        for view in self._views.values():
+            view.release()
+        for column_map in self._maps.values():
+            column_map.close()
+        self._views = {}
+        self._maps = {}
+        self._mapped_count = 0
+        return
+
+    # List: Row numbers in time order for a site (None for every site) from start up to but not including end.
+    # start and end are UNIX times. None leaves that end open.
+    def Rows(self,site_id=None,start=None,end=None):
+        self.Flush()
+        with self._lock:
+            if not self.count:
+                return []
+            views = self._Views()
+            times = views['time_current']
+            if site_id is None:
+                rows = range(self.count)
+            else:
+                if self._site_rows is None:
+                    self._site_rows = {}
+                    for row, site in enumerate(views['site_id']):
+                        self._site_rows.setdefault(site, array('L')).append(row)
+                rows = self._site_rows.get(site_id, array('L'))
+
+            if not self.time_sorted:
+                rows = sorted(rows, key=times.__getitem__)
+            first = _FirstRow(rows,times,start) if start is not None else 0
+            last = _FirstRow(rows,times,end) if end is not None else len(rows)
+            return list(rows[first:last])
+
+    # List: Values of one column for rows from Rows.
+    def Column(self,name,rows):
+        if not rows:
+            return []
+        with self._lock:
+            view = self._Views()[name]
+            return [view[row] for row in rows]
+
+    # Observation: One stored row. Weather title and cloud flag come back from the weather id.
+    # The weather description is not stored.
+    def Observation(self,row):
+        with self._lock:
+            views = self._Views()
+            # Single precision readings are rounded so 72.86 does not come back as 72.86000061035156.
+            observation = dw.Observation(**{name: round(views[name][row], 2) if code == 'f' else views[name][row] for name, code in COLUMNS})
+        observation.loc_city, observation.loc_state, observation.loc_country = self.sites.get(observation.site_id, [None, None, None])
+        observation.weather_title = dw.WeatherTitle(observation.weather_id)
+        observation.is_cloud = observation.weather_title in dw.CLOUD_TITLES
+        observation.is_wind_gust = observation.wind_gust > 0
+        return observation
+
+    # Generator: Observations for a site from start up to but not including end, in time order.
+    def Observations(self,site_id=None,start=None,end=None):
+        for row in self.Rows(site_id,start,end):
+            yield self.Observation(row)
+
+    # List: Reason code for every row against a pilot's limits. Uses the column checks when NumPy is installed.
+    def ReasonCodes(self,rows,profile=None):
+        if profile is None:
+            profile = dw.PROFILE_STORE.Default()
+        columns = [self.Column(name,rows) for name in ('time_current', 'time_sunrise', 'time_sunset', 'wind_speed', 'weather_id')]
+        try:
+            import droneweathervector as vector # Optional. Needs NumPy.
+        except ImportError:
+            time_current, time_sunrise, time_sunset, wind_speed, weather_id = columns
+            reason_codes = []
+            for row in range(len(rows)):
+                weather_title = dw.WeatherTitle(weather_id[row])
+                # Only the fields the decision reads.
+                weather = {'time_current': time_current[row], 'time_sunrise': time_sunrise[row], 'time_sunset': time_sunset[row],
+                           'weather_title': weather_title, 'wind_speed': wind_speed[row], 'is_cloud': weather_title in dw.CLOUD_TITLES}
+                reason_codes.append(dw.CheckWeatherCode(weather,profile))
+            return reason_codes
+        safe, reason_codes = vector.EvaluateColumns(*columns, profile=profile)
+        return reason_codes.tolist()
+
+    # Dictionary: Flyable hours for one site between start and end against a pilot's limits.
+    # Each observation counts until the next one, for at most MAX_GAP seconds.
+    # Gives observations, hours, flyable_hours, percent and the hours for each reason.
+    def FlyableHours(self,site_id,start=None,end=None,profile=None):
+        rows = self.Rows(site_id,start,end)
+        times = self.Column('time_current',rows)
+        reason_codes = self.ReasonCodes(rows,profile)
+
+        hours = {name: 0.0 for name in dw.REASON_NAMES}
+        for index, reason_code in enumerate(reason_codes):
+            until = times[index + 1] if index + 1 < len(times) else (end if end is not None else times[index] + MAX_GAP)
+            hours[dw.REASON_NAMES[reason_code]] += min(until - times[index], MAX_GAP) / 3600
+
+        total = sum(hours.values())
+        flyable = sum(hours[dw.REASON_NAMES[reason_code]] for reason_code in dw.SAFE_REASONS)
+        return {'site_id': site_id,
+                'observations': len(rows),
+                'hours': round(total, 2),
+                'flyable_hours': round(flyable, 2),
+                'percent': round(flyable / total * 100, 1) if total else 0.0,
+                'reasons': {name: round(value, 2) for name, value in hours.items()}}
+
+    # Void: Writes waiting rows and closes every file.
+    def Close(self):
+        self.Flush()
+        with self._lock:
+            self._Unmap()
+            for file_object in self._files.values():
+                file_object.close()
+        return
+
+    def __len__(self):
+        return self.count + len(self._pending['site_id'])
+
+# Integer: UNIX time from a number or an ISO date ("2024-07-01" or "2024-07-01T06:00"). Dates without a zone are UTC.
+def ParseTime(text):
+    from datetime import datetime, timezone # Imported here to keep start up fast.
+
+    if text.lstrip('-').isdigit():
+        return int(text)
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+# Tuple: Adds every weather JSON line of a recording to a store. Returns (rows added, lines skipped).
+# Lines that are not weather responses and observations already in the store are skipped.
+def ImportRecording(store,file_name,user_state=''):
+    import droneweatherreplay as replay # Reading recordings
+
+    added = skipped = 0
+    with replay.OpenRecording(file_name) as file_object:
+        for line_number, weather_data in replay.ReadPayloads(file_object):
+            try:
+                if not isinstance(weather_data, dict) or str(weather_data.get('cod')) != '200':
+                    raise ValueError('not a weather response')
+                if store.Append(dw.ExtractWeather(weather_data,user_state)):
+                    added += 1
+                else:
+                    skipped += 1
+            except (KeyError, TypeError, ValueError, IndexError):
+                skipped += 1
+    store.Flush()
+    return added, skipped
+
+def main(argv=None):
+    import argparse # Command line options
+
+    parser = argparse.ArgumentParser(description='Store past weather observations and ask how flyable a site was.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help='add a recording of weather JSON Lines (.gz allowed, - for standard input)')
+    load.add_argument('store')
+    load.add_argument('recording')
+    load.add_argument('--state', default='', help='state for the sites in the recording (the API does not return one)')
+    sites = commands.add_parser('sites', help='list the sites in a store')
+    sites.add_argument('store')
+    flyable = commands.add_parser('flyable', help='flyable hours for each site')
+    flyable.add_argument('store')
+    flyable.add_argument('--site', type=int, help='city id (default: every site)')
+    flyable.add_argument('--start', type=ParseTime, help='UNIX time or date (UTC), included')
+    flyable.add_argument('--end', type=ParseTime, help='UNIX time or date (UTC), not included')
+    flyable.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    flyable.add_argument('--json', action='store_true', help='print one JSON object per site')
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.store)
+    try:
+        if args.command == 'import':
+            added, skipped = ImportRecording(store,args.recording,args.state)
+            print(f'{added} observations added, {skipped} lines skipped. {len(store)} in the store.')
+        elif args.command == 'sites':
+            for site_id, place in sorted(store.sites.items()):
+                rows = store.Rows(site_id)
+                times = store.Column('time_current',[rows[0], rows[-1]]) if rows else [None, None]
+                print(f'{site_id:>10}  {", ".join(part for part in place if part):<30} {len(rows):>8} observations  {times[0]} to {times[1]}')
+        else:
+            profile = dw.PROFILE_STORE.Load('history',args.profile) if args.profile else None
+            for site_id in ([args.site] if args.site is not None else sorted(store.sites)):
+                result = store.FlyableHours(site_id,args.start,args.end,profile)
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    place = ', '.join(part for part in store.sites.get(site_id, []) if part)
+                    print(f'{site_id:>10}  {place:<30} {result["flyable_hours"]:>9.1f} of {result["hours"]:>9.1f} hours flyable ({result["percent"]:.1f}%)')
+    finally:
+        store.Close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# File Name: droneweathermetrics.py
+# Description: Timing of each stage of a brief (cache, HTTP, JSON decoding, preferences, parse, decide, render)
+#              per location. Collects counts and latency histograms and exports them as Prometheus text or JSON.
+#              Turned off by default. When off, every timing point is one function call that does nothing.
+# Usage: import droneweathermetrics as metrics
+#        metrics.Enable()
+#        with metrics.Stage('http', 'atlanta,ga,us'): ...
+#        print(metrics.PrometheusText())
+
+
+import time # Stage timing
+import threading # Fleet threads record at the same time
+
+# Upper bounds (seconds) of the latency histogram buckets. The last bucket holds everything slower.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Most different locations kept. Later locations are counted under 'other' so memory stays bounded.
+MAX_LOCATIONS = 1000
+# Prefix of every exported metric name.
+PREFIX = 'droneweather'
+
+# True while timings are collected. Changed by Enable and Disable.
+ENABLED = False
+
+# (stage, location) -> [count, errors, total seconds, bucket counts...]
+_stages = {}
+# (counter name, location) -> count
+_counters = {}
+_locations = set()
+_lock = threading.Lock()
+
+
+# Class: Timing point that does nothing. Handed out while metrics are off.
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,error_type,error,traceback):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+# Class: Times one stage from enter to exit and records it. A stage that raises is counted as an error.
+class _TimedStage:
+    __slots__ = ('stage', 'location', 'start')
+
+    def __init__(self,stage,location):
+        self.stage = stage
+        self.location = location
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self,error_type,error,traceback):
+        Record(self.stage, time.perf_counter() - self.start, self.location, error_type is not None)
+        return False
+
+
+# Void: Starts collecting timings.
+def Enable():
+    global ENABLED
+    ENABLED = True
+    return
+
+# Void: Stops collecting timings. What was collected is kept until Reset.
+def Disable():
+    global ENABLED
+    ENABLED = False
+    return
+
+# Void: Removes everything collected.
+def Reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _locations.clear()
+    return
+
+# Context manager: Times the code inside a with block as one stage. Does nothing while metrics are off.
+def Stage(stage,location=''):
+    if not ENABLED:
+        return _NULL_STAGE
+    return _TimedStage(stage, location)
+
+# String: Location label kept within MAX_LOCATIONS. Lock must already be held.
+def _LocationLabel(location):
+    if location in _locations:
+        return location
+    if len(_locations) < MAX_LOCATIONS:
+        _locations.add(location)
+        return location
+    return 'other'
+
+# Void: Records one timing. Used by Stage, and directly for stages that are not a single block of code.
+def Record(stage,seconds,location='',error=False):
+    # First bucket the time fits in.
+    bucket = 0
+    while bucket < len(BUCKETS) and seconds > BUCKETS[bucket]:
+        bucket += 1
+
+    with _lock:
+        key = (stage, _LocationLabel(location))
+        entry = _stages.get(key)
+        if entry is None:
+            entry = _stages[key] = [0, 0, 0.0] + [0] * (len(BUCKETS) + 1)
+        entry[0] += 1
+        entry[1] += error
+        entry[2] += seconds
+        entry[3 + bucket] += 1
+    return
+
+# Void: Adds to a counter (for example cache hits). Does nothing while metrics are off.
+def Increment(name,location='',amount=1):
+    if not ENABLED:
+        return
+    with _lock:
+        key = (name, _LocationLabel(location))
+        _counters[key] = _counters.get(key, 0) + amount
+    return
+
+# String: Label value with quotes, backslashes and new lines escaped for Prometheus.
+def _Escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# String: Everything collected in the Prometheus text format.
+def PrometheusText():
+    with _lock:
+        stages = {key: list(entry) for key, entry in _stages.items()}
+        counters = dict(_counters)
+
+    lines = [f'# HELP {PREFIX}_stage_seconds Time spent in each stage of a brief.',
+             f'# TYPE {PREFIX}_stage_seconds histogram']
+    for (stage, location), entry in sorted(stages.items()):
+        labels = f'stage="{_Escape(stage)}",location="{_Escape(location)}"'
+        # Prometheus buckets count everything at or below the bound.
+        running = 0
+        for bound, count in zip(BUCKETS, entry[3:]):
+            running += count
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{{labels},le="{bound}"}} {running}')
+        lines.append(f'{PREFIX}_stage_seconds_bucket{{{labels},le="+Inf"}} {entry[0]}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{{labels}}} {entry[2]:.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{{labels}}} {entry[0]}')
+
+    lines.append(f'# HELP {PREFIX}_stage_errors_total Stages that ended with an error.')
+    lines.append(f'# TYPE {PREFIX}_stage_errors_total counter')
+    for (stage, location), entry in sorted(stages.items()):
+        lines.append(f'{PREFIX}_stage_errors_total{{stage="{_Escape(stage)}",location="{_Escape(location)}"}} {entry[1]}')
+
+    last_name = None
+    for (name, location), count in sorted(counters.items()):
+        if name != last_name:
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            last_name = name
+        lines.append(f'{PREFIX}_{name}_total{{location="{_Escape(location)}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+# Dictionary: Everything collected as plain values for JSON. Each stage has count, errors, total and mean
+# seconds, and the histogram as {upper bound: count} (not running totals).
+def Snapshot():
+    with _lock:
+        stages = {key: list(entry) for key, entry in _stages.items()}
+        counters = dict(_counters)
+
+    snapshot = {'time': time.time(), 'stages': [], 'counters': []}
+    for (stage, location), entry in sorted(stages.items()):
+        histogram = {str(bound): count for bound, count in zip(BUCKETS, entry[3:])}
+        histogram['+Inf'] = entry[-1]
+        snapshot['stages'].append({'stage': stage, 'location': location,
+                                   'count': entry[0], 'errors': entry[1],
+                                   'seconds': round(entry[2], 6),
+                                   'mean_ms': round(entry[2] / entry[0] * 1000, 3) if entry[0] else 0.0,
+                                   'histogram': histogram})
+    for (name, location), count in sorted(counters.items()):
+        snapshot['counters'].append({'name': name, 'location': location, 'count': count})
+    return snapshot
+
+# Void: Writes the metrics to a file. Files ending in .json get the JSON snapshot, others Prometheus text.
+def WriteMetrics(file_name):
+    if file_name.endswith('.json'):
+        import json # Imported here to keep start up fast.
+        with open(file_name, 'w') as file_object:
+            json.dump(Snapshot(), file_object, indent=2)
+    else:
+        with open(file_name, 'w') as file_object:
+            file_object.write(PrometheusText())
+    return
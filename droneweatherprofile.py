@@ -0,0 +1,192 @@
+# File Name: droneweatherprofile.py
+# Description: Pilot preferences held in memory. The preferences file is read once and only read again
+#              when the file changes, so checking many sites or many pilots does not touch the disk.
+
+
+import os # File modified time
+from bisect import bisect_left, bisect_right # Wind limit search in the profile index
+
+# Preferences file written by PrefWrite. Four lines: night, rain, max wind (mph), beyond line of sight.
+PREF_FILE = 'droneweatherprefrences.dat'
+# Columns of a pilots file (CSV with a header line). One pilot per line.
+PILOT_FIELDS = ('name', 'night', 'rain', 'wind', 'cloud')
+
+
+# Class: One pilot's preferences as real bools and a float instead of strings.
+class PilotProfile:
+    # Slots keep each profile small when thousands of pilots are loaded.
+    __slots__ = ('name', 'night', 'rain', 'wind', 'cloud')
+
+    # Void: night, rain and cloud are True when the pilot and drone are certified for them. wind is in mph.
+    def __init__(self,name,night,rain,wind,cloud):
+        self.name = name
+        self.night = bool(night)
+        self.rain = bool(rain)
+        self.wind = float(wind)
+        self.cloud = bool(cloud)
+
+    # PilotProfile: Reads a preferences file written by PrefWrite.
+    @classmethod
+    def FromFile(cls,file_name=PREF_FILE,name='default'):
+        with open(file_name,'r') as file_object:
+            # Reads each preference setting. Strips new line character.
+            user_night = file_object.readline().rstrip('\n')
+            user_rain = file_object.readline().rstrip('\n')
+            user_wind = float(file_object.readline().rstrip('\n'))
+            user_cloud = file_object.readline().rstrip('\n')
+
+        # Same rule PrefCheckWeather always used: only the word False removes a certification.
+        return cls(name, user_night != 'False', user_rain != 'False', user_wind, user_cloud != 'False')
+
+    # Dictionary: Profile as plain values. Used for JSON output.
+    def ToDict(self):
+        return {'name': self.name, 'night': self.night, 'rain': self.rain, 'wind': self.wind, 'cloud': self.cloud}
+
+    def __repr__(self):
+        return f'PilotProfile({self.name!r}, night={self.night}, rain={self.rain}, wind={self.wind}, cloud={self.cloud})'
+
+    def __eq__(self,other):
+        if not isinstance(other, PilotProfile):
+            return NotImplemented
+        return (self.name, self.night, self.rain, self.wind, self.cloud) == (other.name, other.night, other.rain, other.wind, other.cloud)
+
+# Class: Many named profiles in memory. Profiles loaded from a file are read again only when the file changes.
+class ProfileStore:
+
+    def __init__(self):
+        # name -> PilotProfile
+        self._profiles = {}
+        # name -> (file name, file stamp when read)
+        self._files = {}
+
+    # Tuple: Modified time and size of a file. Changes whenever the file is written again.
+    @staticmethod
+    def _Stamp(file_name):
+        stat = os.stat(file_name)
+        return stat.st_mtime_ns, stat.st_size
+
+    # Void: Adds a profile built in memory. It never touches the disk.
+    def Add(self,profile):
+        self._profiles[profile.name] = profile
+        self._files.pop(profile.name, None)
+        return
+
+    # PilotProfile: Loads a profile from a preferences file and remembers the file for later checks.
+    def Load(self,name,file_name=PREF_FILE):
+        stamp = self._Stamp(file_name)
+        profile = PilotProfile.FromFile(file_name,name)
+        self._profiles[name] = profile
+        self._files[name] = (file_name, stamp)
+        return profile
+
+    # PilotProfile: Gets a profile by name. A file profile is read again only if its file changed.
+    # check_file=False skips the file check so a hot loop never touches the disk.
+    def Get(self,name,check_file=True):
+        if check_file and name in self._files:
+            file_name, stamp = self._files[name]
+            if self._Stamp(file_name) != stamp:
+                return self.Load(name,file_name)
+        return self._profiles[name]
+
+    # PilotProfile: The pilot's own preferences file. Loaded the first time it is asked for.
+    def Default(self,file_name=PREF_FILE):
+        if 'default' not in self._profiles:
+            return self.Load('default',file_name)
+        return self.Get('default')
+
+    # Void: Removes a profile.
+    def Remove(self,name):
+        self._profiles.pop(name, None)
+        self._files.pop(name, None)
+        return
+
+    # List: All profile names.
+    def Names(self):
+        return list(self._profiles)
+
+    def __contains__(self,name):
+        return name in self._profiles
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __iter__(self):
+        return iter(self._profiles.values())
+
+# Class: Many pilots indexed by what they may fly in, so one observation finds every pilot allowed to fly
+# without checking them one at a time. Pilots are split by their night, rain and beyond line of sight
+# certifications, and each group is kept sorted by max wind.
+class ProfileIndex:
+
+    def __init__(self,profiles=()):
+        # (night, rain, cloud) -> ([max wind, ...], [PilotProfile, ...]) sorted by max wind.
+        self._groups = {}
+        # name -> PilotProfile
+        self._profiles = {}
+        for profile in profiles:
+            self.Add(profile)
+
+    # ProfileIndex: Reads a pilots file. CSV with a header line naming the PILOT_FIELDS columns.
+    # Flags follow the preferences file rule: only the word False removes a certification.
+    @classmethod
+    def FromFile(cls,file_name):
+        import csv # Imported here to keep start up fast.
+
+        with open(file_name,'r',newline='',encoding='utf-8') as file_object:
+            return cls(PilotProfile(row['name'], row['night'].strip() != 'False', row['rain'].strip() != 'False',
+                                    float(row['wind']), row['cloud'].strip() != 'False')
+                       for row in csv.DictReader(file_object))
+
+    # Void: Adds a pilot. A pilot with the same name is replaced.
+    def Add(self,profile):
+        if profile.name in self._profiles:
+            self.Remove(profile.name)
+        winds, profiles = self._groups.setdefault((profile.night, profile.rain, profile.cloud), ([], []))
+        position = bisect_right(winds, profile.wind)
+        winds.insert(position, profile.wind)
+        profiles.insert(position, profile)
+        self._profiles[profile.name] = profile
+        return
+
+    # Void: Removes a pilot by name.
+    def Remove(self,name):
+        profile = self._profiles.pop(name, None)
+        if profile is None:
+            return
+        winds, profiles = self._groups[(profile.night, profile.rain, profile.cloud)]
+        # Pilots with the same max wind sit together. Only that run is searched.
+        position = bisect_left(winds, profile.wind)
+        while profiles[position] is not profile:
+            position += 1
+        del winds[position]
+        del profiles[position]
+        return
+
+    # List: Tuples of (PilotProfile, clouds) for every pilot allowed to fly. Same rules as PrefCheckCode:
+    # is_night and is_rain rule out pilots without those certifications, and wind_speed over a pilot's
+    # max wind rules them out. clouds is True for pilots without beyond line of sight when is_cloud is set.
+    # Clouds never stop a flight, they only warn.
+    def Match(self,is_night,is_rain,wind_speed,is_cloud=False):
+        matches = []
+        for (night, rain, cloud), (winds, profiles) in self._groups.items():
+            if (is_night and not night) or (is_rain and not rain):
+                continue
+            # Pilots whose max wind is at least the wind speed are at the end of the group.
+            clouds = bool(is_cloud) and not cloud
+            matches.extend((profile, clouds) for profile in profiles[bisect_left(winds, wind_speed):])
+        return matches
+
+    # Integer: Number of pilots allowed to fly. Does not build the list.
+    def Count(self,is_night,is_rain,wind_speed):
+        return sum(len(winds) - bisect_left(winds, wind_speed)
+                   for (night, rain, cloud), (winds, profiles) in self._groups.items()
+                   if not (is_night and not night) and not (is_rain and not rain))
+
+    def __contains__(self,name):
+        return name in self._profiles
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __iter__(self):
+        return iter(self._profiles.values())
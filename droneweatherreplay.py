@@ -0,0 +1,104 @@
+# File Name: droneweatherreplay.py
+# Description: Replays recorded weather JSON (one API response per line, JSON Lines) through the flight decision.
+#              Reads one line at a time so files of any size use the same small amount of memory.
+#              No network is used. Good for testing preference changes against past weather.
+# Usage: python droneweatherreplay.py recorded.jsonl --profile droneweatherprefrences.dat --output decisions.jsonl
+
+
+import sys # Standard output
+import json # Reading and writing JSON Lines
+import gzip # Compressed archives (.gz)
+
+import droneweather as dw # Flight decision
+import droneweathersun as sun # Sunrise and sunset for recordings without them
+
+
+# File: Opens a recorded file for reading text. Files ending in .gz are decompressed while reading.
+# - is standard input. Closing it when the replay ends leaves standard input open.
+def OpenRecording(file_name):
+    if file_name == '-':
+        return open(sys.stdin.fileno(), 'r', encoding='utf-8', closefd=False)
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, 'rt', encoding='utf-8')
+    return open(file_name, 'r', encoding='utf-8')
+
+# Generator: Yields (line number, weather JSON) for every line of a recording. Blank lines are skipped.
+# Lines that are not a JSON object (bad JSON, or a list, string or number) are yielded as (line number, None)
+# so the replay can report them.
+def ReadPayloads(file_object):
+    for line_number, line in enumerate(file_object, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            weather_data = json.loads(line)
+        except ValueError:
+            weather_data = None
+        yield line_number, weather_data if isinstance(weather_data, dict) else None
+
+# Dictionary: One decision record. Small on purpose so the output stays much smaller than the recording.
+def DecisionRecord(line_number,weather_data,decision):
+    weather = decision.weather or {}
+    return {'line': line_number,
+            'id': weather_data.get('id') if weather_data else None,
+            'name': weather.get('loc_city'),
+            'dt': weather.get('time_current'),
+            'safe': decision.safe,
+            'reason': dw.REASON_NAMES[decision.reason_code],
+            'message': decision.reason.replace('\n', ' ')}
+
+# Generator: Streams every recorded payload through the same extraction and checks as a live report.
+# Yields one decision record per line of the recording. profile is a PilotProfile.
+def ReplayWeather(file_object,profile=None):
+    # Preferences are read once for the whole replay.
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+
+    for line_number, weather_data in ReadPayloads(file_object):
+        if weather_data is None:
+            decision = dw.Decision(None, False, dw.REASON_ERROR, 'Line is not a JSON object.')
+        else:
+            try:
+                # Recordings from other sources may not have sunrise and sunset. They are worked out locally.
+                sun.FillSunTimes(weather_data)
+                decision = dw.EvaluateWeatherData(weather_data,profile)
+            except (KeyError, TypeError, ValueError, IndexError) as error:
+                # A damaged record must not stop a long replay.
+                decision = dw.Decision(None, False, dw.REASON_ERROR, f'Missing weather data: {error}')
+        yield DecisionRecord(line_number,weather_data,decision)
+
+# Dictionary: Replays a recording into a JSON Lines output. Returns how many lines had each reason.
+def RunReplay(input_name,output_object,profile=None):
+    counts = {name: 0 for name in dw.REASON_NAMES}
+    with OpenRecording(input_name) as file_object:
+        for record in ReplayWeather(file_object,profile):
+            counts[record['reason']] += 1
+            output_object.write(json.dumps(record) + '\n')
+    return counts
+
+def main(argv=None):
+    import argparse # Command line options
+
+    parser = argparse.ArgumentParser(description='Replay recorded weather JSON Lines through the flight decision.')
+    parser.add_argument('recording', help='JSON Lines file of weather API responses (.gz allowed, - for standard input)')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    parser.add_argument('--output', metavar='FILE', help='decision records file (default: standard output)')
+    args = parser.parse_args(argv)
+
+    profile = dw.PROFILE_STORE.Load('replay',args.profile) if args.profile else None
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_object:
+            counts = RunReplay(args.recording,output_object,profile)
+    else:
+        counts = RunReplay(args.recording,sys.stdout,profile)
+
+    # Summary goes to the error stream so standard output stays one record per line.
+    total = sum(counts.values())
+    safe = sum(counts[dw.REASON_NAMES[reason_code]] for reason_code in dw.SAFE_REASONS)
+    print(f'{total} records replayed, {safe} safe to fly.', file=sys.stderr)
+    print(', '.join(f'{name}: {count}' for name, count in counts.items()), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
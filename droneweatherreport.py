@@ -0,0 +1,179 @@
+# File Name: droneweatherreport.py
+# Description: Builds weather reports. Text reports are built in one string and written once.
+#              JSON and CSV writers add one report at a time to a single file, so a fleet of any size
+#              is written with the same small amount of memory.
+
+
+import io # Text buffer for a report
+import csv # CSV reports
+import json # JSON reports
+
+# Weather columns in CSV reports, in order. Same names as ExtractWeather in droneweather.py.
+WEATHER_FIELDS = ('loc_city', 'loc_state', 'loc_country', 'loc_ground', 'loc_longitude', 'loc_lattitude',
+                  'time_current', 'time_sunrise', 'time_sunset', 'weather_title', 'weather_desc',
+                  'temp_current', 'temp_feelslike', 'pressure_sea', 'humidity', 'visibility',
+                  'is_cloud', 'cloud_percentage', 'wind_speed', 'wind_direction', 'is_wind_gust', 'wind_gust')
+# Decision columns in CSV reports. They come first.
+DECISION_FIELDS = ('location', 'safe', 'reason', 'message')
+# Report formats and the file name endings that pick them.
+FORMATS = ('text', 'json', 'jsonl', 'csv')
+FORMAT_ENDINGS = {'.json': 'json', '.jsonl': 'jsonl', '.csv': 'csv', '.txt': 'text'}
+
+
+# String: Full text weather report and recommendation. weather is the Observation from ExtractWeather
+# (or a dictionary with the same keys).
+def RenderTextReport(weather,is_safe_to_fly,decision_reason):
+    report = io.StringIO()
+    write = report.write
+
+    # General Weather Report
+
+    write('========== Weather Report ==========\n') # Title
+    write(f'Weather found for {weather["loc_city"]}, {weather["loc_state"]}, {weather["loc_country"]}\n') # Location
+    write(f'Coordinates: {weather["loc_longitude"]}°W,{weather["loc_lattitude"]}°N\n') # Coordinates
+    write(f'Altitude: {weather["loc_ground"]} feet above sea level\n') # Ground altitude at coordinates
+    write(f'Weather: {weather["weather_title"]} ({weather["weather_desc"]})\n') # Weather and small description
+    write(f'Temperature: {weather["temp_current"]:0.1f}°F\n') # Temperature (actual)
+    write(f'Feels like {weather["temp_feelslike"]:0.1f}°F\n') # Temperature (feels like)
+    write(f'Visibility: {weather["visibility"]:0.1f} miles\n') # Visibility (miles)
+
+    # Cloud coverage only if clouds exist.
+    if weather['is_cloud']:
+        write(f'Clouds are covering {weather["cloud_percentage"]:0.0f}% of the sky\n')
+
+    write(f'Humidity: {weather["humidity"]:0.0f}%\n') # Humidity
+    write(f'Sea Level Pressure: {weather["pressure_sea"]} hPa\n') # Sea Level Pressure
+
+    # Wind speeds and gusts if there are any.
+    if weather['wind_speed'] <= 3:
+        # Calm winds are generally considered less than 3 knots in aviation.
+        write('Winds are calm. (less than 3 mph)\n')
+    elif weather['is_wind_gust']:
+        write(f'Winds: {weather["wind_speed"]} mph from {weather["wind_direction"]}°, Gusting {weather["wind_gust"]} mph\n')
+    else:
+        write(f'Winds: {weather["wind_speed"]} mph from {weather["wind_direction"]}°\n')
+
+    # Styling seperation
+    write('\n------------------------------------\n\n')
+
+    # Recommendation
+
+    write('========== Recommendation ==========\n') # Title
+    write('By the information provided you are\n')
+    if is_safe_to_fly:
+        write('SAFE to fly!\n')
+
+        # 'Clouds Indicated' is a special case since the API cannot determine cloud altitude.
+        # So it is safe to fly but gives notice that clouds are in the vacinity of the airspace.
+        if decision_reason == 'Clouds Indicated':
+            write('\nNOTICE: Clouds indicated in vacinity\nof airspace.\n')
+    else:
+        # Not safe to fly with reason determined by PrefCheckWeather function
+        write('NOT SAFE to fly.\n')
+        write(f'\nReason: {decision_reason}\n')
+
+    # If there are clouds add a notice about having visual line of sight.
+    if weather['is_cloud']:
+        write('\nNOTICE: The current API used does not\n'
+              'allow any cloud layers to be seen by\n'
+              'the program. Please ensure you will\n'
+              'have a visual line of sight with the\n'
+              'drone before starting flight operation.\n')
+    write('\n======= End of Weather Report =======\n\n')
+    return report.getvalue()
+
+# String: Text report for a Decision from droneweather.Evaluate. Decisions without weather get a short error block.
+def RenderDecisionText(decision):
+    if decision.weather is None:
+        location = ', '.join(str(part) for part in decision.location) if decision.location else 'unknown location'
+        return (f'========== Weather Report ==========\n'
+                f'{location}\n'
+                f'{decision.reason}\n'
+                f'======= End of Weather Report =======\n\n')
+    return RenderTextReport(decision.weather, decision.safe, decision.reason)
+
+# String: Report format for a file name, from its ending. Text when the ending is unknown.
+def FormatForFile(file_name):
+    for ending, report_format in FORMAT_ENDINGS.items():
+        if file_name.lower().endswith(ending):
+            return report_format
+    return 'text'
+
+
+# Class: Writes text reports one after another.
+class TextReportWriter:
+
+    def __init__(self,file_object):
+        self.file_object = file_object
+        self.count = 0
+
+    # Void: Adds one Decision. The whole report is written with one call.
+    def Write(self,decision):
+        self.file_object.write(RenderDecisionText(decision))
+        self.count += 1
+        return
+
+    # Void: Nothing to finish for text.
+    def Close(self):
+        return
+
+# Class: Writes a JSON array of decisions one item at a time. The array is closed by Close.
+# lines=True writes JSON Lines instead (one object per line, no array).
+class JsonReportWriter:
+
+    def __init__(self,file_object,lines=False):
+        self.file_object = file_object
+        self.lines = lines
+        self.count = 0
+        if not lines:
+            self.file_object.write('[\n')
+
+    # Void: Adds one Decision.
+    def Write(self,decision):
+        item = json.dumps(decision.ToDict())
+        if self.lines:
+            self.file_object.write(item + '\n')
+        else:
+            # Comma before every item except the first.
+            self.file_object.write((',\n' if self.count else '') + item)
+        self.count += 1
+        return
+
+    # Void: Ends the JSON array.
+    def Close(self):
+        if not self.lines:
+            self.file_object.write('\n]\n')
+        return
+
+# Class: Writes a CSV file with one row per decision. The header is written first.
+class CsvReportWriter:
+
+    def __init__(self,file_object):
+        self.file_object = file_object
+        self.writer = csv.writer(file_object)
+        self.writer.writerow(DECISION_FIELDS + WEATHER_FIELDS)
+        self.count = 0
+
+    # Void: Adds one Decision. Weather columns are empty when the weather could not be found.
+    def Write(self,decision):
+        item = decision.ToDict()
+        weather = decision.weather or {}
+        self.writer.writerow([item[field] for field in DECISION_FIELDS] + [weather.get(field, '') for field in WEATHER_FIELDS])
+        self.count += 1
+        return
+
+    # Void: Nothing to finish for CSV.
+    def Close(self):
+        return
+
+# Writer: Report writer for a format ('text', 'json', 'jsonl' or 'csv').
+def ReportWriter(report_format,file_object):
+    if report_format == 'json':
+        return JsonReportWriter(file_object)
+    if report_format == 'jsonl':
+        return JsonReportWriter(file_object, lines=True)
+    if report_format == 'csv':
+        return CsvReportWriter(file_object)
+    if report_format == 'text':
+        return TextReportWriter(file_object)
+    raise ValueError(f'Report format must be one of {", ".join(FORMATS)}: {report_format}')
@@ -0,0 +1,281 @@
+# File Name: droneweatherresilience.py
+# Description: Keeps one slow or failing API call from holding up a brief. Every request has connect and read
+#              timeouts, failed requests are tried again after a random (jittered) wait, a slow request can be
+#              raced by a second copy once it runs past the usual (p95) time, and a circuit breaker stops asking
+#              for a while when the API keeps failing so briefs fail fast instead of waiting on timeouts.
+# Usage: policy = FetchPolicy(retries=2, hedge=True)
+#        weather_data = policy.Call(lambda timeout: SendRequest(..., timeout), label, scheduler)
+
+
+import time # Backoff waits and breaker timing
+import random # Jitter
+import threading # Breaker and latency history are shared by fleet threads
+
+import droneweathermetrics as metrics # Retry, hedge and breaker counts
+
+# Seconds to wait for a connection, and for the response once connected.
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10.0
+# Times a failed request is tried again.
+RETRIES = 2
+# First backoff wait (seconds). Doubles for each retry, up to BACKOFF_MAX. The wait is a random part of it.
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+# Recent request times kept to find the hedge delay.
+LATENCY_WINDOW = 200
+# Request times needed before the p95 is trusted. Until then HEDGE_DELAY is used.
+LATENCY_MIN_SAMPLES = 20
+# Seconds before a second copy of a slow request is sent, before enough times are known.
+HEDGE_DELAY = 1.0
+# Shortest hedge delay (seconds), so a very fast API does not get every request twice.
+HEDGE_MIN_DELAY = 0.05
+# Callers that can be making requests at the same time when none is given. Each can have two copies running.
+CALLERS = 16
+# Server failures in a row that open the circuit, and seconds it stays open before one trial request.
+BREAKER_FAILURES = 5
+BREAKER_RESET = 30.0
+# Breaker states.
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half-open'
+
+
+# Class: Raised when the circuit is open. An OSError so callers treat it like any other network error.
+class CircuitOpenError(OSError):
+    pass
+
+# Boolean: True for API answers worth trying again: a server error (5xx).
+# Rate limited answers (429) are not. They go back to the scheduler, which holds back every call for a while.
+def IsRetryable(weather_data):
+    return str(weather_data.get('cod')).startswith('5')
+
+# Boolean: True when the API says the plan's rate limit was reached (429).
+def IsRateLimited(weather_data):
+    return str(weather_data.get('cod')) == '429'
+
+# Float: Seconds to wait before retry number attempt (0 first). Full jitter: anywhere from 0 to the backoff,
+# so many clients failing at once do not all come back at the same moment.
+def Backoff(attempt,base=BACKOFF_BASE,cap=BACKOFF_MAX):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Class: Recent request times. Gives the p95 used as the hedge delay.
+class LatencyTracker:
+
+    def __init__(self,window=LATENCY_WINDOW):
+        self.window = window
+        self._times = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    # Void: Adds one request time (seconds). The oldest is replaced once the window is full.
+    def Add(self,seconds):
+        with self._lock:
+            if len(self._times) < self.window:
+                self._times.append(seconds)
+            else:
+                self._times[self._next] = seconds
+                self._next = (self._next + 1) % self.window
+        return
+
+    # Float or None: Request time at a percentile. None until LATENCY_MIN_SAMPLES times are known.
+    def Percentile(self,percent):
+        with self._lock:
+            if len(self._times) < LATENCY_MIN_SAMPLES:
+                return None
+            times = sorted(self._times)
+        return times[min(len(times) - 1, int(len(times) * percent / 100))]
+
+
+# Class: Circuit breaker. Closed lets requests through. failures server failures in a row open it, and every
+# request fails at once for reset seconds. Then one trial request goes through (half-open): success closes it,
+# failure opens it again.
+class CircuitBreaker:
+
+    def __init__(self,failures=BREAKER_FAILURES,reset=BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = BREAKER_CLOSED
+        self._failed = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    # Void: Raises CircuitOpenError when a request may not go out now.
+    def Allow(self):
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return
+            if self.state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.reset:
+                # This request is the trial. Others keep failing fast until it finishes.
+                self.state = BREAKER_HALF_OPEN
+                return
+            self.rejected += 1
+            wait = max(0.0, self.reset - (time.monotonic() - self._opened_at))
+        metrics.Increment('breaker_rejected')
+        raise CircuitOpenError(f'weather API is failing, not asking again for {wait:.0f} seconds')
+
+    # Void: A request reached the API and got an answer that is not a server failure.
+    def Success(self):
+        with self._lock:
+            self._failed = 0
+            self.state = BREAKER_CLOSED
+        return
+
+    # Void: A request timed out, could not connect or got a server error.
+    def Failure(self):
+        with self._lock:
+            self._failed += 1
+            if self.state == BREAKER_HALF_OPEN or (self.state == BREAKER_CLOSED and self._failed >= self.failures):
+                self.state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                opened = True
+            else:
+                opened = False
+        if opened:
+            metrics.Increment('breaker_opened')
+        return
+
+    # Boolean: True while requests are failing fast.
+    def IsOpen(self):
+        with self._lock:
+            return self.state == BREAKER_OPEN and time.monotonic() - self._opened_at < self.reset
+
+
+# Class: How API requests are made: timeouts, retries, hedging and the circuit breaker.
+# breaker=False turns the breaker off. hedge sends a second copy of a request still running after the p95 time.
+# callers is how many threads can be making requests at once (the connection pool size). Hedging has room for all of them.
+class FetchPolicy:
+
+    def __init__(self,connect_timeout=CONNECT_TIMEOUT,read_timeout=READ_TIMEOUT,retries=RETRIES,hedge=False,
+                 breaker_failures=BREAKER_FAILURES,breaker_reset=BREAKER_RESET,breaker=True,callers=CALLERS):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.hedge = hedge
+        self.callers = callers
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset) if breaker else None
+        self.latency = LatencyTracker()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    # JSON: Result of send(timeout), tried again on timeouts, network errors and 5xx answers.
+    # send makes one request with the (connect, read) timeout given and returns the weather JSON.
+    # Raises the last network error (an OSError) when every try failed that way. Otherwise the last answer
+    # is returned, even an error answer, so the caller sees the API's message. Other errors are raised at once.
+    # scheduler is the RequestScheduler whose turn this call already took. Every retry waits for a turn of its own
+    # and a hedged copy goes out only when a token is free, so the rate limit counts every request sent.
+    def Call(self,send,label='',scheduler=None):
+        self.calls += 1
+        error = None
+        weather_data = None
+        for attempt in range(self.retries + 1):
+            if attempt and scheduler is not None:
+                scheduler.Throttle(label=label)
+            if self.breaker is not None:
+                self.breaker.Allow()
+            try:
+                weather_data = self._Attempt(send,label,scheduler)
+                error = None
+            except OSError as attempt_error:
+                error = attempt_error
+                weather_data = None
+            except Exception:
+                # Not worth trying again (a bad answer), but the breaker must still hear how the request went,
+                # or a trial request would leave it half-open for good.
+                if self.breaker is not None:
+                    self.breaker.Failure()
+                raise
+
+            # Anything that is not a network error or a server error is final, including 404 and 429.
+            if error is None and not IsRetryable(weather_data):
+                if self.breaker is not None:
+                    self.breaker.Success()
+                return weather_data
+            if self.breaker is not None:
+                self.breaker.Failure()
+            if attempt == self.retries or (self.breaker is not None and self.breaker.IsOpen()):
+                break
+            self.retried += 1
+            metrics.Increment('retries',label)
+            time.sleep(Backoff(attempt))
+
+        if error is not None:
+            raise error
+        return weather_data
+
+    # JSON: One try. With hedging a second copy goes out if the first is still running after the p95 time,
+    # and whichever answers first is used. Under a rate limit the copy is sent only if scheduler has a token free.
+    def _Attempt(self,send,label,scheduler=None):
+        if not self.hedge:
+            return self._Timed(send)
+
+        from concurrent.futures import wait, FIRST_COMPLETED # Imported here to keep start up fast.
+
+        delay = self.latency.Percentile(95)
+        delay = HEDGE_DELAY if delay is None else max(HEDGE_MIN_DELAY, delay)
+        executor = self._Executor()
+        first = executor.submit(self._Timed, send)
+        done, pending = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        if scheduler is not None and not scheduler.TryTake():
+            # Every token is spoken for. Waiting on the first copy is cheaper than making another call wait.
+            return first.result()
+
+        self.hedged += 1
+        metrics.Increment('hedged',label)
+        second = executor.submit(self._Timed, send)
+        futures = [first, second]
+        while futures:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.remove(future)
+                # A failed copy waits for the other. The error is raised only if both fail.
+                if future.exception() is None or not futures:
+                    if future is second and future.exception() is None:
+                        self.hedge_wins += 1
+                    return future.result()
+        return first.result()
+
+    # JSON: send with the policy's timeouts. Times of good answers are kept for the hedge delay.
+    def _Timed(self,send):
+        start = time.perf_counter()
+        weather_data = send(self.timeout)
+        if not IsRetryable(weather_data) and not IsRateLimited(weather_data):
+            self.latency.Add(time.perf_counter() - start)
+        return weather_data
+
+    # ThreadPoolExecutor: Threads that run requests when hedging. Two per caller, so a first copy never waits
+    # for a thread (which would look slow and send a hedged copy for nothing). Created on first use.
+    def _Executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor # Imported here to keep start up fast.
+                self._executor = ThreadPoolExecutor(max_workers=2 * self.callers, thread_name_prefix='hedge')
+            return self._executor
+
+    # Void: Makes room for at least callers threads making requests at once. Used when a service grows its pool.
+    def Reserve(self,callers):
+        with self._executor_lock:
+            if callers <= self.callers:
+                return
+            self.callers = callers
+            # Requests already running finish on the old threads.
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        return
+
+    # Dictionary: Calls, retries, hedged copies sent and won, the breaker state and the current hedge delay.
+    def Stats(self):
+        stats = {'calls': self.calls, 'retries': self.retried, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins,
+                 'p95_seconds': self.latency.Percentile(95)}
+        if self.breaker is not None:
+            stats.update({'breaker': self.breaker.state, 'breaker_opened': self.breaker.opened, 'breaker_rejected': self.breaker.rejected})
+        return stats
@@ -0,0 +1,209 @@
+# File Name: droneweatherroute.py
+# Description: Checks a flight corridor or survey area instead of one city. The route (or the area inside a
+#              polygon) is sampled into points at a chosen spacing, points served by the same weather station
+#              are asked for once, and every segment (or grid cell) gets a safe / not safe result.
+# Usage: python droneweatherroute.py route.txt --spacing 2 --profile droneweatherprefrences.dat
+#        python droneweatherroute.py area.txt --area --spacing 1
+#        Files have one "lattitude, longitude" per line, or are GeoJSON (LineString or Polygon).
+
+
+import sys # Standard output
+import math # Distances and grid spacing
+
+import droneweather as dw # Weather, bulk requests and the flight decision
+from droneweathergazetteer import DistanceKm, KM_PER_DEGREE, GAZETTEER_FILE # Distances and the local city index
+
+# Kilometers between sample points when none is given.
+SPACING_KM = 2.0
+# Farthest (km) a point can be from the nearest city in the local city index and still use its weather.
+# Points farther away are asked for by coordinates.
+MAX_STATION_KM = 25.0
+# Without a local city index, points are rounded to this many degrees (about 11 km) so close points share a request.
+SNAP_DEGREES = 0.1
+# Map letters for each reason code in area maps.
+REASON_LETTERS = {dw.REASON_AUTHORIZED: '.', dw.REASON_CLOUDS: 'c', dw.REASON_HAZARD: 'H', dw.REASON_NIGHT: 'N',
+                  dw.REASON_RAIN: 'R', dw.REASON_WIND: 'W', dw.REASON_ERROR: 'E'}
+
+
+# List: (lattitude, longitude) points from a file. One "lattitude, longitude" per line, or GeoJSON.
+# GeoJSON gives the first LineString or the outer ring of the first Polygon.
+def ReadPoints(file_name):
+    if file_name.lower().endswith(('.json', '.geojson')):
+        import json # Imported here to keep start up fast.
+
+        with open(file_name, 'r', encoding='utf-8') as file_object:
+            geometry = json.load(file_object)
+        # Feature collections and features hold the geometry inside.
+        if geometry.get('type') == 'FeatureCollection':
+            geometry = geometry['features'][0]
+        if geometry.get('type') == 'Feature':
+            geometry = geometry['geometry']
+        coordinates = geometry['coordinates'][0] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        # GeoJSON puts longitude first.
+        return [(float(point[1]), float(point[0])) for point in coordinates]
+
+    with open(file_name, 'r') as file_object:
+        return [dw.ParseSite(line.strip()) for line in file_object if line.strip() and not line.startswith('#')]
+
+# List: Sample points along a route as (segment number, lattitude, longitude).
+# Segment n runs from point n to point n + 1. Points are at most spacing_km apart and include both ends.
+def SampleRoute(points,spacing_km=SPACING_KM):
+    samples = []
+    for segment, (start, end) in enumerate(zip(points, points[1:])):
+        steps = max(1, math.ceil(DistanceKm(start[0], start[1], end[0], end[1]) / spacing_km))
+        # Straight steps in degrees. Good enough over the few kilometers between samples.
+        for step in range(steps):
+            fraction = step / steps
+            samples.append((segment, start[0] + (end[0] - start[0]) * fraction, start[1] + (end[1] - start[1]) * fraction))
+    if len(points) > 1:
+        samples.append((len(points) - 2, points[-1][0], points[-1][1]))
+    elif points:
+        samples.append((0, points[0][0], points[0][1]))
+    return samples
+
+# Boolean: True when a point is inside a polygon (list of points). Ray casting, edges count as outside.
+def InsidePolygon(lattitude,longitude,polygon):
+    inside = False
+    for (lat1, lon1), (lat2, lon2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (lat1 > lattitude) != (lat2 > lattitude):
+            crossing = lon1 + (lattitude - lat1) / (lat2 - lat1) * (lon2 - lon1)
+            if longitude < crossing:
+                inside = not inside
+    return inside
+
+# List: Grid cells inside a polygon as ((row, column), lattitude, longitude) of each cell's center.
+# Cells are spacing_km on a side. Row 0 is the north edge.
+def SampleArea(polygon,spacing_km=SPACING_KM):
+    north = max(point[0] for point in polygon)
+    south = min(point[0] for point in polygon)
+    west = min(point[1] for point in polygon)
+    east = max(point[1] for point in polygon)
+
+    # Degrees of longitude get shorter away from the equator. The middle of the area sets the width.
+    lattitude_step = spacing_km / KM_PER_DEGREE
+    longitude_step = spacing_km / (KM_PER_DEGREE * max(0.01, math.cos(math.radians((north + south) / 2))))
+    rows = max(1, math.ceil((north - south) / lattitude_step))
+    columns = max(1, math.ceil((east - west) / longitude_step))
+
+    samples = []
+    for row in range(rows):
+        lattitude = north - (row + 0.5) * lattitude_step
+        for column in range(columns):
+            longitude = west + (column + 0.5) * longitude_step
+            if InsidePolygon(lattitude, longitude, polygon):
+                samples.append(((row, column), lattitude, longitude))
+    return samples
+
+# Tuple: Location to ask the API for at a point. The nearest city in the local city index when it is close
+# enough, so points served by the same station share one request. Otherwise rounded coordinates.
+def StationFor(lattitude,longitude):
+    if dw.GAZETTEER is not None:
+        nearest = dw.GAZETTEER.Nearest(lattitude, longitude, 1)
+        if nearest and nearest[0][0] <= MAX_STATION_KM:
+            return (nearest[0][1].id,)
+    return (round(round(lattitude / SNAP_DEGREES) * SNAP_DEGREES, 4), round(round(longitude / SNAP_DEGREES) * SNAP_DEGREES, 4))
+
+# Dictionary: Decision for every station the samples use. Station -> Decision.
+# Each station is asked for once, through group requests and the cache.
+def EvaluateStations(stations,profile=None,max_workers=dw.FLEET_WORKERS):
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+    weather = dw.BulkWeather(stations,max_workers)
+    decisions = {}
+    for station in stations:
+        try:
+            decisions[station] = dw.EvaluateWeatherData(weather[station],profile,station)
+        except (KeyError, TypeError, ValueError) as error:
+            decisions[station] = dw.Decision(station, False, dw.REASON_ERROR, f'Error getting weather: {error}')
+    return decisions
+
+# List: One result per segment (or cell), in order. A segment is safe only when every sample in it is.
+# Its reason is the first not safe reason along it, or clouds when any sample saw clouds.
+# samples are from SampleRoute or SampleArea. Each result has the segment, its samples and their stations.
+def CheckSamples(samples,profile=None,max_workers=dw.FLEET_WORKERS):
+    sample_stations = [StationFor(lattitude, longitude) for segment, lattitude, longitude in samples]
+    # Stations in first seen order, each once.
+    decisions = EvaluateStations(list(dict.fromkeys(sample_stations)),profile,max_workers)
+
+    results = {}
+    for (segment, lattitude, longitude), station in zip(samples, sample_stations):
+        decision = decisions[station]
+        result = results.get(segment)
+        if result is None:
+            result = results[segment] = {'segment': segment, 'samples': 0, 'stations': [], 'safe': True,
+                                         'reason_code': dw.REASON_AUTHORIZED, 'message': 'Authorized.'}
+        result['samples'] += 1
+        if station not in result['stations']:
+            result['stations'].append(station)
+        # The first not safe sample decides the segment. Clouds only replace authorized.
+        if result['safe'] and (not decision.safe or decision.reason_code == dw.REASON_CLOUDS):
+            result['safe'] = decision.safe
+            result['reason_code'] = decision.reason_code
+            result['message'] = decision.reason.replace('\n', ' ')
+    return list(results.values())
+
+# String: Text map of an area. One letter per cell (see REASON_LETTERS), blank outside the polygon.
+def AreaMap(results):
+    rows = max(result['segment'][0] for result in results) + 1
+    columns = max(result['segment'][1] for result in results) + 1
+    grid = [[' '] * columns for row in range(rows)]
+    for result in results:
+        row, column = result['segment']
+        grid[row][column] = REASON_LETTERS[result['reason_code']]
+    return '\n'.join(''.join(line).rstrip() for line in grid)
+
+def main(argv=None):
+    import os, json, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Check a flight route or survey area as a set of sample points.')
+    parser.add_argument('points', help='file with one "lattitude, longitude" per line, or GeoJSON')
+    parser.add_argument('--area', action='store_true', help='the points are a polygon. Check the area inside it')
+    parser.add_argument('--spacing', type=float, default=SPACING_KM, help='kilometers between sample points')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    parser.add_argument('--gazetteer', metavar='FILE', help=f'local city index (default: {GAZETTEER_FILE} when it exists)')
+    parser.add_argument('--workers', type=int, default=dw.FLEET_WORKERS, help='number of requests made at the same time')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per segment or cell')
+    args = parser.parse_args(argv)
+
+    # Sample points share a station's weather through the local city index.
+    if args.gazetteer:
+        dw.UseGazetteer(args.gazetteer)
+    elif os.path.exists(GAZETTEER_FILE):
+        dw.UseGazetteer(GAZETTEER_FILE)
+
+    points = ReadPoints(args.points)
+    profile = dw.PROFILE_STORE.Load('route',args.profile) if args.profile else None
+    if args.area:
+        # A closed ring repeats the first point at the end. It is not needed.
+        if len(points) > 1 and points[0] == points[-1]:
+            points = points[:-1]
+        samples = SampleArea(points,args.spacing)
+    else:
+        samples = SampleRoute(points,args.spacing)
+    if not samples:
+        parser.error('no sample points (is the area smaller than one cell?)')
+    results = CheckSamples(samples,profile,args.workers)
+
+    stations = {station for result in results for station in result['stations']}
+    for result in results:
+        if args.json:
+            print(json.dumps({'segment': result['segment'], 'samples': result['samples'], 'safe': result['safe'],
+                              'reason': dw.REASON_NAMES[result['reason_code']], 'message': result['message'],
+                              'stations': [', '.join(str(part) for part in station) for station in result['stations']]}))
+        elif not args.area:
+            start, end = points[result['segment']], points[result['segment'] + 1]
+            status = 'SAFE' if result['safe'] else 'NOT SAFE'
+            print(f'{result["segment"] + 1:>4} {start[0]:.4f},{start[1]:.4f} -> {end[0]:.4f},{end[1]:.4f} '
+                  f'{DistanceKm(start[0], start[1], end[0], end[1]):>7.1f} km  {status:<8} | {result["message"]}')
+    if args.area and not args.json:
+        print(AreaMap(results))
+        print('. safe, c safe with clouds, H hazard, N night, R rain, W wind, E error')
+
+    # Summary goes to the error stream so JSON output stays one object per line.
+    safe = sum(1 for result in results if result['safe'])
+    print(f'{safe} of {len(results)} {"cells" if args.area else "segments"} safe to fly. '
+          f'{len(samples)} sample points, {len(stations)} weather stations.', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# File Name: droneweatherscheduler.py
+# Description: Puts API calls in order before they go out. A token bucket keeps calls under the plan's
+#              rate limit, a priority queue lets pre-flight checks go ahead of background refreshes, and
+#              requests for a location that is already being fetched wait for that call instead of making another.
+# Usage: scheduler = RequestScheduler(rate=60, per=60)
+#        weather_data = scheduler.Fetch(key, lambda: RequestWeather(...), PRIORITY_URGENT)
+
+
+import time # Token refill and waiting
+import heapq # Priority queue
+import itertools # Order of arrival inside one priority
+import threading # Fleet threads share one scheduler
+
+import droneweathermetrics as metrics # Queue time and coalesced calls
+
+# Priorities. Lower numbers go first.
+PRIORITY_URGENT = 0 # A pilot waiting on a pre-flight check.
+PRIORITY_NORMAL = 1 # Interactive and fleet briefs.
+PRIORITY_BACKGROUND = 2 # Refreshes nobody is waiting on.
+# Calls per minute allowed on the free openweathermap.org plan.
+FREE_PLAN_RATE = 60
+
+# Priority for calls made by this thread when none is given. Set with UsePriority.
+_local = threading.local()
+
+
+# Integer: Priority of calls made by this thread.
+def CurrentPriority():
+    return getattr(_local, 'priority', PRIORITY_NORMAL)
+
+# Class: Sets the priority for calls this thread makes inside a with block.
+class UsePriority:
+
+    def __init__(self,priority):
+        self.priority = priority
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = CurrentPriority()
+        _local.priority = self.priority
+        return self
+
+    def __exit__(self,error_type,error,traceback):
+        _local.priority = self.previous
+        return False
+
+
+# Class: Token bucket. Holds up to burst tokens and gains rate tokens every per seconds.
+# Any per seconds sees at most rate + burst calls. Not locked, the scheduler holds its own lock.
+class TokenBucket:
+
+    def __init__(self,rate,per=60.0,burst=1):
+        self.fill_rate = rate / per # Tokens per second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    # Void: Adds the tokens gained since the last update.
+    def _Refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        return
+
+    # Float: Seconds until a token is ready. 0 when one is ready now.
+    def Delay(self):
+        self._Refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.fill_rate
+
+    # Void: Uses one token. Call only when Delay is 0.
+    def Take(self):
+        self.tokens -= 1
+        return
+
+    # Void: Empties the bucket and holds back calls for seconds more. Used after the API says the limit was hit.
+    def Drain(self,seconds=0.0):
+        self._Refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.fill_rate
+        return
+
+# Class: One call being waited on. Every request for the same key shares it.
+class _Ticket:
+    __slots__ = ('priority', 'order', 'queued', 'done', 'result', 'error')
+
+    def __init__(self,priority,order):
+        self.priority = priority
+        self.order = order
+        # True while the call waits in the queue. Cleared when it takes its turn.
+        self.queued = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    # Value: The call's result. Waits for it, and raises what the call raised.
+    def Result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+# Class: Orders API calls. rate=None turns off the rate limit and queue and only joins duplicate calls.
+class RequestScheduler:
+
+    def __init__(self,rate=None,per=60.0,burst=1):
+        self.bucket = TokenBucket(rate,per,burst) if rate else None
+        self._condition = threading.Condition()
+        # Heap of (priority, order, ticket). A ticket moved to a higher priority leaves its old entry behind.
+        self._queue = []
+        # Key -> ticket of the call being made or waited on.
+        self._in_flight = {}
+        self._order = itertools.count()
+        self.calls = 0
+        self.coalesced = 0
+        self.wait_seconds = 0.0
+
+    # Value: Result of function(). Calls for a key already in flight wait for that call and share its result.
+    # priority is one of the PRIORITY values. Without one the thread's priority from UsePriority is used.
+    def Fetch(self,key,function,priority=None,label=''):
+        if priority is None:
+            priority = CurrentPriority()
+
+        with self._condition:
+            ticket = self._in_flight.get(key)
+            if ticket is not None:
+                self.coalesced += 1
+                # A more urgent request raises the call's priority, even before the leader has joined the queue
+                # (it joins at the ticket's priority). A waiting call gets a new entry higher up the queue.
+                # A call already running has no entry and is left alone.
+                if priority < ticket.priority:
+                    ticket.priority = priority
+                    if ticket.queued:
+                        heapq.heappush(self._queue, (priority, ticket.order, ticket))
+                        self._condition.notify_all()
+                leader = False
+            else:
+                ticket = self._in_flight[key] = _Ticket(priority, next(self._order))
+                leader = True
+
+        if not leader:
+            metrics.Increment('coalesced',label)
+            return ticket.Result()
+
+        try:
+            if self.bucket is not None:
+                self._WaitTurn(ticket,label)
+            # Retries made inside the call wait for their own turns at the call's priority (see Throttle).
+            with UsePriority(ticket.priority):
+                ticket.result = function()
+            # The API says the plan's limit was reached. Hold back everything for a while.
+            if self.bucket is not None and isinstance(ticket.result, dict) and str(ticket.result.get('cod')) == '429':
+                with self._condition:
+                    self.bucket.Drain(1 / self.bucket.fill_rate)
+            return ticket.result
+        except BaseException as error:
+            ticket.error = error
+            raise
+        finally:
+            with self._condition:
+                self.calls += 1
+                del self._in_flight[key]
+            ticket.done.set()
+
+    # Void: Waits until the ticket is first in the queue and a token is ready, then takes the token.
+    def _WaitTurn(self,ticket,label):
+        start = time.perf_counter()
+        with self._condition:
+            ticket.queued = True
+            heapq.heappush(self._queue, (ticket.priority, ticket.order, ticket))
+            self._condition.notify_all()
+            while True:
+                # Entries left behind by a priority change, or by a call that already took its turn, are dropped.
+                while self._queue and (not self._queue[0][2].queued or self._queue[0][0] != self._queue[0][2].priority):
+                    heapq.heappop(self._queue)
+                if self._queue[0][2] is ticket:
+                    delay = self.bucket.Delay()
+                    if delay <= 0:
+                        heapq.heappop(self._queue)
+                        ticket.queued = False
+                        self.bucket.Take()
+                        # The next ticket may be able to go.
+                        self._condition.notify_all()
+                        break
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+            waited = time.perf_counter() - start
+            self.wait_seconds += waited
+        if metrics.ENABLED:
+            metrics.Record('queue', waited, label)
+        return
+
+    # Void: Waits for a turn and a token, like a new call, for an extra request inside a call that already had
+    # its turn (a retry), so every request the API sees is under the rate limit. Returns at once without a limit.
+    # priority is one of the PRIORITY values. Without one the thread's priority is used.
+    def Throttle(self,priority=None,label=''):
+        if self.bucket is None:
+            return
+        if priority is None:
+            priority = CurrentPriority()
+        with self._condition:
+            ticket = _Ticket(priority, next(self._order))
+        self._WaitTurn(ticket,label)
+        return
+
+    # Boolean: Takes a token only when one is ready now and no call is waiting for one. For extra requests that
+    # are only worth sending when they cost nobody a turn (a hedged copy). Always True without a rate limit.
+    def TryTake(self):
+        if self.bucket is None:
+            return True
+        with self._condition:
+            if any(ticket.queued for priority, order, ticket in self._queue) or self.bucket.Delay() > 0:
+                return False
+            self.bucket.Take()
+            return True
+
+    # Dictionary: Calls made, calls joined to another, seconds spent waiting and calls in flight now.
+    def Stats(self):
+        with self._condition:
+            return {'calls': self.calls,
+                    'coalesced': self.coalesced,
+                    'wait_seconds': round(self.wait_seconds, 3),
+                    'in_flight': len(self._in_flight)}
@@ -0,0 +1,335 @@
+# File Name: droneweatherservice.py
+# Description: Runs the flight decision as a local HTTP service so ground station apps can ask it directly.
+#              One asyncio loop holds every client connection. Weather requests run on a small thread pool that
+#              shares the HTTP session, the response cache and the scheduler, so many clients asking about the
+#              same site cause one API call. Each request can bring its own pilot limits.
+# Usage: python droneweatherservice.py --port 8000 --workers 32
+#        curl "http://127.0.0.1:8000/decision?location=Dunwoody,GA,US&wind=20&night=false&rain=true&cloud=false"
+#        curl -d '{"locations": ["Atlanta, GA, US", "33.94, -84.33"], "profile": {"wind": 15}}' http://127.0.0.1:8000/decisions
+
+
+import sys # Standard output
+import json # Request and response bodies
+import time # Request timing
+import asyncio # Client connections
+import threading # Service running beside a benchmark
+from urllib.parse import urlsplit, parse_qs # Reading the request
+from concurrent.futures import ThreadPoolExecutor # Weather requests off the event loop
+
+import droneweather as dw # Weather, cache and the flight decision
+import droneweathermetrics as metrics # Request timings
+from droneweatherprofile import PilotProfile # Pilot limits sent with a request
+
+# Address the service listens on. Local only unless told otherwise.
+HOST = '127.0.0.1'
+PORT = 8000
+# Weather requests made at the same time. Also the size of the connection pool to the API.
+WORKERS = 32
+# Most sites in one /decisions request.
+MAX_LOCATIONS = 100
+# Largest request body (bytes) and header block accepted.
+MAX_BODY = 65536
+# Seconds an idle keep-alive connection is held open.
+IDLE_TIMEOUT = 30
+# Connections waiting to be accepted. Hundreds of clients may connect at once.
+BACKLOG = 1024
+# Words accepted for true and false in query strings.
+TRUE_WORDS = ('true', '1', 'yes', 'on')
+FALSE_WORDS = ('false', '0', 'no', 'off')
+# Reason phrase for each status the service sends.
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+# Class: Error sent back to the client with an HTTP status.
+class HttpError(Exception):
+
+    def __init__(self,status,message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# Boolean: A flag from a query string or JSON body.
+def ParseFlag(name,value):
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in TRUE_WORDS:
+        return True
+    if str(value).strip().lower() in FALSE_WORDS:
+        return False
+    raise HttpError(400, f'{name} must be true or false')
+
+# PilotProfile or None: Pilot limits sent with a request. None when none were sent (the service default is used).
+# wind is needed. Certifications not sent are taken as not certified, the safe choice.
+def ParseProfile(values):
+    if not values:
+        return None
+    if not isinstance(values, dict):
+        raise HttpError(400, 'profile must be an object')
+    if 'wind' not in values:
+        raise HttpError(400, 'profile needs wind (max wind in mph)')
+    try:
+        wind = float(values['wind'])
+    except (TypeError, ValueError):
+        raise HttpError(400, 'wind must be a number')
+    return PilotProfile(str(values.get('name', 'request')),
+                        ParseFlag('night', values.get('night', False)),
+                        ParseFlag('rain', values.get('rain', False)),
+                        wind,
+                        ParseFlag('cloud', values.get('cloud', False)))
+
+# Tuple: A site from a request, parsed by droneweather.ParseSite.
+def ParseLocation(location):
+    if not isinstance(location, str) or not location.strip():
+        raise HttpError(400, 'location is needed: "city, state, country", "lattitude, longitude" or a city id')
+    try:
+        return dw.ParseSite(location)
+    except ValueError as error:
+        raise HttpError(400, f'bad location: {error}')
+
+
+# Class: The decision service. One instance holds the thread pool and the counters.
+class DecisionService:
+
+    # Void: profile is the PilotProfile used when a request sends none. Without one the preferences file is used.
+    def __init__(self,workers=WORKERS,profile=None):
+        self.workers = workers
+        self.profile = profile
+        self.executor = None
+        self.server_address = None
+        self._loop = None
+        self._stop = None
+        self._thread = None
+        # Counters are only changed on the event loop, so they need no lock.
+        self.requests = 0
+        self.errors = 0
+        self.decisions = 0
+        self.connections = 0
+        self.started = time.time()
+
+    # String: Base address of the running service.
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    # Dictionary: One site's decision as headless JSON. The fetch runs on the thread pool.
+    async def Decide(self,location,profile):
+        profile = profile or self.profile
+        if profile is None:
+            # The pilot's preferences file, read again only when it changes. Checking the file touches the disk,
+            # so it runs on the thread pool and not the event loop.
+            try:
+                profile = await self._loop.run_in_executor(self.executor, dw.PROFILE_STORE.Default)
+            except OSError:
+                raise HttpError(400, 'send pilot limits (wind, night, rain, cloud). The service has no preferences file')
+        decision = await self._loop.run_in_executor(self.executor, dw.Evaluate, location, profile)
+        self.decisions += 1
+        return decision.ToDict()
+
+    # Tuple: (status, body) for one request.
+    async def Route(self,method,target,body):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/decision':
+            if method == 'GET':
+                location = query.pop('location', None)
+                profile = ParseProfile({key: value for key, value in query.items() if key in ('name', 'night', 'rain', 'wind', 'cloud')})
+            elif method == 'POST':
+                request = self.ParseJson(body)
+                location = request.get('location')
+                profile = ParseProfile(request.get('profile'))
+            else:
+                raise HttpError(405, 'use GET or POST')
+            return 200, await self.Decide(ParseLocation(location), profile)
+
+        if url.path == '/decisions':
+            if method != 'POST':
+                raise HttpError(405, 'use POST')
+            request = self.ParseJson(body)
+            locations = request.get('locations')
+            if not isinstance(locations, list) or not locations:
+                raise HttpError(400, 'locations must be a list of sites')
+            if len(locations) > MAX_LOCATIONS:
+                raise HttpError(400, f'no more than {MAX_LOCATIONS} locations')
+            profile = ParseProfile(request.get('profile'))
+            # Every site is asked for at the same time. Results are in the order given.
+            sites = [ParseLocation(location) for location in locations]
+            return 200, {'decisions': list(await asyncio.gather(*(self.Decide(site, profile) for site in sites)))}
+
+        if method != 'GET':
+            raise HttpError(405, 'use GET')
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        if url.path == '/stats':
+            return 200, self.Stats()
+        if url.path == '/metrics':
+            return 200, metrics.PrometheusText()
+        raise HttpError(404, f'unknown path: {url.path}')
+
+    # Dictionary: JSON request body.
+    @staticmethod
+    def ParseJson(body):
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError as error:
+            raise HttpError(400, f'bad JSON: {error}')
+        if not isinstance(request, dict):
+            raise HttpError(400, 'body must be a JSON object')
+        return request
+
+    # Void: Serves one client connection. Requests on a kept-alive connection are answered in order.
+    async def Handle(self,reader,writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    return
+                start = time.perf_counter()
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.Send(writer, 400, {'error': 'bad request line'}, False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, separator, value = line.partition(':')
+                    if separator:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                self.requests += 1
+                try:
+                    length = int(headers.get('content-length', 0)) if headers.get('content-length', '0').isdigit() else -1
+                    if length < 0:
+                        raise HttpError(400, 'bad content-length')
+                    if length > MAX_BODY:
+                        raise HttpError(413, f'body over {MAX_BODY} bytes')
+                    body = await reader.readexactly(length) if length else b''
+                    status, response = await self.Route(method, target, body)
+                except HttpError as error:
+                    status, response = error.status, {'error': error.message}
+                if status != 200:
+                    self.errors += 1
+                await self.Send(writer, status, response, keep_alive)
+                if metrics.ENABLED:
+                    metrics.Record('request', time.perf_counter() - start, '', status != 200)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    # Void: Writes a response with a length so the connection can be reused. Text bodies (metrics) are sent as is.
+    @staticmethod
+    async def Send(writer,status,body,keep_alive):
+        if isinstance(body, str):
+            data, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(body).encode('utf-8'), 'application/json'
+        writer.write(f'HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n'
+                     f'Content-Type: {content_type}\r\n'
+                     f'Content-Length: {len(data)}\r\n'
+                     f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data)
+        await writer.drain()
+        return
+
+    # Dictionary: Requests served, errors, decisions made and open connections, with the cache, scheduler and fetch counts.
+    def Stats(self):
+        stats = {'uptime_seconds': round(time.time() - self.started, 1),
+                 'requests': self.requests,
+                 'errors': self.errors,
+                 'decisions': self.decisions,
+                 'connections': self.connections,
+                 'workers': self.workers}
+        if dw.WEATHER_CACHE is not None:
+            stats['cache'] = dw.WEATHER_CACHE.Stats()
+        if dw.SCHEDULER is not None:
+            stats['scheduler'] = dw.SCHEDULER.Stats()
+        stats['fetch'] = dw.FETCH_POLICY.Stats()
+        return stats
+
+    # Void: Listens until Stop is called. ready is set once the port is open.
+    async def Serve(self,host=HOST,port=PORT,ready=None):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        # Every worker can hold its own connection to the API.
+        dw.ReservePool(self.workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='weather')
+        server = await asyncio.start_server(self.Handle, host, port, backlog=BACKLOG)
+        self.server_address = server.sockets[0].getsockname()
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            self.executor.shutdown(wait=False)
+        return
+
+    # DecisionService: Starts serving in a background thread. port 0 picks a free port.
+    def Start(self,host=HOST,port=0):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.Serve(host, port, ready)), daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    # Void: Stops serving and closes the port.
+    def Stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+        return
+
+def main(argv=None):
+    import os, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Serve flight decisions over HTTP.')
+    parser.add_argument('--host', default=HOST, help='address to listen on (default: this computer only)')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='weather requests made at the same time')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file used when a request sends no pilot limits (default: droneweatherprefrences.dat)')
+    parser.add_argument('--cache-ttl', type=int, default=dw.CACHE_TTL, help='seconds a weather response stays fresh')
+    parser.add_argument('--cache-size', type=int, default=dw.CACHE_SIZE, help='most weather responses kept in the cache')
+    parser.add_argument('--cache-file', metavar='FILE', help='keep the cache on disk so the next start is warm')
+    parser.add_argument('--stale', type=int, default=dw.STALE_TTL, metavar='SECONDS', help='serve expired weather up to this long (marked stale) while it is fetched again or the API is down')
+    parser.add_argument('--timeout', type=float, default=dw.READ_TIMEOUT, help='seconds to wait for the API to answer')
+    parser.add_argument('--retries', type=int, default=dw.RETRIES, help='times a failed API request is tried again')
+    parser.add_argument('--hedge', action='store_true', help='send a second copy of an API request that runs past the usual (p95) time')
+    parser.add_argument('--rate-limit', type=float, metavar='CALLS', help='most API calls per minute (the free plan allows 60)')
+    parser.add_argument('--gazetteer', metavar='FILE', help=f'local city index (default: {dw.GAZETTEER_FILE} when it exists)')
+    parser.add_argument('--metrics', action='store_true', help='time every stage and serve the timings at /metrics')
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.Enable()
+    if args.gazetteer:
+        dw.UseGazetteer(args.gazetteer)
+    elif os.path.exists(dw.GAZETTEER_FILE):
+        dw.UseGazetteer(dw.GAZETTEER_FILE)
+    dw.ConfigureCache(args.cache_ttl,args.cache_size,args.cache_file,args.stale)
+    if args.rate_limit:
+        dw.ConfigureScheduler(args.rate_limit)
+    dw.ConfigureFetch(read_timeout=args.timeout,retries=args.retries,hedge=args.hedge)
+
+    profile = dw.PROFILE_STORE.Load('service',args.profile) if args.profile else None
+    service = DecisionService(args.workers,profile)
+    print(f'Serving flight decisions at http://{args.host}:{args.port}', flush=True)
+    try:
+        asyncio.run(service.Serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Saves the disk cache.
+        dw.WEATHER_CACHE.Close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
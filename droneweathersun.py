@@ -0,0 +1,141 @@
+# File Name: droneweathersun.py
+# Description: Sunrise, sunset and civil twilight for any place and day without asking the weather API.
+#              Uses the NOAA solar position equations (good to about a minute between the polar circles).
+#              Days already worked out are remembered, so checking many times at one site costs almost nothing.
+# Usage: python droneweathersun.py 33.9462 -84.3346 --days 7
+#        import droneweathersun as sun
+#        time_sunrise, time_sunset = sun.SunTimes(33.9462, -84.3346, 1722257216)
+
+
+import sys # Standard output
+import math # Solar position
+from functools import lru_cache # Remembered days
+
+import droneweather as dw # Night buffer used by the night check
+
+# Sun's zenith angle (degrees) at sunrise and sunset. 90 degrees plus refraction and the sun's radius.
+SUNRISE_ZENITH = 90.833
+# Sun's zenith angle at the start and end of civil twilight (sun 6 degrees below the horizon).
+CIVIL_ZENITH = 96.0
+# Seconds in a day.
+DAY_LENGTH = 86400
+# Coordinates are rounded to this many decimals before days are remembered (about 1 km, under 5 seconds of sunrise).
+ROUND_DECIMALS = 2
+# Most (place, day) results remembered.
+CACHE_SIZE = 4096
+
+
+# Tuple: Sun's declination (degrees) and the equation of time (minutes) at a UNIX time.
+# math_module is math for one time, or numpy for arrays of times. The equations are the same.
+def SolarPosition(moment,math_module=math):
+    m = math_module
+    julian_century = (moment / DAY_LENGTH + 2440587.5 - 2451545.0) / 36525
+    mean_longitude = (280.46646 + julian_century * (36000.76983 + julian_century * 0.0003032)) % 360
+    mean_anomaly = 357.52911 + julian_century * (35999.05029 - 0.0001537 * julian_century)
+    eccentricity = 0.016708634 - julian_century * (0.000042037 + 0.0000001267 * julian_century)
+    center = (m.sin(m.radians(mean_anomaly)) * (1.914602 - julian_century * (0.004817 + 0.000014 * julian_century))
+              + m.sin(m.radians(2 * mean_anomaly)) * (0.019993 - 0.000101 * julian_century)
+              + m.sin(m.radians(3 * mean_anomaly)) * 0.000289)
+    omega = m.radians(125.04 - 1934.136 * julian_century)
+    apparent_longitude = mean_longitude + center - 0.00569 - 0.00478 * m.sin(omega)
+    mean_obliquity = 23 + (26 + (21.448 - julian_century * (46.815 + julian_century * (0.00059 - julian_century * 0.001813))) / 60) / 60
+    obliquity = mean_obliquity + 0.00256 * m.cos(omega)
+    declination = m.degrees(m.asin(m.sin(m.radians(obliquity)) * m.sin(m.radians(apparent_longitude))))
+
+    y = m.tan(m.radians(obliquity / 2)) ** 2
+    longitude_radians = m.radians(mean_longitude)
+    anomaly_radians = m.radians(mean_anomaly)
+    equation_of_time = 4 * m.degrees(y * m.sin(2 * longitude_radians)
+                                     - 2 * eccentricity * m.sin(anomaly_radians)
+                                     + 4 * eccentricity * y * m.sin(anomaly_radians) * m.cos(2 * longitude_radians)
+                                     - 0.5 * y * y * m.sin(4 * longitude_radians)
+                                     - 1.25 * eccentricity * eccentricity * m.sin(2 * anomaly_radians))
+    return declination, equation_of_time
+
+# Float: Cosine of the sun's hour angle at a zenith angle. Above 1 the sun stays below it all day (polar night),
+# below -1 it stays above it all day (midnight sun).
+def HourAngleCosine(lattitude,declination,zenith,math_module=math):
+    m = math_module
+    return (m.cos(m.radians(zenith)) / (m.cos(m.radians(lattitude)) * m.cos(m.radians(declination)))
+            - m.tan(m.radians(lattitude)) * m.tan(m.radians(declination)))
+
+# Integer: Local solar day number of a UNIX time at a longitude. Days start at local midnight (mean solar time).
+def LocalDay(moment,longitude):
+    return int((moment + longitude * 240) // DAY_LENGTH)
+
+# Tuple: Sunrise and sunset (UNIX times) on a local solar day. zenith picks sunrise/sunset or twilight.
+# Polar night gives sunrise = sunset = solar noon (no daylight). Midnight sun gives a day from a day before to a day after.
+@lru_cache(maxsize=CACHE_SIZE)
+def DayTimes(lattitude,longitude,day,zenith=SUNRISE_ZENITH):
+    # Solar noon is found first, then the sun's position at noon gives the hour angle.
+    noon = day * DAY_LENGTH + DAY_LENGTH / 2 - longitude * 240
+    declination, equation_of_time = SolarPosition(noon)
+    noon -= equation_of_time * 60
+    declination, equation_of_time = SolarPosition(noon)
+
+    cosine = HourAngleCosine(lattitude,declination,zenith)
+    if cosine >= 1:
+        return int(noon), int(noon)
+    if cosine <= -1:
+        return int(noon - DAY_LENGTH), int(noon + DAY_LENGTH)
+    # One degree of hour angle is 240 seconds.
+    half_day = math.degrees(math.acos(cosine)) * 240
+    return int(round(noon - half_day)), int(round(noon + half_day))
+
+# Tuple: Sunrise and sunset (UNIX times) for the local day a UNIX time falls on.
+def SunTimes(lattitude,longitude,moment,zenith=SUNRISE_ZENITH):
+    lattitude = round(lattitude, ROUND_DECIMALS)
+    longitude = round(longitude, ROUND_DECIMALS)
+    return DayTimes(lattitude, longitude, LocalDay(moment, longitude), zenith)
+
+# Tuple: Start and end of civil twilight (UNIX times) for the local day a UNIX time falls on.
+def CivilTwilight(lattitude,longitude,moment):
+    return SunTimes(lattitude,longitude,moment,CIVIL_ZENITH)
+
+# Boolean: True when the night check would stop a pilot without night certification.
+# Same rule as PrefCheckCode: night until 30 minutes after sunrise and from 30 minutes before sunset.
+def IsNight(lattitude,longitude,moment,buffer=dw.NIGHT_BUFFER):
+    time_sunrise, time_sunset = SunTimes(lattitude,longitude,moment)
+    return moment <= time_sunrise + buffer or moment >= time_sunset - buffer
+
+# Void: Adds sunrise and sunset to weather JSON that is missing them (old recordings, other sources).
+# Uses the coordinates and time in the JSON. Weather that already has them, or has no coordinates, is left alone.
+def FillSunTimes(weather_data):
+    if 'coord' not in weather_data or 'dt' not in weather_data:
+        return
+    system = weather_data.setdefault('sys', {})
+    if 'sunrise' not in system or 'sunset' not in system:
+        system['sunrise'], system['sunset'] = SunTimes(weather_data['coord']['lat'], weather_data['coord']['lon'], weather_data['dt'])
+    return
+
+# List: One dictionary per day from the local day of start: day number, sunrise, sunset, dawn and dusk (UNIX times).
+def DayTable(lattitude,longitude,start,days=1):
+    rows = []
+    for offset in range(days):
+        moment = start + offset * DAY_LENGTH
+        time_sunrise, time_sunset = SunTimes(lattitude,longitude,moment)
+        time_dawn, time_dusk = CivilTwilight(lattitude,longitude,moment)
+        rows.append({'day': LocalDay(moment, round(longitude, ROUND_DECIMALS)), 'sunrise': time_sunrise, 'sunset': time_sunset,
+                     'dawn': time_dawn, 'dusk': time_dusk})
+    return rows
+
+def main(argv=None):
+    import time, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Sunrise, sunset and civil twilight without the weather API.')
+    parser.add_argument('lattitude', type=float)
+    parser.add_argument('longitude', type=float)
+    parser.add_argument('--start', type=int, help='UNIX time of the first day (default: now)')
+    parser.add_argument('--days', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # Times print in this computer's time zone.
+    clock = lambda moment: time.strftime('%H:%M', time.localtime(moment))
+    for row in DayTable(args.lattitude, args.longitude, args.start if args.start is not None else int(time.time()), args.days):
+        print(f'{time.strftime("%Y-%m-%d", time.localtime(row["sunrise"]))}  dawn {clock(row["dawn"])}  sunrise {clock(row["sunrise"])}  '
+              f'sunset {clock(row["sunset"])}  dusk {clock(row["dusk"])}  '
+              f'flyable without night certification {clock(row["sunrise"] + dw.NIGHT_BUFFER)} to {clock(row["sunset"] - dw.NIGHT_BUFFER)}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# File Name: droneweathervector.py
+# Description: Column (NumPy) version of the flight decision. Checks millions of recorded observations
+#              against a pilot's limits at once instead of one record at a time.
+#              Gives the same reason codes as CheckWeatherCode in droneweather.py.
+
+
+import numpy as np # Column math
+
+import droneweather as dw # Weather titles, reason codes and the one record at a time checks
+import droneweathersun as sun # Solar position equations
+
+# Largest openweathermap.org weather condition id. Lookup tables have a row for every id below it.
+MAX_WEATHER_ID = 1000
+# Row for ids outside the table (negative, or MAX_WEATHER_ID and up). They have no title and no group,
+# so they get the same title WeatherTitle gives any unknown id.
+UNKNOWN_ROW = MAX_WEATHER_ID
+
+
+# Array: Lookup table. True for every weather id whose title is in titles.
+def _TitleTable(titles):
+    table = np.zeros(MAX_WEATHER_ID + 1, dtype=bool)
+    for weather_id in range(MAX_WEATHER_ID):
+        table[weather_id] = dw.WeatherTitle(weather_id) in titles
+    table[UNKNOWN_ROW] = dw.WeatherTitle(-1) in titles
+    return table
+
+# Array: Lookup table row for every weather id. Ids outside the table use UNKNOWN_ROW.
+def _TableRows(weather_id):
+    return np.where((weather_id >= 0) & (weather_id < MAX_WEATHER_ID), weather_id, UNKNOWN_ROW)
+
+# Lookup tables by weather id. Built from the same title lists the one record at a time checks use.
+HAZARD_TABLE = _TitleTable(dw.HAZARD_TITLES)
+RAIN_TABLE = _TitleTable(dw.RAIN_TITLES)
+CLOUD_TABLE = _TitleTable(dw.CLOUD_TITLES)
+# Reason codes that are safe to fly, as a lookup table by reason code.
+SAFE_TABLE = np.isin(np.arange(len(dw.REASON_NAMES)), dw.SAFE_REASONS)
+
+
+# Arrays: Checks columns of observations against one pilot. Every column is the same length.
+# time_current, time_sunrise, time_sunset are UNIX times. wind_speed is in mph (not yet rounded up).
+# weather_id is the openweathermap.org condition id. Returns (safe flags, reason codes).
+def EvaluateColumns(time_current,time_sunrise,time_sunset,wind_speed,weather_id,profile=None):
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+
+    time_current = np.asarray(time_current, dtype=np.int64)
+    time_sunrise = np.asarray(time_sunrise, dtype=np.int64)
+    time_sunset = np.asarray(time_sunset, dtype=np.int64)
+    # Winds ceiling for larger safety margin. Same as ExtractWeather.
+    wind_speed = np.ceil(np.asarray(wind_speed, dtype=np.float64))
+    weather_rows = _TableRows(np.asarray(weather_id, dtype=np.int64))
+
+    # One condition per reason code, in the same order CheckWeatherCode checks them.
+    # A certification the pilot has turns its condition off.
+    no_rows = np.zeros(time_current.shape, dtype=bool)
+    is_hazard = HAZARD_TABLE[weather_rows]
+    if profile.night:
+        is_night = no_rows
+    else:
+        # Provides 30 minute buffer on each end.
+        is_night = (time_current >= time_sunset - dw.NIGHT_BUFFER) | (time_current <= time_sunrise + dw.NIGHT_BUFFER)
+    is_rain = no_rows if profile.rain else RAIN_TABLE[weather_rows]
+    is_wind = profile.wind < wind_speed
+    is_cloud = no_rows if profile.cloud else CLOUD_TABLE[weather_rows]
+
+    # First condition that is true gives the reason. Nothing true means authorized.
+    reason_codes = np.select([is_hazard, is_night, is_rain, is_wind, is_cloud],
+                             [dw.REASON_HAZARD, dw.REASON_NIGHT, dw.REASON_RAIN, dw.REASON_WIND, dw.REASON_CLOUDS],
+                             default=dw.REASON_AUTHORIZED).astype(np.int8)
+    return SAFE_TABLE[reason_codes], reason_codes
+
+# Arrays: Same as EvaluateColumns one record at a time through CheckWeatherCode. Used to check and benchmark the columns.
+def EvaluateScalar(time_current,time_sunrise,time_sunset,wind_speed,weather_id,profile=None):
+    if profile is None:
+        profile = dw.PROFILE_STORE.Default()
+
+    reason_codes = np.empty(len(time_current), dtype=np.int8)
+    for row in range(len(time_current)):
+        weather_title = dw.WeatherTitle(int(weather_id[row]))
+        # Only the fields the decision reads. Built the same way as ExtractWeather.
+        weather = {'time_current': int(time_current[row]),
+                   'time_sunrise': int(time_sunrise[row]),
+                   'time_sunset': int(time_sunset[row]),
+                   'weather_title': weather_title,
+                   'wind_speed': int(np.ceil(wind_speed[row])),
+                   'is_cloud': weather_title in dw.CLOUD_TITLES}
+        reason_codes[row] = dw.CheckWeatherCode(weather,profile)
+    return SAFE_TABLE[reason_codes], reason_codes
+
+# Arrays: Sunrise and sunset (UNIX times) for the local day of every time, worked out without the API.
+# Same equations and rules as droneweathersun.SunTimes (to within a second), for whole columns at once. Coordinates can be
+# single numbers (one site) or columns.
+def SunTimesColumns(time_current,lattitude,longitude,zenith=sun.SUNRISE_ZENITH):
+    time_current = np.asarray(time_current, dtype=np.int64)
+    lattitude = np.round(np.asarray(lattitude, dtype=np.float64), sun.ROUND_DECIMALS)
+    longitude = np.round(np.asarray(longitude, dtype=np.float64), sun.ROUND_DECIMALS)
+
+    # Solar noon of each time's local day, then the sun's position at noon.
+    day = (time_current + longitude * 240) // sun.DAY_LENGTH
+    noon = day * sun.DAY_LENGTH + sun.DAY_LENGTH / 2 - longitude * 240
+    declination, equation_of_time = sun.SolarPosition(noon, np)
+    noon = noon - equation_of_time * 60
+    declination, equation_of_time = sun.SolarPosition(noon, np)
+
+    # Polar night has no daylight, midnight sun is daylight from a day before to a day after.
+    cosine = sun.HourAngleCosine(lattitude, declination, zenith, np)
+    half_day = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0))) * 240
+    half_day = np.where(cosine <= -1, sun.DAY_LENGTH, np.where(cosine >= 1, 0.0, half_day))
+    time_sunrise = np.where(half_day == 0, np.trunc(noon), np.round(noon - half_day)).astype(np.int64)
+    time_sunset = np.where(half_day == 0, np.trunc(noon), np.round(noon + half_day)).astype(np.int64)
+    return time_sunrise, time_sunset
+
+# Dictionary of arrays: Columns for EvaluateColumns from weather JSON files (the format GetWeather returns).
+def ColumnsFromPayloads(payloads):
+    payloads = list(payloads)
+    return {'time_current': np.array([data['dt'] for data in payloads], dtype=np.int64),
+            'time_sunrise': np.array([data['sys']['sunrise'] for data in payloads], dtype=np.int64),
+            'time_sunset': np.array([data['sys']['sunset'] for data in payloads], dtype=np.int64),
+            'wind_speed': np.array([data['wind']['speed'] for data in payloads], dtype=np.float64),
+            'weather_id': np.array([data['weather'][0]['id'] for data in payloads], dtype=np.int64)}
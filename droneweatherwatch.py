@@ -0,0 +1,220 @@
+# File Name: droneweatherwatch.py
+# Description: Watches a set of sites and reports only when a site's decision changes (safe to not safe,
+#              or a different reason). Weather is checked again only when the fields the decision reads have
+#              changed. Sites whose wind is far from the pilot's limit are asked for less often than sites
+#              close to it, which saves API calls without making alerts late.
+# Usage: python droneweatherwatch.py sites.txt --profile droneweatherprefrences.dat --json
+
+
+import sys # Standard output
+import time # Poll times
+import heapq # Next site to poll
+import threading # Counters shared by the polling threads
+from concurrent.futures import ThreadPoolExecutor # Polling due sites at the same time
+
+import droneweather as dw # Weather, extraction and the flight decision
+from droneweatherscheduler import UsePriority, PRIORITY_BACKGROUND # Watch calls wait behind pilots
+
+# Seconds between polls of a site right at the pilot's wind limit, and of a site far from it.
+MIN_INTERVAL = 300
+MAX_INTERVAL = 1800
+# Wind margin (mph) at which a site gets MAX_INTERVAL. Closer margins are polled proportionally more often.
+WIND_MARGIN_SPAN = 10
+
+
+# Class: What is known about one watched site.
+class SiteWatch:
+    __slots__ = ('location', 'inputs', 'reason_code', 'reason', 'weather', 'next_poll', 'interval')
+
+    def __init__(self,location):
+        self.location = location
+        self.inputs = None
+        self.reason_code = None
+        self.reason = None
+        self.weather = None
+        self.next_poll = 0.0
+        self.interval = MIN_INTERVAL
+
+# Boolean: True when time_current is inside the daylight the night check allows (30 minute buffer on each end).
+def IsDaylight(weather):
+    return weather['time_sunrise'] + dw.NIGHT_BUFFER < weather['time_current'] < weather['time_sunset'] - dw.NIGHT_BUFFER
+
+# Tuple: Everything the decision reads, with the time reduced to day or night so a new time alone
+# does not count as a change. The pilot's limits are included so a preferences change is noticed.
+def DecisionInputs(weather,profile):
+    return (weather['weather_title'], weather['wind_speed'], weather['is_cloud'], IsDaylight(weather),
+            profile.night, profile.rain, profile.wind, profile.cloud)
+
+# Float: Seconds until the next poll of a site. Scales with how far the wind is from the pilot's limit
+# and is cut short when daylight starts or ends sooner.
+def PollInterval(weather,profile,min_interval=MIN_INTERVAL,max_interval=MAX_INTERVAL):
+    margin = min(abs(profile.wind - weather['wind_speed']) / WIND_MARGIN_SPAN, 1.0)
+    interval = min_interval + (max_interval - min_interval) * margin
+
+    # Next time the night check changes. Sunrise or sunset with the 30 minute buffer.
+    if weather['time_current'] <= weather['time_sunrise'] + dw.NIGHT_BUFFER:
+        boundary = weather['time_sunrise'] + dw.NIGHT_BUFFER
+    elif weather['time_current'] < weather['time_sunset'] - dw.NIGHT_BUFFER:
+        boundary = weather['time_sunset'] - dw.NIGHT_BUFFER
+    else:
+        boundary = None
+    if boundary is not None:
+        interval = min(interval, max(boundary - weather['time_current'], min_interval))
+    return interval
+
+
+# Class: Polls watched sites and keeps the last decision for each one.
+class Watcher:
+
+    # Void: sites are parsed by droneweather.ParseSite. profile is a PilotProfile.
+    # Without one the pilot's preferences file is used, and read again when it changes.
+    def __init__(self,sites,profile=None,min_interval=MIN_INTERVAL,max_interval=MAX_INTERVAL,max_workers=dw.FLEET_WORKERS):
+        self.profile = profile
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_workers = max_workers
+        dw.ReservePool(max_workers)
+        self.sites = [SiteWatch(dw.ParseSite(site)) for site in sites]
+        # Heap of (next poll, order, site). Every site is due at the start.
+        self._queue = [(0.0, order, site) for order, site in enumerate(self.sites)]
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.checks = 0
+        self.errors = 0
+        self.events = 0
+
+    # Dictionary or None: Polls one site. Gives an event when the decision or reason changed, otherwise None.
+    def Poll(self,site,now):
+        profile = self.profile if self.profile is not None else dw.PROFILE_STORE.Default()
+        with self._lock:
+            self.polls += 1
+        try:
+            weather_data = dw.GetSiteWeather(site.location)
+            if str(weather_data.get('cod')) != '200':
+                raise ValueError(weather_data.get('message', weather_data.get('cod')))
+            # A stale cached copy is checked at the current time, not the time it was recorded.
+            weather = dw.ExtractCurrentWeather(weather_data, site.location[1] if len(site.location) == 3 else '')
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            # Errors are tried again soon. They are an event only the first time.
+            site.inputs = None
+            site.weather = None
+            site.interval = self.min_interval
+            with self._lock:
+                self.errors += 1
+            return self._Update(site, dw.REASON_ERROR, f'Error getting weather: {error}', now)
+
+        site.weather = weather
+        site.interval = PollInterval(weather,profile,self.min_interval,self.max_interval)
+        inputs = DecisionInputs(weather,profile)
+        if inputs == site.inputs:
+            return None
+
+        # Something the decision reads has changed. Check again.
+        site.inputs = inputs
+        with self._lock:
+            self.checks += 1
+        reason_code = dw.CheckWeatherCode(weather,profile)
+        reason = dw.ReasonMessage(reason_code,weather['weather_title'],weather['wind_speed']) + dw.StaleNote(weather_data)
+        return self._Update(site, reason_code, reason, now)
+
+    # Dictionary or None: Keeps a site's new decision. Gives an event when it is different from the last one.
+    def _Update(self,site,reason_code,reason,now):
+        previous = site.reason_code
+        site.reason = reason
+        if reason_code == previous:
+            return None
+        site.reason_code = reason_code
+        with self._lock:
+            self.events += 1
+        return {'time': int(now),
+                'location': ', '.join(str(part) for part in site.location),
+                'safe': reason_code in dw.SAFE_REASONS,
+                'reason': dw.REASON_NAMES[reason_code],
+                'previous': dw.REASON_NAMES[previous] if previous is not None else None,
+                'message': reason.replace('\n', ' '),
+                'next_poll_seconds': round(site.interval)}
+
+    # List: Polls every site that is due at now. Gives the events in site order.
+    def Step(self,now=None):
+        now = time.time() if now is None else now
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(heapq.heappop(self._queue))
+
+        # Watch calls run behind any pilot waiting on a pre-flight check.
+        def PollSite(site):
+            with UsePriority(PRIORITY_BACKGROUND):
+                return self.Poll(site,now)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(due)))) as executor:
+            events = list(executor.map(PollSite, [site for next_poll, order, site in due]))
+        for next_poll, order, site in due:
+            site.next_poll = now + site.interval
+            heapq.heappush(self._queue, (site.next_poll, order, site))
+        return [event for event in events if event is not None]
+
+    # Float: Seconds until the next site is due.
+    def Wait(self,now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self._queue[0][0] - now) if self._queue else 0.0
+
+    # Generator: Polls forever (or for cycles rounds of due sites) and yields each event.
+    def Run(self,cycles=None):
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            time.sleep(self.Wait())
+            for event in self.Step():
+                yield event
+            cycle += 1
+
+    # Dictionary: Polls made, checks run, polls skipped because nothing changed, errors and events given.
+    def Stats(self):
+        with self._lock:
+            return {'sites': len(self.sites), 'polls': self.polls, 'checks': self.checks,
+                    'unchanged': self.polls - self.checks - self.errors, 'errors': self.errors, 'events': self.events}
+
+def main(argv=None):
+    import json, argparse # Imported here to keep start up fast.
+
+    parser = argparse.ArgumentParser(description='Watch sites and report only when a flight decision changes.')
+    parser.add_argument('fleet', nargs='?', help='file with one site per line: "city, state, country" or "lattitude, longitude"')
+    parser.add_argument('--site', action='append', default=[], help='site to watch (can be given more than once)')
+    parser.add_argument('--profile', metavar='FILE', help='preferences file to check against (default: droneweatherprefrences.dat)')
+    parser.add_argument('--min-interval', type=float, default=MIN_INTERVAL, help='seconds between polls at the wind limit')
+    parser.add_argument('--max-interval', type=float, default=MAX_INTERVAL, help='seconds between polls far from the wind limit')
+    parser.add_argument('--workers', type=int, default=dw.FLEET_WORKERS, help='number of sites polled at the same time')
+    parser.add_argument('--rate-limit', type=float, metavar='CALLS', help='most API calls per minute (the free plan allows 60)')
+    parser.add_argument('--cycles', type=int, help='stop after this many rounds of polling')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per event')
+    args = parser.parse_args(argv)
+
+    sites = list(args.site)
+    if args.fleet:
+        with open(args.fleet,'r') as file_object:
+            sites += [line.strip() for line in file_object if line.strip() and not line.startswith('#')]
+    if not sites:
+        parser.error('give a fleet file or at least one --site')
+
+    profile = dw.PROFILE_STORE.Load('watch',args.profile) if args.profile else None
+    if args.rate_limit:
+        dw.ConfigureScheduler(args.rate_limit)
+
+    watcher = Watcher(sites,profile,args.min_interval,args.max_interval,args.workers)
+    try:
+        for event in watcher.Run(args.cycles):
+            if args.json:
+                print(json.dumps(event), flush=True)
+            else:
+                status = 'SAFE' if event['safe'] else 'NOT SAFE'
+                print(f'{time.strftime("%H:%M:%S", time.localtime(event["time"]))} {status:<8} | {event["location"]} | {event["message"]}', flush=True)
+    except KeyboardInterrupt:
+        pass
+
+    # Summary goes to the error stream so standard output stays one event per line.
+    stats = watcher.Stats()
+    print(f'{stats["polls"]} polls of {stats["sites"]} sites, {stats["checks"]} checks, '
+          f'{stats["unchanged"]} unchanged, {stats["errors"]} errors, {stats["events"]} events.', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# File Name: conftest.py
+# Description: Shared test setup. Makes the project and benchmark modules importable and starts the stub API.
+
+
+import os # Project paths
+import sys # Import paths
+import json # City list for the test gazetteer
+import random # City coordinates
+
+import pytest # Fixtures
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT)
+sys.path.insert(0, os.path.join(PROJECT, 'benchmarks'))
+
+import droneweather as dw # Module settings reset between tests
+from droneweathergazetteer import BuildGazetteer # Test city index
+from stub_server import StubServer # Local stand-in for the API
+
+# Cities every test gazetteer has, besides a random spread over the world and a dense grid over north Georgia.
+NAMED_CITIES = [
+    {'id': 4192375, 'name': 'Dunwoody', 'state': 'GA', 'country': 'US', 'coord': {'lat': 33.946209, 'lon': -84.334633}},
+    {'id': 2657896, 'name': 'Zürich', 'state': '', 'country': 'CH', 'coord': {'lat': 47.36667, 'lon': 8.55}},
+    {'id': 5128581, 'name': 'New York', 'state': 'NY', 'country': 'US', 'coord': {'lat': 40.714272, 'lon': -74.005966}},
+    {'id': 4250542, 'name': 'Springfield', 'state': 'IL', 'country': 'US', 'coord': {'lat': 39.801659, 'lon': -89.643608}},
+    {'id': 4409896, 'name': 'Springfield', 'state': 'MO', 'country': 'US', 'coord': {'lat': 37.215328, 'lon': -93.298241}},
+    {'id': 2637827, 'name': 'Springfield', 'state': '', 'country': 'GB', 'coord': {'lat': 51.5, 'lon': -0.5}},
+    {'id': 6620000, 'name': 'Polar Station', 'state': '', 'country': 'AQ', 'coord': {'lat': -89.98, 'lon': 139.27}},
+    {'id': 6620001, 'name': 'North Camp', 'state': '', 'country': 'NO', 'coord': {'lat': 89.9, 'lon': -20.0}},
+    {'id': 6620002, 'name': 'Date Line East', 'state': '', 'country': 'FJ', 'coord': {'lat': -16.5, 'lon': 179.98}},
+    {'id': 6620003, 'name': 'Date Line West', 'state': '', 'country': 'WS', 'coord': {'lat': -16.6, 'lon': -179.97}},
+]
+
+
+# StubServer: Stub API on a free port. droneweather points at it with a fresh cache, scheduler and fetch policy.
+@pytest.fixture
+def stub():
+    server = StubServer().Start()
+    api_url = dw.API_URL
+    dw.API_URL = server.url
+    dw.ConfigureCache()
+    dw.ConfigureScheduler()
+    dw.ConfigureFetch()
+    try:
+        yield server
+    finally:
+        dw.API_URL = api_url
+        server.Stop()
+
+# String: Path of a small gazetteer index built once for the test run.
+# Random cities over the world, a city every 0.25 degrees over north Georgia (ids 5000000 and up) and NAMED_CITIES.
+@pytest.fixture(scope='session')
+def gazetteer_file(tmp_path_factory):
+    generator = random.Random(7)
+    cities = list(NAMED_CITIES)
+    for number in range(3000):
+        cities.append({'id': 3000000 + number, 'name': f'Town {number}', 'state': '', 'country': 'ZZ',
+                       'coord': {'lat': generator.uniform(-90, 90), 'lon': generator.uniform(-180, 180)}})
+    for row in range(9):
+        for column in range(9):
+            cities.append({'id': 5000000 + row * 9 + column, 'name': f'Grid {row} {column}', 'state': 'GA', 'country': 'US',
+                           'coord': {'lat': 33.0 + row * 0.25, 'lon': -85.0 + column * 0.25}})
+    directory = tmp_path_factory.mktemp('gazetteer')
+    city_list = directory / 'city.list.json'
+    city_list.write_text(json.dumps(cities), encoding='utf-8')
+    BuildGazetteer(str(city_list), str(directory / 'test.idx'))
+    return str(directory / 'test.idx')
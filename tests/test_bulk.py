@@ -0,0 +1,79 @@
+# File Name: test_bulk.py
+# Description: Bulk weather against the stub API: city ids go GROUP_SIZE to a request, and anything a group
+#              request leaves out or fails on is asked for one at a time.
+
+
+import time # Cache expiry
+
+import pytest # Fixtures
+
+import droneweather as dw
+from stub_server import UNKNOWN_ID # Ids the stub does not know
+
+
+@pytest.fixture(autouse=True)
+def no_gazetteer(monkeypatch):
+    # Names go to the API one at a time without a local city index.
+    monkeypatch.setattr(dw, 'GAZETTEER', None)
+
+
+def test_full_group_is_one_request(stub):
+    sites = [(4192375 + number,) for number in range(dw.GROUP_SIZE)]
+    results = dw.BulkWeather(sites)
+    assert stub.requests == 1
+    assert set(results) == set(sites)
+    assert all(results[site]['id'] == site[0] and str(results[site]['cod']) == '200' for site in sites)
+
+def test_ids_left_out_of_a_group_are_asked_singly(stub):
+    sites = [(4192375,), (4192376,), (UNKNOWN_ID,), (UNKNOWN_ID + 1,)]
+    results = dw.BulkWeather(sites)
+    # One group request, then one each for the ids it left out.
+    assert stub.requests == 3
+    assert results[(4192375,)]['id'] == 4192375
+    assert results[(4192376,)]['id'] == 4192376
+    assert str(results[(UNKNOWN_ID,)]['cod']) == '404'
+    assert str(results[(UNKNOWN_ID + 1,)]['cod']) == '404'
+
+def test_failed_group_is_not_asked_for_one_at_a_time(stub):
+    dw.ConfigureFetch(retries=0)
+    stub.error_rate = 1.0
+    sites = [(4192375 + number,) for number in range(dw.GROUP_SIZE)]
+    results = dw.BulkWeather(sites)
+    # One refused group call does not become GROUP_SIZE single calls.
+    assert stub.requests == 1
+    assert all(results[site]['cod'] == 'error' and 'stub server error' in results[site]['message'] for site in sites)
+
+def test_failed_group_uses_stale_copies(stub):
+    dw.ConfigureCache(ttl=1, stale_ttl=600)
+    dw.ConfigureFetch(retries=0)
+    sites = [(4192375 + number,) for number in range(3)]
+    dw.BulkWeather(sites)
+    time.sleep(1.1)
+    stub.down = True
+    results = dw.BulkWeather(sites)
+    assert stub.requests == 2
+    assert all(results[site]['id'] == site[0] and results[site]['stale_seconds'] >= 1 for site in sites)
+
+def test_bad_single_answer_is_one_error(stub, monkeypatch):
+    def BadBody(location):
+        raise ValueError('Expecting value: line 1 column 1 (char 0)')
+    monkeypatch.setattr(dw, 'GetSiteWeather', BadBody)
+    results = dw.BulkWeather([(39.74, -104.99), (4192375,)])
+    assert results[(39.74, -104.99)] == {'cod': 'error', 'message': 'Expecting value: line 1 column 1 (char 0)'}
+    assert results[(4192375,)]['id'] == 4192375
+
+def test_coordinates_and_names_are_asked_singly(stub):
+    sites = [(39.74, -104.99), ('denver', 'co', 'us'), ('nowhere', 'st', 'us'), (4192375,)]
+    results = dw.BulkWeather(sites)
+    # Three single requests and one group of one id.
+    assert stub.requests == 4
+    assert results[(39.74, -104.99)]['coord'] == {'lat': 39.74, 'lon': -104.99}
+    assert results[('denver', 'co', 'us')]['name'] == 'Denver'
+    assert str(results[('nowhere', 'st', 'us')]['cod']) == '404'
+    assert results[(4192375,)]['id'] == 4192375
+
+def test_cached_ids_are_not_asked_again(stub):
+    sites = [(4192375 + number,) for number in range(3)]
+    first = dw.BulkWeather(sites)
+    assert dw.BulkWeather(sites) == first
+    assert stub.requests == 1
@@ -0,0 +1,76 @@
+# File Name: test_commandline.py
+# Description: Headless runs from the command line: exit status and output for saved weather.
+
+
+import os # Sample payload path
+import json # Printed decisions
+
+import pytest # Fixtures
+
+import droneweather as dw
+from conftest import PROJECT # Project folder
+
+SAMPLE_WEATHER = os.path.join(PROJECT, 'benchmarks', 'sample_weather.json')
+
+
+# String: Writes a preferences file (night, rain, max wind, beyond line of sight) and gives its path.
+def WritePreferences(directory,night=True,rain=True,wind=100,cloud=True):
+    file_name = os.path.join(directory, 'prefs.dat')
+    with open(file_name, 'w') as file_object:
+        file_object.write(f'{night}\n{rain}\n{float(wind)}\n{cloud}\n')
+    return file_name
+
+@pytest.fixture(autouse=True)
+def keep_settings(monkeypatch):
+    # CommandLine replaces the module's cache, fetch policy, preferences and connection pool. They are put back after each test.
+    for name in ('WEATHER_CACHE', 'FETCH_POLICY', 'PROFILE_STORE', 'POOL_SIZE', '_session'):
+        monkeypatch.setattr(dw, name, getattr(dw, name))
+    monkeypatch.setattr(dw, 'PROFILE_STORE', dw.ProfileStore())
+
+
+def test_missing_preferences_file_has_its_own_status(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert dw.CommandLine(['--no-cache', '--headless', 'dunwoody, ga, us', '--weather-json', SAMPLE_WEATHER]) == 3
+    output = capsys.readouterr()
+    assert output.out == ''
+    assert 'No preferences file droneweatherprefrences.dat' in output.err and '--profile' in output.err
+
+def test_missing_profile_file_has_its_own_status(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert dw.CommandLine(['--no-cache', '--headless', 'dunwoody, ga, us', '--profile', 'missing.dat']) == 3
+    assert 'No preferences file missing.dat' in capsys.readouterr().err
+
+def test_headless_saved_weather(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    status = dw.CommandLine(['--no-cache', '--headless', 'dunwoody, ga, us', '--weather-json', SAMPLE_WEATHER,
+                             '--profile', WritePreferences(str(tmp_path))])
+    decision = json.loads(capsys.readouterr().out)
+    assert decision['location'] == 'dunwoody, ga, us'
+    assert status == int(not decision['safe'])
+
+def test_pilots_with_saved_weather_stay_offline(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dw, 'GetSiteWeather', lambda location: pytest.fail('asked the API'))
+    pilots = tmp_path / 'pilots.csv'
+    pilots.write_text('name,night,rain,wind,cloud\nall,True,True,100,True\ncalm,True,True,0,True\n', encoding='utf-8')
+    status = dw.CommandLine(['--no-cache', '--headless', 'dunwoody, ga, us', '--weather-json', SAMPLE_WEATHER, '--pilots', str(pilots)])
+    result = json.loads(capsys.readouterr().out)
+    assert status == 0
+    assert result['pilots'] == 2
+    assert [pilot['name'] for pilot in result['allowed']] == ['all']
+    assert result['stale_seconds'] is None
+
+def test_connection_pool_follows_workers(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dw, '_session', None)
+    dw.CommandLine(['--no-cache', '--workers', '64', '--headless', 'dunwoody, ga, us', '--weather-json', SAMPLE_WEATHER,
+                    '--profile', WritePreferences(str(tmp_path))])
+    assert dw.POOL_SIZE == 64
+    assert dw.FETCH_POLICY.callers == 64
+    assert dw.GetSession().get_adapter('https://api.openweathermap.org')._pool_maxsize == 64
+
+    # A session already made gets the larger pool too. The pool never shrinks.
+    dw.ReservePool(80)
+    dw.ReservePool(8)
+    assert dw.POOL_SIZE == 80
+    assert dw.GetSession().get_adapter('http://127.0.0.1')._pool_maxsize == 80
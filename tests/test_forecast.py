@@ -0,0 +1,75 @@
+# File Name: test_forecast.py
+# Description: Flight windows from saved forecast payloads and from the stub API.
+
+
+import os # Sample payload path
+import json # Sample payload
+
+import droneweather as dw
+import droneweatherforecast as forecast
+from droneweatherprofile import PilotProfile
+from conftest import PROJECT # Project folder
+
+# Midnight UTC on 2024-07-29. The test city has sunrise at 06:00 and sunset at 20:00 UTC.
+DAY = 1722211200
+HOUR = 3600
+DAYLIGHT = PilotProfile('day', night=False, rain=False, wind=20, cloud=True)
+NIGHT = PilotProfile('night', night=True, rain=False, wind=20, cloud=True)
+
+
+# Dictionary: One forecast slot starting at dt.
+def Slot(dt,title='Clear',wind=5.0):
+    return {'dt': dt, 'main': {'temp': 70, 'humidity': 50}, 'weather': [{'id': 800, 'main': title, 'description': title.lower()}],
+            'clouds': {'all': 0}, 'wind': {'speed': wind, 'deg': 180}, 'visibility': 10000}
+
+# Dictionary: Forecast for one day of 3 hour slots. titles maps a slot's hour to its weather title (default Clear).
+def DayForecast(titles=None):
+    titles = titles or {}
+    city = {'name': 'Testville', 'country': 'US', 'timezone': 0, 'sunrise': DAY + 6 * HOUR, 'sunset': DAY + 20 * HOUR}
+    return {'cod': '200', 'city': city, 'list': [Slot(DAY + hour * HOUR, titles.get(hour, 'Clear')) for hour in range(0, 24, 3)]}
+
+
+def test_daylight_window_keeps_the_night_buffer():
+    result = forecast.FindFlightWindows(DayForecast(),DAYLIGHT)
+    assert [(window['start'], window['end']) for window in result['windows']] == \
+           [(DAY + 6 * HOUR + dw.NIGHT_BUFFER, DAY + 20 * HOUR - dw.NIGHT_BUFFER)]
+    assert result['earliest'] is result['longest']
+    assert result['longest']['minutes'] == 13 * 60
+
+def test_night_certified_pilot_flies_all_day():
+    result = forecast.FindFlightWindows(DayForecast(),NIGHT)
+    assert [(window['start'], window['end']) for window in result['windows']] == [(DAY, DAY + 24 * HOUR)]
+
+def test_slots_before_sunrise_are_night():
+    slots = forecast.CheckForecastSlots(DayForecast(),DAYLIGHT)
+    assert [reason_code for start, end, reason_code in slots[:2]] == [dw.REASON_NIGHT, dw.REASON_NIGHT]
+    assert slots[2] == (DAY + 6 * HOUR + dw.NIGHT_BUFFER, DAY + 9 * HOUR, dw.REASON_AUTHORIZED)
+
+def test_rain_splits_the_window():
+    result = forecast.FindFlightWindows(DayForecast({12: 'Rain'}),DAYLIGHT)
+    assert [window['minutes'] for window in result['windows']] == [330, 270]
+    assert result['earliest'] is result['longest']
+    assert [window['minutes'] for window in forecast.FindFlightWindows(DayForecast({12: 'Rain'}),DAYLIGHT,300)['windows']] == [330]
+
+def test_error_payload_has_no_windows():
+    result = forecast.FindFlightWindows({'cod': '404', 'message': 'city not found'},DAYLIGHT)
+    assert result['error'] == 'Error getting forecast: city not found'
+    assert result['windows'] == [] and result['longest'] is None
+
+def test_saved_sample_payload():
+    with open(os.path.join(PROJECT, 'benchmarks', 'sample_forecast.json'), 'r') as file_object:
+        forecast_data = json.load(file_object)
+    results = dict(forecast.FleetFlightWindows([(('sample',), forecast_data), (('damaged',), {'cod': '200', 'list': [{}]})],DAYLIGHT))
+    windows = results[('sample',)]['windows']
+    assert windows and results[('sample',)]['city'] == 'Dunwoody'
+    # Windows are in time order and do not touch.
+    assert all(earlier['end'] < later['start'] for earlier, later in zip(windows, windows[1:]))
+    assert results[('sample',)]['longest']['minutes'] == max(window['minutes'] for window in windows)
+    assert results[('damaged',)]['error'].startswith('Missing forecast data')
+
+def test_fleet_windows_from_the_stub(stub):
+    results = dict(forecast.FetchFleetWindows(['denver, co, us', 'nowhere, st, us'],2,NIGHT))
+    assert stub.requests == 2
+    assert results[('denver', 'co', 'us')]['city'] == 'Denver'
+    assert 'error' not in results[('denver', 'co', 'us')]
+    assert results[('nowhere', 'st', 'us')]['error'] == 'Error getting forecast: city not found'
@@ -0,0 +1,59 @@
+# File Name: test_gazetteer.py
+# Description: Local city index: name lookups and nearest cities against checking every city.
+
+
+import random # Query points
+
+import pytest # Fixtures
+
+from droneweathergazetteer import Gazetteer, DistanceKm
+
+
+@pytest.fixture
+def gazetteer(gazetteer_file):
+    gazetteer = Gazetteer(gazetteer_file)
+    try:
+        yield gazetteer
+    finally:
+        gazetteer.Close()
+
+# List: The k closest places by checking every city. Each item is (kilometers, city id).
+def BruteNearest(gazetteer,lattitude,longitude,k):
+    places = [gazetteer._Place(record) for record in range(len(gazetteer))]
+    return sorted((DistanceKm(lattitude, longitude, place.lattitude, place.longitude), place.id) for place in places)[:k]
+
+
+def test_resolve_ignores_case_spacing_and_accents(gazetteer):
+    assert gazetteer.Resolve('Dunwoody', 'GA', 'US').id == 4192375
+    assert gazetteer.Resolve('  DUNWOODY ', ' ga', 'us ').id == 4192375
+    assert gazetteer.Resolve('new   york', 'ny', 'us').id == 5128581
+    assert gazetteer.Resolve('zurich', 'ch', 'ch').id == 2657896
+
+def test_resolve_state_and_country(gazetteer):
+    assert gazetteer.Resolve('springfield', 'mo', 'us').id == 4409896
+    assert gazetteer.Resolve('springfield', 'il', 'us').id == 4250542
+    # Outside the United States the state is entered the same as the country, and places have none.
+    assert gazetteer.Resolve('springfield', 'gb', 'gb').id == 2637827
+    assert gazetteer.Resolve('springfield', 'tx', 'us') is None
+    assert gazetteer.Resolve('dunwoody', 'ga', 'ca') is None
+    assert gazetteer.Resolve('nowhere', 'ga', 'us') is None
+
+def test_nearest_matches_checking_every_city(gazetteer):
+    generator = random.Random(11)
+    points = [(generator.uniform(-90, 90), generator.uniform(-180, 180)) for number in range(40)]
+    for lattitude, longitude in points:
+        for k in (1, 5):
+            found = [(distance, place.id) for distance, place in gazetteer.Nearest(lattitude, longitude, k)]
+            assert found == pytest.approx(BruteNearest(gazetteer, lattitude, longitude, k))
+
+@pytest.mark.parametrize('lattitude, longitude', [(90.0, 0.0), (89.95, 160.0), (-90.0, -45.0), (-89.9, -40.7),
+                                                  (-16.55, 180.0), (-16.55, -180.0), (-16.55, 179.99), (0.0, -179.99)])
+def test_nearest_near_the_poles_and_the_date_line(gazetteer,lattitude,longitude):
+    for k in (1, 3):
+        found = [(distance, place.id) for distance, place in gazetteer.Nearest(lattitude, longitude, k)]
+        assert found == pytest.approx(BruteNearest(gazetteer, lattitude, longitude, k))
+
+def test_nearest_crosses_the_date_line(gazetteer):
+    # Just west of the date line (longitude 179.99), the closest city is just east of it (-179.97).
+    assert [place.id for distance, place in gazetteer.Nearest(-16.6, 179.99, 2)] == [6620003, 6620002]
+    assert gazetteer.Nearest(-16.6, 179.99, 1)[0][0] < 5
@@ -0,0 +1,60 @@
+# File Name: test_history.py
+# Description: The history store keeps each observation once and skips recording lines that are not weather.
+
+
+import os # Sample payload path
+import json # Recordings
+
+import droneweather as dw
+import droneweatherhistory as history
+from conftest import PROJECT # Project folder
+
+
+# Dictionary: The sample weather payload.
+def SamplePayload():
+    with open(os.path.join(PROJECT, 'benchmarks', 'sample_weather.json'), 'r') as file_object:
+        return json.load(file_object)
+
+
+def test_lines_that_are_not_objects_are_skipped(tmp_path):
+    recording = tmp_path / 'recording.jsonl'
+    recording.write_text('\n'.join(['[1, 2]', '"x"', '3', '{not json', json.dumps(SamplePayload())]) + '\n', encoding='utf-8')
+    store = history.HistoryStore(str(tmp_path / 'store'))
+    try:
+        assert history.ImportRecording(store,str(recording)) == (1, 4)
+        assert len(store) == 1
+    finally:
+        store.Close()
+
+def test_same_observation_is_kept_once(tmp_path):
+    weather_data = SamplePayload()
+    later = dict(weather_data, dt=weather_data['dt'] + 600)
+    recording = tmp_path / 'recording.jsonl'
+    recording.write_text('\n'.join(json.dumps(payload) for payload in (weather_data, weather_data, later)) + '\n', encoding='utf-8')
+
+    store = history.HistoryStore(str(tmp_path / 'store'))
+    try:
+        assert history.ImportRecording(store,str(recording)) == (2, 1)
+    finally:
+        store.Close()
+
+    # The rows on disk are known after the store is opened again.
+    store = history.HistoryStore(str(tmp_path / 'store'))
+    try:
+        assert history.ImportRecording(store,str(recording)) == (0, 3)
+        assert len(store) == 2
+    finally:
+        store.Close()
+
+def test_recent_times_stay_bounded(tmp_path):
+    weather_data = SamplePayload()
+    store = history.HistoryStore(str(tmp_path / 'store'))
+    try:
+        for hour in range(100):
+            assert store.Append(dw.ExtractWeather(dict(weather_data, dt=weather_data['dt'] + hour * 3600)))
+        # Checking the newest payload again from the cache adds nothing.
+        assert not store.Append(dw.ExtractWeather(dict(weather_data, dt=weather_data['dt'] + 99 * 3600)))
+        assert len(store) == 100
+        assert all(len(times) <= history.RECENT_TIMES for times in store._recent.values())
+    finally:
+        store.Close()
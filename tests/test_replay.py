@@ -0,0 +1,47 @@
+# File Name: test_replay.py
+# Description: Replaying recorded weather: every line gives one record, damaged lines become error records.
+
+
+import io # Recordings in memory
+import os # Sample payload path
+import sys # Standard input
+import json # Recordings
+
+import droneweatherreplay as replay
+from droneweatherprofile import PilotProfile
+from conftest import PROJECT # Project folder
+
+PILOT = PilotProfile('replay', night=True, rain=True, wind=100, cloud=True)
+
+
+# String: The sample weather payload as one JSON line.
+def SampleLine():
+    with open(os.path.join(PROJECT, 'benchmarks', 'sample_weather.json'), 'r') as file_object:
+        return json.dumps(json.load(file_object))
+
+
+def test_every_line_gives_a_record():
+    recording = io.StringIO('\n'.join([SampleLine(), '', '{"cod": "404", "message": "city not found"}', SampleLine()]) + '\n')
+    records = list(replay.ReplayWeather(recording,PILOT))
+    assert [record['line'] for record in records] == [1, 3, 4]
+    assert records[0]['reason'] != 'error'
+    assert records[1]['reason'] == 'error'
+    assert records[1]['message'] == 'Error getting weather: city not found'
+
+def test_lines_that_are_not_objects_become_error_records():
+    recording = io.StringIO('\n'.join(['[1, 2]', '"x"', '3', 'null', '{not json', '{}', SampleLine()]) + '\n')
+    records = list(replay.ReplayWeather(recording,PILOT))
+    assert len(records) == 7
+    assert all(record['reason'] == 'error' for record in records[:6])
+    assert [record['message'] for record in records[:5]] == ['Line is not a JSON object.'] * 5
+    assert records[6]['reason'] != 'error'
+
+def test_standard_input_stays_open(monkeypatch, tmp_path):
+    recording = tmp_path / 'recording.jsonl'
+    recording.write_text(SampleLine() + '\n', encoding='utf-8')
+    with open(recording, 'r', encoding='utf-8') as standard_input:
+        monkeypatch.setattr(sys, 'stdin', standard_input)
+        output = io.StringIO()
+        counts = replay.RunReplay('-',output,PILOT)
+        assert sum(counts.values()) == 1
+        assert not sys.stdin.closed
@@ -0,0 +1,135 @@
+# File Name: test_resilience.py
+# Description: Fetch policy: which answers are tried again, the circuit breaker, and room for hedged requests.
+
+
+import time # Breaker reset waits
+
+import pytest # Raised errors
+
+import droneweatherresilience as resilience
+from droneweatherresilience import FetchPolicy, BREAKER_CLOSED, BREAKER_OPEN
+from droneweatherscheduler import RequestScheduler
+
+
+# Function: A send that gives each answer (or raises each error) in turn and counts its calls.
+def Answers(*answers):
+    calls = []
+
+    def Send(timeout):
+        answer = answers[min(len(calls), len(answers) - 1)]
+        calls.append(timeout)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    Send.calls = calls
+    return Send
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, 'Backoff', lambda attempt, base=0, cap=0: 0.0)
+
+
+def test_server_errors_are_tried_again():
+    send = Answers({'cod': 500}, {'cod': 502}, {'cod': 200})
+    assert FetchPolicy(retries=2).Call(send) == {'cod': 200}
+    assert len(send.calls) == 3
+
+def test_network_errors_are_raised_after_the_last_try():
+    send = Answers(OSError('timed out'))
+    with pytest.raises(OSError):
+        FetchPolicy(retries=2, breaker=False).Call(send)
+    assert len(send.calls) == 3
+
+def test_rate_limited_answers_go_back_to_the_scheduler():
+    policy = FetchPolicy(retries=2, breaker_failures=2)
+    send = Answers({'cod': 429, 'message': 'limit'})
+    for call in range(5):
+        assert policy.Call(send) == {'cod': 429, 'message': 'limit'}
+    # Sent once per call, and the breaker does not count them as failures.
+    assert len(send.calls) == 5
+    assert policy.breaker.state == BREAKER_CLOSED
+
+def test_not_found_is_final():
+    send = Answers({'cod': '404', 'message': 'city not found'})
+    assert FetchPolicy(retries=2).Call(send)['cod'] == '404'
+    assert len(send.calls) == 1
+
+def test_breaker_fails_fast_and_recovers():
+    policy = FetchPolicy(retries=0, breaker_failures=2, breaker_reset=0.05)
+    failing = Answers(OSError('down'))
+    for call in range(2):
+        with pytest.raises(OSError):
+            policy.Call(failing)
+    with pytest.raises(resilience.CircuitOpenError):
+        policy.Call(failing)
+    assert len(failing.calls) == 2
+
+    time.sleep(0.06)
+    assert policy.Call(Answers({'cod': 200})) == {'cod': 200}
+    assert policy.breaker.state == BREAKER_CLOSED
+
+def test_trial_request_with_other_errors_leaves_half_open():
+    policy = FetchPolicy(retries=0, breaker_failures=1, breaker_reset=0.05)
+    with pytest.raises(OSError):
+        policy.Call(Answers(OSError('down')))
+    time.sleep(0.06)
+    # The trial gets a 200 answer that is not JSON.
+    with pytest.raises(ValueError):
+        policy.Call(Answers(ValueError('not JSON')))
+    assert policy.breaker.state == BREAKER_OPEN
+
+    time.sleep(0.06)
+    assert policy.Call(Answers({'cod': 200})) == {'cod': 200}
+    assert policy.breaker.state == BREAKER_CLOSED
+
+def test_hedged_copy_wins_over_a_stalled_request(monkeypatch):
+    stalled = []
+
+    def Send(timeout):
+        if not stalled:
+            stalled.append(1)
+            time.sleep(0.5)
+            return {'cod': 200, 'copy': 'first'}
+        return {'cod': 200, 'copy': 'second'}
+
+    # Too few request times are known for a p95, so the hedge goes out after HEDGE_DELAY.
+    monkeypatch.setattr(resilience, 'HEDGE_DELAY', 0.05)
+    policy = FetchPolicy(hedge=True)
+    start = time.perf_counter()
+    assert policy.Call(Send)['copy'] == 'second'
+    assert time.perf_counter() - start < 0.4
+    assert policy.hedge_wins == 1
+
+def test_retries_wait_for_their_own_tokens():
+    # One token every 0.2 seconds. The call's first request takes the first token.
+    scheduler = RequestScheduler(rate=1, per=0.2)
+    send = Answers({'cod': 500}, {'cod': 502}, {'cod': 200})
+    policy = FetchPolicy(retries=2)
+    start = time.perf_counter()
+    assert scheduler.Fetch('A', lambda: policy.Call(send,'',scheduler)) == {'cod': 200}
+    # Two retries, each a token later.
+    assert len(send.calls) == 3
+    assert time.perf_counter() - start >= 0.35
+
+def test_hedged_copy_needs_a_free_token(monkeypatch):
+    def Send(timeout):
+        time.sleep(0.2)
+        return {'cod': 200}
+
+    monkeypatch.setattr(resilience, 'HEDGE_DELAY', 0.05)
+    scheduler = RequestScheduler(rate=1, per=60)
+    policy = FetchPolicy(hedge=True)
+    # The call took the only token, so no copy goes out.
+    assert scheduler.Fetch('A', lambda: policy.Call(Send,'',scheduler)) == {'cod': 200}
+    assert policy.hedged == 0
+    # Without a limit the copy goes out.
+    assert policy.Call(Send,'',RequestScheduler()) == {'cod': 200}
+    assert policy.hedged == 1
+
+def test_hedge_threads_follow_the_callers():
+    policy = FetchPolicy(hedge=True, callers=40)
+    assert policy._Executor()._max_workers == 80
+    policy.Reserve(64)
+    assert policy._Executor()._max_workers == 128
+    policy.Reserve(8)
+    assert policy.callers == 64
@@ -0,0 +1,113 @@
+# File Name: test_route.py
+# Description: Routes and survey areas: sample points, grid cells, one request per weather station, and how
+#              the samples in a segment combine into its result.
+
+
+import math # Request counts
+
+import pytest # Fixtures
+
+import droneweather as dw
+import droneweatherroute as route
+from droneweathergazetteer import Gazetteer, DistanceKm
+from droneweatherprofile import PilotProfile
+
+# About 10 km of route going north east from Dunwoody, and a second leg back west.
+ROUTE = [(33.9462, -84.3346), (34.01, -84.26), (34.01, -84.40)]
+# About 11 km square.
+SQUARE = [(34.0, -84.4), (34.1, -84.4), (34.1, -84.28), (34.0, -84.28)]
+ALL_PILOT = PilotProfile('all', night=True, rain=True, wind=100, cloud=True)
+
+
+@pytest.fixture
+def gazetteer(gazetteer_file, monkeypatch):
+    gazetteer = Gazetteer(gazetteer_file)
+    monkeypatch.setattr(dw, 'GAZETTEER', gazetteer)
+    try:
+        yield gazetteer
+    finally:
+        gazetteer.Close()
+
+# Decision: A decision with only what CheckSamples reads.
+def MadeDecision(reason_code):
+    return dw.Decision(('test',), reason_code in dw.SAFE_REASONS, reason_code, dw.REASON_NAMES[reason_code])
+
+
+def test_route_samples_are_spaced_and_keep_both_ends():
+    samples = route.SampleRoute(ROUTE,2.0)
+    assert samples[0] == (0, ROUTE[0][0], ROUTE[0][1])
+    assert samples[-1] == (1, ROUTE[-1][0], ROUTE[-1][1])
+    # Each segment starts on its first point.
+    assert (1, ROUTE[1][0], ROUTE[1][1]) in samples
+    assert [segment for segment, lattitude, longitude in samples] == sorted(segment for segment, lattitude, longitude in samples)
+    for (segment1, lat1, lon1), (segment2, lat2, lon2) in zip(samples, samples[1:]):
+        assert DistanceKm(lat1, lon1, lat2, lon2) <= 2.0 + 1e-6
+    # Enough samples for the length of each segment.
+    for segment, (start, end) in enumerate(zip(ROUTE, ROUTE[1:])):
+        count = sum(1 for sample in samples[:-1] if sample[0] == segment)
+        assert count == math.ceil(DistanceKm(start[0], start[1], end[0], end[1]) / 2.0)
+
+def test_route_of_one_or_no_points():
+    assert route.SampleRoute([(34.0, -84.0)]) == [(0, 34.0, -84.0)]
+    assert route.SampleRoute([]) == []
+
+def test_area_cells_are_inside_the_polygon():
+    cells = route.SampleArea(SQUARE,2.0)
+    # 11 km north to south and 11 km east to west at 2 km cells: a 6 by 6 grid.
+    assert len(cells) == 36
+    assert {cell for cell, lattitude, longitude in cells} == {(row, column) for row in range(6) for column in range(6)}
+    assert all(route.InsidePolygon(lattitude, longitude, SQUARE) for cell, lattitude, longitude in cells)
+    # Row 0 is the north edge.
+    assert cells[0][1] > cells[-1][1]
+
+def test_closed_ring_gives_the_same_cells():
+    assert route.SampleArea(SQUARE + SQUARE[:1],2.0) == route.SampleArea(SQUARE,2.0)
+
+def test_triangle_keeps_only_cells_inside():
+    triangle = [(34.0, -84.4), (34.1, -84.4), (34.0, -84.28)]
+    cells = route.SampleArea(triangle,1.0)
+    square = route.SampleArea(SQUARE,1.0)
+    assert 0 < len(cells) < len(square)
+    assert all(route.InsidePolygon(lattitude, longitude, triangle) for cell, lattitude, longitude in cells)
+    assert not route.InsidePolygon(34.09, -84.29, triangle)
+
+def test_corridor_asks_each_station_once_by_coordinates(stub, monkeypatch):
+    monkeypatch.setattr(dw, 'GAZETTEER', None)
+    corridor = [(33.5, -84.9), (34.5, -83.9)]
+    samples = route.SampleRoute(corridor,0.25)
+    assert len(samples) >= 500
+    stations = {route.StationFor(lattitude, longitude) for segment, lattitude, longitude in samples}
+    results = route.CheckSamples(samples,ALL_PILOT)
+    assert stub.requests == len(stations)
+    assert sum(result['samples'] for result in results) == len(samples)
+
+def test_corridor_asks_each_station_once_in_groups(stub, gazetteer):
+    corridor = [(33.1, -84.9), (34.9, -83.1)]
+    samples = route.SampleRoute(corridor,0.5)
+    assert len(samples) >= 500
+    stations = {route.StationFor(lattitude, longitude) for segment, lattitude, longitude in samples}
+    # Every point is near a grid city, so every station is a city id.
+    assert all(len(station) == 1 for station in stations)
+    results = route.CheckSamples(samples,ALL_PILOT)
+    assert stub.requests == math.ceil(len(stations) / dw.GROUP_SIZE)
+    assert {station for result in results for station in result['stations']} == stations
+
+def test_first_not_safe_reason_wins(monkeypatch):
+    reasons = {'A': dw.REASON_AUTHORIZED, 'C': dw.REASON_CLOUDS, 'W': dw.REASON_WIND, 'R': dw.REASON_RAIN}
+    monkeypatch.setattr(route, 'StationFor', lambda lattitude, longitude: ('ACWR'[int(longitude)],))
+    monkeypatch.setattr(route, 'EvaluateStations', lambda stations, profile, max_workers:
+                        {station: MadeDecision(reasons[station[0]]) for station in stations})
+
+    # (segment, station letter) for each sample. The letter is picked by the longitude.
+    plan = [(0, 'A'), (0, 'C'), (0, 'W'), (0, 'R'),
+            (1, 'A'), (1, 'C'), (1, 'A'),
+            (2, 'R'), (2, 'C'), (2, 'W'),
+            (3, 'A'), (3, 'A')]
+    samples = [(segment, 0.0, float('ACWR'.index(letter))) for segment, letter in plan]
+    results = {result['segment']: result for result in route.CheckSamples(samples,ALL_PILOT)}
+    assert (results[0]['safe'], results[0]['reason_code']) == (False, dw.REASON_WIND)
+    # Clouds replace authorized and stay, since clouds are still safe.
+    assert (results[1]['safe'], results[1]['reason_code']) == (True, dw.REASON_CLOUDS)
+    assert (results[2]['safe'], results[2]['reason_code']) == (False, dw.REASON_RAIN)
+    assert (results[3]['safe'], results[3]['reason_code']) == (True, dw.REASON_AUTHORIZED)
+    assert results[0]['samples'] == 4 and results[0]['stations'] == [('A',), ('C',), ('W',), ('R',)]
@@ -0,0 +1,148 @@
+# File Name: test_scheduler.py
+# Description: Request scheduler: duplicate calls joined, priority order, and priority upgrades of joined calls.
+
+
+import time # Short waits for threads to reach the queue
+import threading # Callers running at the same time
+
+from droneweatherscheduler import RequestScheduler, PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_BACKGROUND
+
+
+# Thread: Runs scheduler.Fetch in a thread. The result goes into results[key].
+def StartFetch(scheduler,key,function,priority,results):
+    thread = threading.Thread(target=lambda: results.setdefault(key, []).append(scheduler.Fetch(key,function,priority)), daemon=True)
+    thread.start()
+    return thread
+
+# Boolean: True when Fetch for a new key finishes within timeout seconds.
+def FetchFinishes(scheduler,key,timeout=2.0):
+    results = {}
+    thread = StartFetch(scheduler,key,lambda: key,PRIORITY_NORMAL,results)
+    thread.join(timeout)
+    return not thread.is_alive() and results[key] == [key]
+
+
+def test_duplicate_calls_are_joined():
+    scheduler = RequestScheduler()
+    release = threading.Event()
+    calls = []
+
+    def Slow():
+        calls.append(1)
+        release.wait(2)
+        return 'weather'
+
+    results = {}
+    threads = [StartFetch(scheduler,'A',Slow,PRIORITY_NORMAL,results) for caller in range(5)]
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert results['A'] == ['weather'] * 5
+    assert len(calls) == 1
+    assert scheduler.Stats()['coalesced'] == 4
+
+def test_urgent_calls_go_first():
+    scheduler = RequestScheduler(rate=1, per=0.3)
+    order = []
+    scheduler.Fetch('first', lambda: order.append('first'))
+    results = {}
+    background = StartFetch(scheduler,'background',lambda: order.append('background'),PRIORITY_BACKGROUND,results)
+    time.sleep(0.05)
+    urgent = StartFetch(scheduler,'urgent',lambda: order.append('urgent'),PRIORITY_URGENT,results)
+    background.join(2)
+    urgent.join(2)
+    assert order == ['first', 'urgent', 'background']
+
+def test_upgrade_while_leader_waits():
+    scheduler = RequestScheduler(rate=1, per=0.3)
+    order = []
+    scheduler.Fetch('first', lambda: order.append('first'))
+    results = {}
+    leader = StartFetch(scheduler,'B',lambda: order.append('B') or 'B',PRIORITY_BACKGROUND,results)
+    time.sleep(0.05)
+    normal = StartFetch(scheduler,'C',lambda: order.append('C') or 'C',PRIORITY_NORMAL,results)
+    time.sleep(0.05)
+    # An urgent caller joins B while it waits. B moves ahead of C.
+    follower = StartFetch(scheduler,'B',lambda: order.append('B again'),PRIORITY_URGENT,results)
+    for thread in (leader, normal, follower):
+        thread.join(2)
+    assert order == ['first', 'B', 'C']
+    assert results['B'] == ['B', 'B']
+    assert FetchFinishes(scheduler,'D')
+    assert all(not ticket.queued for priority, order_number, ticket in scheduler._queue)
+
+def test_upgrade_before_leader_is_queued():
+    scheduler = RequestScheduler(rate=1, per=0.3)
+    order = []
+    scheduler.Fetch('first', lambda: order.append('first'))
+    results = {}
+    normal = StartFetch(scheduler,'C',lambda: order.append('C') or 'C',PRIORITY_NORMAL,results)
+    time.sleep(0.05)
+
+    # The leader for B has its ticket but has not joined the queue yet when the urgent caller joins.
+    created = threading.Event()
+    joined = threading.Event()
+    wait_turn = scheduler._WaitTurn
+
+    def LateWaitTurn(ticket,label):
+        created.set()
+        joined.wait(2)
+        wait_turn(ticket,label)
+    scheduler._WaitTurn = LateWaitTurn
+
+    leader = StartFetch(scheduler,'B',lambda: order.append('B') or 'B',PRIORITY_BACKGROUND,results)
+    assert created.wait(2)
+    follower = StartFetch(scheduler,'B',lambda: order.append('B again'),PRIORITY_URGENT,results)
+    while scheduler.Stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    joined.set()
+    for thread in (leader, normal, follower):
+        thread.join(2)
+    # B joins the queue at the urgent priority and goes ahead of C.
+    assert order == ['first', 'B', 'C']
+    assert results['B'] == ['B', 'B']
+
+def test_upgrade_while_leader_runs():
+    scheduler = RequestScheduler(rate=100, per=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def Running():
+        started.set()
+        release.wait(2)
+        return 'weather'
+
+    results = {}
+    leader = StartFetch(scheduler,'B',Running,PRIORITY_BACKGROUND,results)
+    assert started.wait(2)
+    # The call already has its turn. Joining it at a higher priority must not put it back in the queue.
+    follower = StartFetch(scheduler,'B',Running,PRIORITY_URGENT,results)
+    time.sleep(0.05)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+    assert results['B'] == ['weather', 'weather']
+    assert FetchFinishes(scheduler,'C')
+    assert not scheduler._queue
+
+def test_upgrade_without_rate_limit_leaves_queue_empty():
+    scheduler = RequestScheduler()
+    started = threading.Event()
+    release = threading.Event()
+
+    def Running():
+        started.set()
+        release.wait(2)
+        return 'weather'
+
+    results = {}
+    leader = StartFetch(scheduler,'B',Running,PRIORITY_BACKGROUND,results)
+    assert started.wait(2)
+    follower = StartFetch(scheduler,'B',Running,PRIORITY_URGENT,results)
+    time.sleep(0.05)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+    assert results['B'] == ['weather', 'weather']
+    assert not scheduler._queue
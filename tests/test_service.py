@@ -0,0 +1,157 @@
+# File Name: test_service.py
+# Description: Decision service against the stub API: per-request pilot limits, batches, errors and keep-alive.
+
+
+import json # Request and response bodies
+import threading # Thread the preferences file is read on
+import http.client # Client connections
+from urllib.parse import urlencode # Query strings
+
+import pytest # Fixtures
+
+import droneweather as dw
+import droneweatherservice as service_module
+from droneweatherservice import DecisionService
+
+# Sites the stub answers with varied weather.
+SITES = ['33.94, -84.33', '40.71, -74.0', '47.37, 8.55', '-33.87, 151.21', '51.5, -0.12', '35.68, 139.69']
+# Limits nothing but hazardous weather breaks, and limits any wind breaks. Both fly at night and in rain.
+LENIENT = {'wind': 100, 'night': 'true', 'rain': 'true', 'cloud': 'true'}
+STRICT = {'wind': 0, 'night': 'true', 'rain': 'true', 'cloud': 'true'}
+
+
+# DecisionService: Running service on a free port, backed by the stub API. There is no preferences file.
+@pytest.fixture
+def service(stub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dw, 'PROFILE_STORE', dw.ProfileStore())
+    running = DecisionService(4).Start()
+    try:
+        yield running
+    finally:
+        running.Stop()
+
+# Tuple: (status, JSON body, response) for one request. connection is reused when given.
+def Request(service,method,target,body=None,headers=None,connection=None):
+    connection = connection or http.client.HTTPConnection(*service.server_address[:2], timeout=10)
+    if body is not None and not isinstance(body, (str, bytes)):
+        body = json.dumps(body)
+    connection.request(method, target, body, headers or {})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read()), response
+
+# String: /decision query string for a site and pilot limits.
+def DecisionTarget(site,limits):
+    return '/decision?' + urlencode({'location': site, **limits})
+
+
+def test_get_decision_uses_the_limits_sent(service):
+    for site in SITES:
+        status, lenient, _ = Request(service, 'GET', DecisionTarget(site, LENIENT))
+        assert status == 200
+        status, strict, _ = Request(service, 'GET', DecisionTarget(site, STRICT))
+        assert status == 200
+        assert lenient['location'] == strict['location'] == site
+        assert lenient['reason'] in ('authorized', 'clouds', 'hazard')
+        # Hazardous weather is checked before the pilot's limits.
+        assert strict['reason'] == ('hazard' if lenient['reason'] == 'hazard' else 'wind')
+
+def test_post_decision_matches_get(service):
+    for site in SITES:
+        _, by_get, _ = Request(service, 'GET', DecisionTarget(site, STRICT))
+        status, by_post, _ = Request(service, 'POST', '/decision', {'location': site, 'profile': STRICT})
+        assert status == 200
+        assert (by_post['location'], by_post['safe'], by_post['reason']) == (by_get['location'], by_get['safe'], by_get['reason'])
+
+def test_decisions_keep_the_order_given(service):
+    sites = SITES[::-1] + ['nowhere, ga, us']
+    status, body, _ = Request(service, 'POST', '/decisions', {'locations': sites, 'profile': LENIENT})
+    assert status == 200
+    assert [decision['location'] for decision in body['decisions']] == sites
+    assert body['decisions'][-1]['reason'] == 'error'
+    for site, decision in zip(sites, body['decisions']):
+        _, alone, _ = Request(service, 'GET', DecisionTarget(site, LENIENT))
+        assert (decision['safe'], decision['reason']) == (alone['safe'], alone['reason'])
+
+def test_decisions_limit(service, stub, monkeypatch):
+    monkeypatch.setattr(service_module, 'MAX_LOCATIONS', 3)
+    status, body, _ = Request(service, 'POST', '/decisions', {'locations': SITES[:3], 'profile': LENIENT})
+    assert status == 200 and len(body['decisions']) == 3
+    requests = stub.requests
+    status, body, _ = Request(service, 'POST', '/decisions', {'locations': SITES[:4], 'profile': LENIENT})
+    assert status == 400
+    assert 'no more than 3 locations' in body['error']
+    assert stub.requests == requests
+
+@pytest.mark.parametrize('method, target, body, status', [
+    ('GET', '/decision?wind=20', None, 400),
+    ('GET', '/decision?location=1,2,3,4&wind=20', None, 400),
+    ('GET', '/decision?location=Dunwoody,GA,US&wind=fast', None, 400),
+    ('GET', '/decision?location=Dunwoody,GA,US&wind=20&night=maybe', None, 400),
+    ('POST', '/decision', '{not json', 400),
+    ('POST', '/decision', '["Dunwoody, GA, US"]', 400),
+    ('POST', '/decision', {'location': 'Dunwoody, GA, US', 'profile': {'night': True}}, 400),
+    ('POST', '/decisions', {'locations': 'Dunwoody, GA, US', 'profile': LENIENT}, 400),
+    ('POST', '/decisions', {'locations': [], 'profile': LENIENT}, 400),
+    ('DELETE', '/decision', None, 405),
+    ('GET', '/decisions', None, 405),
+    ('POST', '/health', None, 405),
+    ('GET', '/nowhere', None, 404),
+])
+def test_bad_requests(service, stub, method, target, body, status):
+    answer, response, _ = Request(service, method, target, body)
+    assert answer == status
+    assert response['error']
+    assert stub.requests == 0
+
+def test_body_too_large(service):
+    # Only the headers are sent. The service answers from the length alone, without reading the body.
+    connection = http.client.HTTPConnection(*service.server_address[:2], timeout=10)
+    connection.putrequest('POST', '/decisions')
+    connection.putheader('Content-Length', str(service_module.MAX_BODY + 1))
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 413
+    assert str(service_module.MAX_BODY) in json.loads(response.read())['error']
+    connection.close()
+
+def test_no_limits_and_no_preferences_file(service, stub, tmp_path):
+    status, body, _ = Request(service, 'GET', '/decision?location=Dunwoody,GA,US')
+    assert status == 400
+    assert 'no preferences file' in body['error']
+    assert stub.requests == 0
+    # Once the pilot writes the file it is used.
+    (tmp_path / dw.PREF_FILE).write_text('True\nTrue\n100.0\nTrue\n', encoding='utf-8')
+    status, body, _ = Request(service, 'GET', '/decision?location=Dunwoody,GA,US')
+    assert status == 200
+    assert body['reason'] in ('authorized', 'clouds', 'hazard')
+
+def test_preferences_file_is_read_off_the_event_loop(service, monkeypatch):
+    threads = []
+    default = dw.PROFILE_STORE.Default
+    def Default(*args):
+        threads.append(threading.current_thread().name)
+        return default(*args)
+    monkeypatch.setattr(dw.PROFILE_STORE, 'Default', Default)
+    Request(service, 'GET', '/decision?location=Dunwoody,GA,US')
+    assert threads and all(name.startswith('weather') for name in threads)
+
+def test_keep_alive(service):
+    connection = http.client.HTTPConnection(*service.server_address[:2], timeout=10)
+    status, _, response = Request(service, 'GET', '/health', connection=connection)
+    assert status == 200 and response.getheader('Connection') == 'keep-alive'
+    sock = connection.sock
+    status, _, response = Request(service, 'GET', DecisionTarget(SITES[0], LENIENT), connection=connection)
+    assert status == 200
+    # The second request came over the same connection.
+    assert connection.sock is sock
+    status, stats, _ = Request(service, 'GET', '/stats', connection=connection)
+    assert connection.sock is sock
+    assert stats['connections'] == 1 and stats['requests'] == 3
+    # An error does not close the connection either.
+    status, _, _ = Request(service, 'GET', '/nowhere', connection=connection)
+    assert status == 404 and connection.sock is sock
+    # Connection: close is honored.
+    status, _, response = Request(service, 'GET', '/health', headers={'Connection': 'close'}, connection=connection)
+    assert response.getheader('Connection') == 'close'
+    assert connection.sock is None
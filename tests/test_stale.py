@@ -0,0 +1,70 @@
+# File Name: test_stale.py
+# Description: Stale while revalidate: expired weather is served marked stale, and its night check uses the time now.
+
+
+import os # Sample payload path
+import json # Sample payload
+import time # Current time and cache expiry
+
+import droneweather as dw
+from droneweatherwatch import Watcher
+from droneweatherprofile import PilotProfile, ProfileIndex
+from conftest import PROJECT # Project folder
+
+# Pilot who may not fly at night and has limits nothing else in the sample breaks.
+DAY_PILOT = PilotProfile('day', night=False, rain=True, wind=100, cloud=True)
+
+
+# Dictionary: Sample weather recorded at now, in daylight by its own sunrise and sunset, at a place where it is
+# really the middle of the night now (on the equator, at the longitude where local time is midnight).
+def DaylightPayloadAtMidnight():
+    with open(os.path.join(PROJECT, 'benchmarks', 'sample_weather.json'), 'r') as file_object:
+        weather_data = json.load(file_object)
+    now = int(time.time())
+    longitude = ((-(now % 86400) / 240 + 180) % 360) - 180
+    weather_data['coord'] = {'lat': 0.0, 'lon': round(longitude, 2)}
+    weather_data['dt'] = now
+    weather_data['sys']['sunrise'] = now - 6 * 3600
+    weather_data['sys']['sunset'] = now + 6 * 3600
+    weather_data['weather'][0].update({'id': 800, 'main': 'Clear', 'description': 'clear sky'})
+    return weather_data
+
+
+def test_fresh_weather_uses_its_own_times():
+    decision = dw.EvaluateWeatherData(DaylightPayloadAtMidnight(),DAY_PILOT,('0', '0'))
+    assert decision.reason_code == dw.REASON_AUTHORIZED
+    assert decision.stale_seconds is None
+
+def test_stale_weather_checks_night_at_the_time_now():
+    weather_data = {**DaylightPayloadAtMidnight(), 'stale_seconds': 1200}
+    decision = dw.EvaluateWeatherData(weather_data,DAY_PILOT,('0', '0'))
+    assert decision.reason_code == dw.REASON_NIGHT
+    assert decision.stale_seconds == 1200
+    assert 'minutes old' in decision.reason
+
+def test_pilots_checked_on_stale_weather_at_the_time_now():
+    index = ProfileIndex([DAY_PILOT, PilotProfile('night', night=True, rain=True, wind=100, cloud=True)])
+    fresh = dw.EvaluatePilotsData(DaylightPayloadAtMidnight(),index,('0', '0'))
+    assert fresh['eligible'] == 2 and fresh['stale_seconds'] is None
+    stale = dw.EvaluatePilotsData({**DaylightPayloadAtMidnight(), 'stale_seconds': 1200},index,('0', '0'))
+    assert [pilot['name'] for pilot in stale['allowed']] == ['night']
+    assert stale['stale_seconds'] == 1200
+
+def test_watch_checks_stale_weather_at_the_time_now(monkeypatch):
+    weather_data = {**DaylightPayloadAtMidnight(), 'stale_seconds': 1200}
+    monkeypatch.setattr(dw, 'GetSiteWeather', lambda location: weather_data)
+    watcher = Watcher(['0, 0'],DAY_PILOT)
+    event = watcher.Poll(watcher.sites[0],time.time())
+    assert event['reason'] == 'night'
+    assert 'minutes old' in event['message']
+
+def test_stale_copy_served_while_the_api_is_down(stub):
+    dw.ConfigureCache(ttl=1, stale_ttl=600)
+    dw.ConfigureFetch(retries=0)
+    assert dw.GetWeatherById(4192375)['cod'] == 200
+    time.sleep(1.1)
+
+    stub.down = True
+    weather_data = dw.GetWeatherById(4192375)
+    assert weather_data['stale_seconds'] >= 1
+    assert weather_data['id'] == 4192375
@@ -0,0 +1,36 @@
+# File Name: test_vector.py
+# Description: The column decision gives the same reason code as the one record at a time decision on every row,
+#              including weather ids outside the lookup tables.
+
+
+import pytest # Skips when NumPy is missing
+
+np = pytest.importorskip('numpy')
+
+import droneweathervector as dwv
+from droneweatherprofile import PilotProfile
+from bench_vector import RandomColumns # Random observations
+
+PROFILES = (PilotProfile('none', night=False, rain=False, wind=20.0, cloud=False),
+            PilotProfile('all', night=True, rain=True, wind=35.0, cloud=True),
+            PilotProfile('rain', night=False, rain=True, wind=10.0, cloud=False))
+
+
+# Void: Both decisions must agree on every row.
+def AssertSame(columns,profile):
+    vector_safe, vector_codes = dwv.EvaluateColumns(**columns, profile=profile)
+    scalar_safe, scalar_codes = dwv.EvaluateScalar(**columns, profile=profile)
+    assert vector_codes.tolist() == scalar_codes.tolist()
+    assert vector_safe.tolist() == scalar_safe.tolist()
+
+
+@pytest.mark.parametrize('profile', PROFILES, ids=lambda profile: profile.name)
+def test_columns_match_one_at_a_time(profile):
+    AssertSame(RandomColumns(5000, seed=1),profile)
+
+@pytest.mark.parametrize('profile', PROFILES, ids=lambda profile: profile.name)
+def test_ids_outside_the_table_are_unknown(profile):
+    weather_id = np.array([-1, -250, -801, 0, 999, 1000, 1202, 5000, 65535], dtype=np.int64)
+    columns = RandomColumns(len(weather_id), seed=2)
+    columns['weather_id'] = weather_id
+    AssertSame(columns,profile)